@@ -0,0 +1,85 @@
+"""WebSocket payload encoding
+
+A ``Payload`` wraps one outbound message and encodes it at most once per
+wire format, however many connections it is sent to. Connections speak
+JSON text frames (orjson when installed) unless the client negotiated the
+``seelikeme.msgpack`` subprotocol, which switches both directions to
+msgpack binary frames.
+
+Simulation configs are sent in full once per connection; after that only
+an RFC 7386 merge patch against the config the connection last received
+(changed keys, ``null`` for removed ones).
+"""
+import json
+from typing import Dict, Any, Optional, Union
+
+from app.core.redis_client import pack, unpack, _encode_default
+
+try:
+    import orjson
+except ImportError:  # plain json, just slower
+    orjson = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+MSGPACK_SUBPROTOCOL = "seelikeme.msgpack"
+
+_MISSING = object()
+
+
+def dumps(message: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(message, default=_encode_default, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(message, default=_encode_default)
+
+
+def negotiate(subprotocols) -> Optional[str]:
+    """The subprotocol to accept from those the client offered (None: plain JSON)"""
+    return MSGPACK_SUBPROTOCOL if MSGPACK_SUBPROTOCOL in (subprotocols or ()) else None
+
+
+def wire_format(subprotocol: Optional[str]) -> str:
+    return MSGPACK if subprotocol == MSGPACK_SUBPROTOCOL else JSON
+
+
+def decode(frame: Dict[str, Any]) -> Any:
+    """An incoming ``websocket.receive`` ASGI message as a Python object"""
+    if frame.get("bytes") is not None:
+        return unpack(frame["bytes"])
+    return json.loads(frame["text"]) if orjson is None else orjson.loads(frame["text"])
+
+
+class Payload:
+    """One outbound message, encoded lazily and at most once per wire format"""
+
+    __slots__ = ("message", "_json", "_msgpack")
+
+    def __init__(self, message: Dict[str, Any]):
+        self.message = message
+        self._json: Optional[str] = None
+        self._msgpack: Optional[bytes] = None
+
+    def encode(self, fmt: str) -> Union[str, bytes]:
+        if fmt == MSGPACK:
+            if self._msgpack is None:
+                self._msgpack = pack(self.message)
+            return self._msgpack
+        if self._json is None:
+            self._json = dumps(self.message)
+        return self._json
+
+
+def merge_patch(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """The RFC 7386 merge patch turning ``old`` into ``new`` (empty when they are equal)"""
+    patch = {}
+    for key, value in new.items():
+        previous = old.get(key, _MISSING)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = merge_patch(previous, value)
+            if nested:
+                patch[key] = nested
+        elif previous is _MISSING or previous != value:
+            patch[key] = value
+    for key in old.keys() - new.keys():
+        patch[key] = None
+    return patch
@@ -0,0 +1,67 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Any
+
+
+class AssessmentInput(BaseModel):
+    """One assessment, with the same fields as the comprehensive detection form"""
+
+    # Dyslexia assessment data
+    reading_speed: float = Field(..., description="Words per minute")
+    comprehension_score: float = Field(..., description="Percentage 0-100")
+    spelling_accuracy: float = Field(..., description="Percentage 0-100")
+    phonemic_awareness: float = Field(..., description="Score 0-10")
+    working_memory: float = Field(..., description="Score 0-10")
+
+    # ADHD assessment data
+    attention_span: float = Field(..., description="Minutes before distraction")
+    hyperactivity_level: float = Field(..., description="Scale 1-10")
+    impulsivity_score: float = Field(..., description="Scale 1-10")
+    focus_duration: float = Field(..., description="Minutes of sustained focus")
+    task_completion: float = Field(..., description="Percentage 0-100")
+
+    # Autism assessment data
+    light_sensitivity: int = Field(..., description="Scale 1-5")
+    sound_sensitivity: int = Field(..., description="Scale 1-5")
+    texture_sensitivity: int = Field(..., description="Scale 1-5")
+    eye_contact_difficulty: int = Field(..., description="Scale 1-5")
+    social_interaction_challenges: int = Field(..., description="Scale 1-5")
+    routine_importance: int = Field(..., description="Scale 1-5")
+    change_resistance: int = Field(..., description="Scale 1-5")
+
+    # Session management
+    session_id: str = Field(..., description="Unique session identifier")
+    user_age: Optional[int] = Field(None, description="User age for calibration")
+
+    def to_detector_input(self) -> Dict[str, Dict[str, Any]]:
+        """Split the flat assessment into the per-condition dicts the detector takes"""
+        return {
+            'dyslexia_features': {
+                'reading_speed': self.reading_speed,
+                'comprehension_score': self.comprehension_score,
+                'spelling_accuracy': self.spelling_accuracy,
+                'phonemic_awareness': self.phonemic_awareness,
+                'working_memory': self.working_memory
+            },
+            'adhd_features': {
+                'attention_span': self.attention_span,
+                'hyperactivity_level': self.hyperactivity_level,
+                'impulsivity_score': self.impulsivity_score,
+                'focus_duration': self.focus_duration,
+                'task_completion': self.task_completion
+            },
+            'autism_assessment': {
+                'light_sensitivity': self.light_sensitivity,
+                'sound_sensitivity': self.sound_sensitivity,
+                'texture_sensitivity': self.texture_sensitivity,
+                'eye_contact_difficulty': self.eye_contact_difficulty,
+                'social_interaction_challenges': self.social_interaction_challenges,
+                'routine_importance': self.routine_importance,
+                'change_resistance': self.change_resistance
+            }
+        }
+
+
+class BatchDetectionRequest(BaseModel):
+    """Many assessments scored together, e.g. a classroom-wide screening"""
+
+    assessments: List[AssessmentInput] = Field(..., min_length=1)
@@ -1,122 +1,476 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, List
-import json
+from typing import Dict, List, Optional, Any, Union
+import itertools
 import asyncio
 import logging
+import time
 from datetime import datetime
 
+from app.core.config import settings
+from app.core.pubsub import MessageBus
+from app.api.payloads import Payload, MSGPACK, JSON, decode, dumps, negotiate, wire_format, merge_patch
+
 logger = logging.getLogger(__name__)
 
+_connection_ids = itertools.count(1)
+
+# Connections a broadcast queues for before yielding to the event loop
+BROADCAST_SLICE = 1024
+
+# Rough per-connection cost beyond its queued payloads: the ASGI/websocket
+# objects, the writer task and this bookkeeping
+CONNECTION_OVERHEAD_BYTES = 8 * 1024
+
+
+class ConfigUpdate:
+    """A queued simulation config; encoded as a patch against what the connection last received when sent"""
+
+    __slots__ = ("kind", "config", "extra")
+
+    def __init__(self, kind: str, config: Dict[str, Any], extra: Dict[str, Any]):
+        self.kind = kind
+        self.config = config
+        self.extra = extra
+
+
+class ClientConnection:
+    """One WebSocket of a session, with a bounded outbound queue drained by its own writer task
+
+    ``send`` never waits for the network. A message replaces a queued, not
+    yet sent one with the same coalesce key (state updates where only the
+    latest matters); when the queue is full, or (checked by the manager's
+    watchdog) a send has been blocked for ``send_timeout``, the client is too
+    slow and the connection is closed (the extension reconnects and asks for
+    an update).
+
+    Messages are ``Payload`` objects in the connection's wire format (JSON,
+    or msgpack when negotiated). Their encoded size counts against
+    ``memory_budget`` together with the config the client holds; a message
+    that would exceed it closes the connection.
+    """
+
+    def __init__(self, websocket: WebSocket, session_id: str, max_queue: int, on_close, fmt: str = JSON,
+                 memory_budget: int = 256 * 1024):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.format = fmt
+        self.last_config: Optional[Dict[str, Any]] = None  # the simulation config this client holds
+        self.id = next(_connection_ids)
+        self.max_queue = max_queue
+        self.memory_budget = memory_budget
+        self.connected_at = datetime.now().isoformat()
+        # Monotonic times of the last message from the client and the last ping to it
+        self.last_activity = time.monotonic()
+        self.last_ping = self.last_activity
+        # Insertion-ordered; coalesced messages keep their place in line
+        self.pending: Dict[Any, Union[Payload, ConfigUpdate]] = {}
+        self._sizes: Dict[Any, int] = {}
+        self.queued_bytes = 0
+        self.config_bytes = 0
+        self._sequence = itertools.count()
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._on_close = on_close
+        self.send_started: Optional[float] = None  # loop time the current send began
+        self.closed = False
+        self.sent = 0
+        self.coalesced = 0
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write())
+
+    def send(self, message: Union[Payload, ConfigUpdate, Dict[str, Any]], coalesce_key: Optional[str] = None) -> bool:
+        """Queue a message; False if the connection is closed or was too slow"""
+        if isinstance(message, dict):
+            message = Payload(message)
+        if self.closed:
+            return False
+        if isinstance(message, ConfigUpdate):
+            size = len(dumps(message.config))
+        else:
+            # Encoded now for the accounting; shared with every other recipient
+            size = len(message.encode(self.format))
+        coalescing = coalesce_key is not None and coalesce_key in self.pending
+        replaced = self._sizes.get(coalesce_key, 0) if coalescing else 0
+        if self.memory_bytes() - replaced + size > self.memory_budget:
+            logger.warning(f"Dropping WebSocket client of session {self.session_id}: over its "
+                           f"{self.memory_budget // 1024} KiB memory budget")
+            self.close(code=1013, reason="Client too slow")
+            return False
+        if coalescing:
+            self.pending[coalesce_key] = message
+            self._account(coalesce_key, size)
+            self.coalesced += 1
+            return True
+        if len(self.pending) >= self.max_queue:
+            logger.warning(f"Dropping slow WebSocket client of session {self.session_id}: "
+                           f"{len(self.pending)} messages queued")
+            self.close(code=1013, reason="Client too slow")
+            return False
+        key = coalesce_key if coalesce_key is not None else next(self._sequence)
+        self.pending[key] = message
+        self._account(key, size)
+        self._ready.set()
+        return True
+
+    def _account(self, key, size: int):
+        self.queued_bytes += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+
+    def memory_bytes(self) -> int:
+        """Estimated memory held for this connection"""
+        return CONNECTION_OVERHEAD_BYTES + self.queued_bytes + self.config_bytes
+
+    async def _write(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await self._ready.wait()
+                while self.pending:
+                    key = next(iter(self.pending))
+                    message = self.pending.pop(key)
+                    self.queued_bytes -= self._sizes.pop(key, 0)
+                    if isinstance(message, ConfigUpdate):
+                        message = self._config_payload(message)
+                    frame = message.encode(self.format)
+                    # Checked by ConnectionManager's watchdog; cheaper than a wait_for per send
+                    self.send_started = loop.time()
+                    if self.format == MSGPACK:
+                        await self.websocket.send_bytes(frame)
+                    else:
+                        await self.websocket.send_text(frame)
+                    self.send_started = None
+                    self.sent += 1
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to send message to {self.session_id}: {str(e)}")
+            self.close()
+
+    def send_config(self, kind: str, config: Dict[str, Any], **extra) -> bool:
+        """Queue a simulation config; a newer one replaces it until it is written"""
+        return self.send(ConfigUpdate(kind, config, extra), coalesce_key=kind)
+
+    def _config_payload(self, update: ConfigUpdate) -> Payload:
+        # The full config the first time, afterwards only what changed
+        message = {"type": update.kind, **update.extra}
+        if self.last_config is None:
+            message["config"] = update.config
+        else:
+            message["patch"] = merge_patch(self.last_config, update.config)
+        self.last_config = update.config
+        self.config_bytes = len(dumps(update.config))
+        return Payload(message)
+
+    async def receive(self) -> Any:
+        """The next message from the client, decoded from JSON or msgpack
+
+        Heartbeats are answered here: a ``pong`` only marks the client alive,
+        a client ``ping`` gets a ``pong``.
+        """
+        while True:
+            frame = await self.websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            self.last_activity = time.monotonic()
+            message = decode(frame)
+            kind = message.get("type") if isinstance(message, dict) else None
+            if kind == "pong":
+                continue
+            if kind == "ping":
+                self.send({"type": "pong"})
+                continue
+            return message
+
+    def close(self, code: int = 1000, reason: str = ""):
+        """Stop the writer, drop queued messages and close the socket in the background"""
+        if self.closed:
+            return
+        self.closed = True
+        self.pending.clear()
+        self._sizes.clear()
+        self.queued_bytes = 0
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        self._on_close(self, code)
+        asyncio.create_task(self._close_socket(code, reason))
+
+    async def _close_socket(self, code: int, reason: str):
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass  # already gone
+
+
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+        # session_id -> {connection id: connection}; a session may have several tabs open
+        self.active_connections: Dict[str, Dict[int, ClientConnection]] = {}
         self.session_data: Dict[str, Dict] = {}
-    
-    async def connect(self, websocket: WebSocket, session_id: str):
-        """Accept WebSocket connection and store session"""
-        await websocket.accept()
-        self.active_connections[session_id] = websocket
-        self.session_data[session_id] = {
-            "connected_at": datetime.now().isoformat(),
-            "last_activity": datetime.now().isoformat()
-        }
-        logger.info(f"WebSocket connected for session: {session_id}")
-        
+        self.max_queue = settings.WS_SEND_QUEUE_SIZE
+        self.send_timeout = settings.WS_SEND_TIMEOUT_SECONDS
+        self.max_connections_per_session = settings.WS_MAX_CONNECTIONS_PER_SESSION
+        self.heartbeat = settings.WS_HEARTBEAT_SECONDS
+        self.idle_timeout = settings.WS_IDLE_TIMEOUT_SECONDS
+        self.memory_budget = settings.WS_CONNECTION_MEMORY_BUDGET
+        self.slow_consumers_dropped = 0
+        self.idle_reaped = 0
+        self._maintenance: Optional[asyncio.Task] = None
+        self.bus: Optional[MessageBus] = None
+
+    async def start(self, bus: Optional[MessageBus] = None):
+        """Start the heartbeat/reaper task and attach the bus
+
+        Without a bus only sockets held by this worker are reached.
+        """
+        self._maintenance = asyncio.create_task(self._maintain())
+        if bus:
+            await bus.start(self._deliver_from_bus)
+            for session_id in self.active_connections:
+                bus.claim(session_id)
+            self.bus = bus
+
+    async def _maintain(self):
+        """Ping quiet clients, reap idle ones and drop those whose send is blocked"""
+        loop = asyncio.get_running_loop()
+        interval = min(self.send_timeout, self.heartbeat, self.idle_timeout) / 2
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            send_deadline = loop.time() - self.send_timeout
+            ping = Payload({"type": "ping"})  # encoded once for everyone pinged this round
+            connections = [c for session in self.active_connections.values() for c in session.values()]
+            for start in range(0, len(connections), BROADCAST_SLICE):
+                for connection in connections[start:start + BROADCAST_SLICE]:
+                    idle = now - connection.last_activity
+                    if connection.send_started is not None and connection.send_started < send_deadline:
+                        logger.warning(f"Dropping WebSocket client of session {connection.session_id}: "
+                                       f"send blocked for over {self.send_timeout:.0f}s")
+                        connection.close(code=1013, reason="Client too slow")
+                    elif idle > self.idle_timeout:
+                        # Half-open sockets of closed tabs never answer the pings
+                        self.idle_reaped += 1
+                        connection.close(code=1001, reason="Idle timeout")
+                    elif idle > self.heartbeat and now - connection.last_ping > self.heartbeat:
+                        connection.last_ping = now
+                        connection.send(ping)
+                await asyncio.sleep(0)
+
+    async def connect(self, websocket: WebSocket, session_id: str) -> ClientConnection:
+        """Accept WebSocket connection and register it under its session"""
+        # Clients offering the msgpack subprotocol get binary frames
+        subprotocol = negotiate(websocket.scope.get("subprotocols"))
+        await websocket.accept(subprotocol=subprotocol)
+        connection = ClientConnection(websocket, session_id, self.max_queue, self._forget, wire_format(subprotocol),
+                                      self.memory_budget)
+        connections = self.active_connections.setdefault(session_id, {})
+        if len(connections) >= self.max_connections_per_session:
+            # The oldest tab makes room
+            connections[next(iter(connections))].close(code=1008, reason="Too many connections for this session")
+            connections = self.active_connections.setdefault(session_id, {})
+        connections[connection.id] = connection
+        connection.start()
+        if self.bus and len(connections) == 1:
+            self.bus.claim(session_id)
+        self.session_data.setdefault(session_id, {"connected_at": connection.connected_at})
+        logger.info(f"WebSocket connected for session: {session_id} ({len(connections)} connection(s))")
+
         # Send welcome message
-        await self.send_personal_message(json.dumps({
+        connection.send({
             "type": "connection_established",
             "session_id": session_id,
+            "connection_id": connection.id,
+            "encoding": connection.format,
             "message": "Connected to See Like Me backend",
             "timestamp": datetime.now().isoformat()
-        }), session_id)
-    
-    def disconnect(self, session_id: str):
-        """Remove WebSocket connection"""
-        if session_id in self.active_connections:
-            del self.active_connections[session_id]
-        if session_id in self.session_data:
-            del self.session_data[session_id]
+        })
+        return connection
+
+    def _forget(self, connection: ClientConnection, code: int):
+        """Unregister a closed connection (called by ClientConnection.close)"""
+        connections = self.active_connections.get(connection.session_id)
+        if connections is None or connections.pop(connection.id, None) is None:
+            return
+        if code == 1013:
+            self.slow_consumers_dropped += 1
+        if not connections:
+            del self.active_connections[connection.session_id]
+            self.session_data.pop(connection.session_id, None)
+            if self.bus:
+                self.bus.release(connection.session_id)
+
+    def disconnect(self, session_id: str, connection: Optional[ClientConnection] = None):
+        """Remove one WebSocket connection, or every connection of the session"""
+        if connection is not None:
+            connection.close()
+        else:
+            for connection in list(self.active_connections.get(session_id, {}).values()):
+                connection.close()
         logger.info(f"WebSocket disconnected for session: {session_id}")
-    
-    async def send_personal_message(self, message: str, session_id: str):
-        """Send message to specific session"""
-        if session_id in self.active_connections:
-            try:
-                await self.active_connections[session_id].send_text(message)
-                # Update last activity
-                if session_id in self.session_data:
-                    self.session_data[session_id]["last_activity"] = datetime.now().isoformat()
-            except Exception as e:
-                logger.error(f"Failed to send message to {session_id}: {str(e)}")
-                self.disconnect(session_id)
-    
-    async def send_detection_update(self, session_id: str, detection_results: Dict):
-        """Send detection results update to Chrome extension"""
-        if session_id in self.active_connections:
-            try:
-                message = {
-                    "type": "detection_complete",
-                    "session_id": session_id,
-                    "results": detection_results,
-                    "model_info": {
-                        "dyslexia_accuracy": detection_results["dyslexia"].get("accuracy", 0),
-                        "adhd_accuracy": detection_results["adhd"].get("accuracy", 0),
-                        "autism_method": detection_results["autism"].get("method", "enhanced_hybrid")
-                    },
-                    "timestamp": datetime.now().isoformat()
-                }
-                
-                await self.active_connections[session_id].send_text(json.dumps(message))
-                logger.info(f"Detection update sent to session: {session_id}")
-                
-            except Exception as e:
-                logger.error(f"Failed to send detection update to {session_id}: {str(e)}")
-                self.disconnect(session_id)
-    
+
+    def _send_to_session(self, session_id: str, message: Dict[str, Any], coalesce_key: Optional[str] = None,
+                         exclude: Optional[ClientConnection] = None) -> int:
+        connections = self.active_connections.get(session_id)
+        if not connections:
+            return 0
+        # Encoded once per wire format for all of the session's connections
+        payload = Payload(message)
+        return sum(connection.send(payload, coalesce_key)
+                   for connection in list(connections.values()) if connection is not exclude)
+
+    async def send_personal_message(self, message: Dict[str, Any], session_id: str):
+        """Send message to every connection of a session, on any worker"""
+        self._send_to_session(session_id, message)
+        if self.bus:
+            self.bus.publish(session_id, "personal", message)
+
+    async def send_detection_update(self, session_id: str, detection_results: Dict,
+                                    exclude: Optional[ClientConnection] = None):
+        """Send detection results update to Chrome extension (except to ``exclude``, which already has them)"""
+        self._deliver_detection_update(session_id, detection_results, exclude)
+        # The session's sockets may (also) be held by other workers
+        if self.bus:
+            self.bus.publish(session_id, "detection_complete", detection_results)
+
     async def send_simulation_config(self, session_id: str, config: Dict):
         """Send simulation configuration to Chrome extension"""
-        if session_id in self.active_connections:
-            try:
-                message = {
-                    "type": "simulation_config",
-                    "session_id": session_id,
-                    "config": config,
-                    "timestamp": datetime.now().isoformat()
-                }
-                
-                await self.active_connections[session_id].send_text(json.dumps(message))
-                logger.info(f"Simulation config sent to session: {session_id}")
-                
-            except Exception as e:
-                logger.error(f"Failed to send simulation config to {session_id}: {str(e)}")
-                self.disconnect(session_id)
-    
-    async def broadcast_system_message(self, message: Dict):
-        """Broadcast system message to all connected sessions"""
-        disconnected_sessions = []
-        
+        self._deliver_simulation_config(session_id, config)
+        if self.bus:
+            self.bus.publish(session_id, "simulation_config", config)
+
+    async def broadcast_system_message(self, message: Dict) -> int:
+        """Broadcast system message to all connected sessions; returns the local connections it was queued for
+
+        The message is serialized once and only queued here; every
+        connection's writer sends it concurrently. Other workers get it
+        through the bus.
+        """
         message["type"] = "system_broadcast"
         message["timestamp"] = datetime.now().isoformat()
-        
-        for session_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_text(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Failed to broadcast to {session_id}: {str(e)}")
-                disconnected_sessions.append(session_id)
-        
-        # Clean up disconnected sessions
-        for session_id in disconnected_sessions:
-            self.disconnect(session_id)
-    
+        if self.bus:
+            self.bus.broadcast("system_broadcast", message)
+        return await self._deliver_broadcast(message)
+
+    def _deliver_detection_update(self, session_id: str, detection_results: Dict,
+                                  exclude: Optional[ClientConnection] = None):
+        if session_id not in self.active_connections:
+            return
+        message = {
+            "type": "detection_complete",
+            "session_id": session_id,
+            "results": detection_results,
+            "model_info": {
+                "dyslexia_accuracy": detection_results["dyslexia"].get("accuracy", 0),
+                "adhd_accuracy": detection_results["adhd"].get("accuracy", 0),
+                "autism_method": detection_results["autism"].get("method", "enhanced_hybrid")
+            },
+            "timestamp": datetime.now().isoformat()
+        }
+        if self._send_to_session(session_id, message, coalesce_key="detection_complete", exclude=exclude):
+            logger.info(f"Detection update sent to session: {session_id}")
+
+    def _deliver_simulation_config(self, session_id: str, config: Dict):
+        connections = self.active_connections.get(session_id)
+        if not connections:
+            return
+        # Each connection is sent what changed since the config it last received
+        delivered = sum(
+            connection.send_config("simulation_config", config, session_id=session_id,
+                                   timestamp=datetime.now().isoformat())
+            for connection in list(connections.values())
+        )
+        if delivered:
+            logger.info(f"Simulation config sent to session: {session_id}")
+
+    async def _deliver_broadcast(self, message: Dict) -> int:
+        payload = Payload(message)
+        queued = 0
+        connections = [c for session in self.active_connections.values() for c in session.values()]
+        for start in range(0, len(connections), BROADCAST_SLICE):
+            for connection in connections[start:start + BROADCAST_SLICE]:
+                queued += connection.send(payload)
+            # Let the writers already woken start sending, and other requests run
+            await asyncio.sleep(0)
+        return queued
+
+    def _deliver_from_bus(self, messages: List[Dict[str, Any]]):
+        """Messages another worker published for sockets held here"""
+        for message in messages:
+            kind, session_id, data = message["kind"], message["session_id"], message["data"]
+            if kind == "detection_complete":
+                self._deliver_detection_update(session_id, data)
+            elif kind == "simulation_config":
+                self._deliver_simulation_config(session_id, data)
+            elif kind == "personal":
+                self._send_to_session(session_id, data)
+            elif kind == "system_broadcast":
+                asyncio.create_task(self._deliver_broadcast(data))
+
+    async def close_all(self):
+        """Close every connection (server shutdown)"""
+        if self._maintenance:
+            self._maintenance.cancel()
+            self._maintenance = None
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections.values()):
+                connection.close(code=1001, reason="Server shutting down")
+        if self.bus:
+            await self.bus.stop()
+            self.bus = None
+        await asyncio.sleep(0)
+
     def get_active_sessions(self) -> List[str]:
         """Get list of active session IDs"""
         return list(self.active_connections.keys())
-    
+
     def get_session_count(self) -> int:
         """Get number of active sessions"""
         return len(self.active_connections)
-    
+
+    def get_connection_count(self) -> int:
+        """Get number of open WebSocket connections across all sessions"""
+        return sum(len(connections) for connections in self.active_connections.values())
+
     def get_session_info(self, session_id: str) -> Dict:
         """Get session information"""
-        return self.session_data.get(session_id, {})
+        info = dict(self.session_data.get(session_id, {}))
+        if session_id in self.active_connections:
+            now = time.monotonic()
+            info["connections"] = [
+                {"connection_id": c.id, "connected_at": c.connected_at, "idle_seconds": round(now - c.last_activity, 1),
+                 "queued": len(c.pending), "sent": c.sent, "memory_bytes": c.memory_bytes()}
+                for c in self.active_connections[session_id].values()
+            ]
+        return info
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Connection and queue counters for monitoring"""
+        connections = [c for session in self.active_connections.values() for c in session.values()]
+        return {
+            "sessions": len(self.active_connections),
+            "connections": len(connections),
+            "queued_messages": sum(len(c.pending) for c in connections),
+            "coalesced_messages": sum(c.coalesced for c in connections),
+            "slow_consumers_dropped": self.slow_consumers_dropped,
+            "idle_reaped": self.idle_reaped,
+            "bus": self.bus.get_stats() if self.bus else None
+        }
+
+    def get_memory_report(self, top: int = 20) -> Dict[str, Any]:
+        """Estimated memory held for connections, in total and for the ``top`` largest"""
+        now = time.monotonic()
+        connections = [c for session in self.active_connections.values() for c in session.values()]
+        largest = sorted(connections, key=lambda c: c.memory_bytes(), reverse=True)[:top]
+        return {
+            "budget_bytes_per_connection": self.memory_budget,
+            "total_bytes": sum(c.memory_bytes() for c in connections),
+            "queued_bytes": sum(c.queued_bytes for c in connections),
+            "config_bytes": sum(c.config_bytes for c in connections),
+            "idle_over_heartbeat": sum(1 for c in connections if now - c.last_activity > self.heartbeat),
+            "largest": [
+                {"session_id": c.session_id, "connection_id": c.id, "memory_bytes": c.memory_bytes(),
+                 "queued": len(c.pending), "idle_seconds": round(now - c.last_activity, 1)}
+                for c in largest
+            ]
+        }
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BatchQueueFullError(Exception):
+    """Raised when the micro-batch queue is at its configured depth"""
+
+
+class MicroBatcher:
+    """Coalesces concurrent detection requests into one vectorized detector call
+
+    Requests wait at most ``max_wait_ms`` (or until ``max_batch_size`` rows are
+    queued) and are then scored together through ``detector.detect_batch``;
+    each caller's future is resolved with its own row.
+    """
+
+    def __init__(self, detector, max_batch_size: int = 32, max_wait_ms: float = 5.0, max_queue_depth: int = 1024):
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_depth = max_queue_depth
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._in_flight = set()
+        self.batches_scored = 0
+        self.rows_scored = 0
+        self.rejected = 0
+
+    async def start(self):
+        """Start the background batching loop"""
+        self.queue = asyncio.Queue(maxsize=self.max_queue_depth)
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"Micro-batching enabled (max_batch_size={self.max_batch_size}, "
+            f"max_wait={self.max_wait * 1000:.1f}ms, queue_depth={self.max_queue_depth})"
+        )
+
+    async def stop(self):
+        """Stop the loop and fail anything still waiting"""
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+        while self.queue and not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+
+    async def submit(self, assessment: Dict[str, Dict[str, Any]]) -> Dict[str, Dict]:
+        """Queue one assessment and wait for its detection results"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((assessment, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise BatchQueueFullError(f"Detection queue is full ({self.max_queue_depth} pending)")
+        return await future
+
+    async def _collect(self) -> List[Tuple[Dict, asyncio.Future]]:
+        """Wait for the first request, then gather more until the window closes or the batch is full"""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Callers that gave up (client disconnects) don't need scoring
+        return [(assessment, future) for assessment, future in batch if not future.done()]
+
+    async def _score(self, batch: List[Tuple[Dict, asyncio.Future]]):
+        try:
+            results = await self.detector.detect_batch([assessment for assessment, _ in batch])
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(batch)} failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+        self.batches_scored += 1
+        self.rows_scored += len(batch)
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+
+            # Score in the background so the next window starts collecting straight
+            # away; with an inference executor several batches run in parallel
+            task = asyncio.create_task(self._score(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Batching counters for monitoring"""
+        return {
+            "batches_scored": self.batches_scored,
+            "rows_scored": self.rows_scored,
+            "average_batch_size": self.rows_scored / self.batches_scored if self.batches_scored else 0.0,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "rejected": self.rejected
+        }
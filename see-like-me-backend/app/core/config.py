@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings  # FIXED IMPORT
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 class Settings(BaseSettings):
     # API Configuration
@@ -7,22 +7,106 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "See Like Me Backend"
     VERSION: str = "3.0.0"
     
-    # Redis Configuration
+    # Redis Configuration (off by default for local development)
+    REDIS_ENABLED: bool = False
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: Optional[str] = None
     REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50  # shared pool size per process
+    REDIS_SOCKET_TIMEOUT: float = 5.0
     
     # Model Configuration
     MODEL_PATH: str = "models/"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    MAX_BATCH_SIZE: int = 1000  # assessments per /detect/batch request
     
-    # Your specific model files - ALL THREE MODELS
-    ADHD_MODEL_FILE: str = "production_adhd_model_20250626_070254.pkl"
-    DYSLEXIA_ENSEMBLE_FILE: str = "dyslexia_ultimate_ensemble_20250626_042544.pkl"
-    DYSLEXIA_PREPROCESSING_FILE: str = "dyslexia_preprocessing_20250626_042544.pkl"
-    DYSLEXIA_NN_FILE: str = "dyslexia_ultimate_nn_20250626_042544.h5"
-    AUTISM_HYBRID_FILE: str = "production_autism_hybrid_enhanced_20250626_074724.pkl"
+    # Micro-batching of concurrent /detect/comprehensive requests (opt-in)
+    MICRO_BATCHING_ENABLED: bool = False
+    MICRO_BATCH_MAX_SIZE: int = 32
+    MICRO_BATCH_MAX_WAIT_MS: float = 5.0
+    MICRO_BATCH_QUEUE_DEPTH: int = 1024
+    
+    # Inference executor: "thread", "process" (models preloaded per worker) or "inline"
+    INFERENCE_EXECUTOR: str = "thread"
+    INFERENCE_WORKERS: Optional[int] = None  # defaults to the CPU count
+    INFERENCE_MAX_PENDING: int = 64
+    INFERENCE_TIMEOUT_SECONDS: float = 10.0
+    
+    # Inference backend: "native" (sklearn VotingClassifier), "compiled" (flattened
+    # NumPy trees), "onnx", "student" (the compact model distilled from the
+    # ensemble, student_*_model.pkl) or "cascade" (student first, ensemble for
+    # ambiguous rows); per-condition overrides e.g. {"autism": "compiled"}
+    INFERENCE_BACKEND: str = "native"
+    INFERENCE_BACKEND_OVERRIDES: Dict[str, str] = {}
+    
+    # "cascade" backend: the student answers rows whose probability is outside
+    # [low, high]; the rest are rescored by the ensemble served as CASCADE_FULL_BACKEND.
+    # Per-condition bands e.g. {"adhd": [0.1, 0.9]}
+    CASCADE_FULL_BACKEND: str = "native"
+    CASCADE_DEFAULT_BAND: List[float] = [0.2, 0.8]
+    CASCADE_BANDS: Dict[str, List[float]] = {}
+    
+    # "pickle" loads compatible_*_model.pkl; "mmap" opens the compiled_*_model/
+    # directories from `python -m app.models.convert_models` memory-mapped, so
+    # worker processes share one copy of the trees (always served compiled)
+    MODEL_ARTIFACT_FORMAT: str = "pickle"
+    
+    # "eager" loads every model in the background right after startup (/readyz
+    # turns 200 once done); "lazy" waits for the first detection request
+    MODEL_LOADING_MODE: str = "eager"
+    
+    # Precomputed autism probabilities for all 5**7 questionnaire answers
+    # (built with `python -m app.models.autism_lookup`)
+    AUTISM_LOOKUP_ENABLED: bool = True
+    AUTISM_LOOKUP_FILE: str = "autism_lookup.npy"
+    
+    # Prediction cache (in-process LRU/TTL tier in front of Redis)
+    PREDICTION_CACHE_ENABLED: bool = True
+    PREDICTION_CACHE_MAX_ENTRIES: int = 10000
+    PREDICTION_CACHE_TTL: int = 300
+    PREDICTION_CACHE_DECIMALS: int = 3  # inputs are rounded to this many decimals before hashing
+    
+    # Model files (written by retrain_compatible_models.py) inside MODEL_PATH or a registry version
+    DYSLEXIA_MODEL_FILE: str = "compatible_dyslexia_model.pkl"
+    ADHD_MODEL_FILE: str = "compatible_adhd_model.pkl"
+    AUTISM_MODEL_FILE: str = "compatible_autism_model.pkl"
+    
+    # Model registry: versions in MODEL_REGISTRY_DIR/<version>/ with a manifest.json,
+    # the served one named in MODEL_REGISTRY_DIR/ACTIVE (see app.models.registry).
+    # Without an ACTIVE version the models are loaded from MODEL_PATH
+    MODEL_REGISTRY_DIR: str = "models/registry"
+    MODEL_REGISTRY_POLL_SECONDS: float = 10.0  # hot-swap when ACTIVE changes; 0 disables the watcher
+    ADMIN_TOKEN: Optional[str] = None  # X-Admin-Token for /api/v1/admin/*; unset disables them
+    
+    # Shadow scoring: a sample of /detect/comprehensive requests is also scored by
+    # this registry version in a low-priority background thread, never delaying the
+    # response; samples are dropped while SHADOW_QUEUE_DEPTH are already waiting
+    SHADOW_MODEL_VERSION: Optional[str] = None  # unset disables shadow scoring
+    SHADOW_SAMPLE_RATE: float = 0.1
+    SHADOW_QUEUE_DEPTH: int = 256
+    SHADOW_MAX_BATCH_SIZE: int = 32
+    SHADOW_LATENCY_WINDOW: int = 2048  # candidate batches kept for latency percentiles
+    
+    # WebSockets: each connection has a bounded outbound queue drained by its own
+    # writer task; a client whose queue fills up or whose send blocks is disconnected
+    WS_SEND_QUEUE_SIZE: int = 64
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0
+    WS_MAX_CONNECTIONS_PER_SESSION: int = 8  # the oldest is closed beyond this
+    
+    # Clients quiet for WS_HEARTBEAT_SECONDS get a {"type": "ping"} (answer {"type": "pong"});
+    # connections with no message from the client for WS_IDLE_TIMEOUT_SECONDS are closed
+    WS_HEARTBEAT_SECONDS: float = 30.0
+    WS_IDLE_TIMEOUT_SECONDS: float = 90.0
+    WS_CONNECTION_MEMORY_BUDGET: int = 256 * 1024  # bytes of queued payloads and held config per connection
+    WS_MAX_INFLIGHT_DETECTIONS: int = 8  # pipelined "detect" messages per connection
+    
+    # Cross-worker WebSocket delivery: "redis" (pub/sub; needed with several workers
+    # or nodes), "memory" (this process only), "none", or "auto" (redis when connected)
+    WS_BUS: str = "auto"
+    WS_BUS_BATCH_MS: float = 2.0  # publishes within this window go out as one batch per node
+    WS_BUS_BATCH_SIZE: int = 500
+    WS_OWNERSHIP_TTL_SECONDS: float = 90.0  # renewed every third of this while sockets are open
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -41,6 +125,22 @@ class Settings(BaseSettings):
     
     # Session Configuration
     SESSION_TIMEOUT: int = 3600  # 1 hour
+    # In-process session store used while Redis is disabled or unreachable
+    LOCAL_SESSION_MAX_ENTRIES: int = 10000
+    LOCAL_SESSION_MAX_BYTES: int = 32 * 1024 * 1024
+    
+    # Feedback pipeline: a Redis Stream (a local append-only log while Redis is
+    # unavailable) drained by consumer-group workers into Parquet files
+    # partitioned by day and disability type
+    FEEDBACK_STREAM_MAXLEN: int = 100000
+    FEEDBACK_LOG_DIR: str = "logs/feedback"
+    FEEDBACK_CONSUMER_ENABLED: bool = True
+    FEEDBACK_CONSUMER_GROUP: str = "feedback_writers"
+    FEEDBACK_BATCH_SIZE: int = 500
+    FEEDBACK_FLUSH_SECONDS: float = 60.0
+    FEEDBACK_OUTPUT_DIR: str = "data/feedback"
+    FEEDBACK_COMPRESSION: str = "zstd"
+    FEEDBACK_DEAD_LETTER_DIR: str = "data/feedback_dead_letter"  # rows that don't fit the Parquet schema
     
     # Model Performance Thresholds
     DYSLEXIA_HIGH_CONFIDENCE: float = 0.85
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Executor
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFullError(Exception):
+    """Raised when more inference tasks are pending than the executor allows"""
+
+
+class InferenceTimeoutError(Exception):
+    """Raised when an inference task does not finish within its timeout"""
+
+
+# Per-process detector used by the process pool; loaded once by the initializer
+_worker_detector = None
+
+
+def _init_process_worker(model_path: str):
+    """Load the models into a pool process so tasks only ship feature matrices"""
+    global _worker_detector
+    from app.models.disability_detector import DisabilityDetectionSystem
+
+    _worker_detector = DisabilityDetectionSystem(model_path)
+    asyncio.run(_worker_detector.load_models())
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _predict_in_worker(matrices: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return _worker_detector.predict_matrices(matrices)
+
+
+class InferenceExecutor:
+    """Runs CPU-bound ensemble scoring off the event loop
+
+    ``kind`` is ``"thread"`` (shares the detector's loaded models; the
+    boosters and sklearn forests release the GIL while predicting) or
+    ``"process"`` (each worker preloads its own copy of the models).
+    At most ``max_pending`` tasks may be queued or running at once, and
+    each caller waits at most ``timeout`` seconds for its result.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: Optional[int] = None,
+                 max_pending: int = 64, timeout: float = 10.0, model_path: Optional[str] = None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor kind: {kind}")
+
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.model_path = model_path
+        self.pool: Optional[Executor] = None
+        self.pending = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    async def start(self):
+        """Create the pool; process workers are spawned and warmed up front"""
+        if self.kind == "process":
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_process_worker,
+                initargs=(self.model_path,)
+            )
+            loop = asyncio.get_running_loop()
+            pids = await asyncio.gather(*[
+                loop.run_in_executor(self.pool, _worker_ready) for _ in range(self.max_workers)
+            ])
+            logger.info(f"✅ Inference process pool ready ({len(set(pids))} workers with preloaded models)")
+        else:
+            self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+            logger.info(f"✅ Inference thread pool ready ({self.max_workers} workers)")
+
+    def shutdown(self, cancel_pending: bool = True):
+        """Stop accepting work and release the pool
+
+        With ``cancel_pending=False`` (retiring a pool after a model swap) the
+        work already submitted still runs and its callers get their results.
+        """
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=cancel_pending)
+            self.pool = None
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    async def predict(self, detector, matrices: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Score the matrices on the pool without blocking the event loop"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise InferenceQueueFullError(f"Inference queue is full ({self.max_pending} pending)")
+            self.pending += 1
+
+        try:
+            if self.pool is None:
+                raise RuntimeError("Inference executor is not running")
+            if self.kind == "process":
+                future = self.pool.submit(_predict_in_worker, matrices)
+            else:
+                future = self.pool.submit(detector.predict_matrices, matrices)
+        except BaseException:
+            # Nothing was queued (shut down, or a broken process pool): give the slot back
+            with self._lock:
+                self.pending -= 1
+            raise
+
+        # The slot is freed when the work really finishes, not when the caller gives up,
+        # so timed-out tasks still count against max_pending while they occupy a worker
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise InferenceTimeoutError(f"Inference did not finish within {self.timeout}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Executor counters for monitoring"""
+        return {
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,127 @@
+import glob
+import os
+import time
+import logging
+from typing import Dict, Any, List, Callable, Iterable
+
+import msgpack
+
+logger = logging.getLogger(__name__)
+
+LOCAL_ID_PREFIX = "local:"
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class LocalFeedbackLog:
+    """Append-only feedback log on local disk, used while Redis is unavailable
+
+    Each process appends msgpack records to its own ``<time>-<pid>.active``
+    segment through a buffered file (no flush or fsync per record). Full
+    segments are sealed by renaming them to ``.log``; the process's consumer
+    reads its sealed segments and deletes them once acknowledged. Segments
+    of processes that died are adopted by the next one to start.
+    """
+
+    def __init__(self, directory: str, encode: Callable[[Any], bytes], segment_records: int = 500):
+        self.directory = directory
+        self.encode = encode
+        self.segment_records = segment_records
+        self._file = None
+        self._active_path = None
+        self._count = 0
+        self._delivered = set()  # segments handed to a consumer but not yet acknowledged
+        self.appended = 0
+        self._recover_orphans()
+
+    def append(self, record: Dict[str, Any]):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._active_path = os.path.join(self.directory, f"{time.time_ns()}-{os.getpid()}.active")
+            self._file = open(self._active_path, 'ab')
+        self._file.write(self.encode(record))
+        self._count += 1
+        self.appended += 1
+        if self._count >= self.segment_records:
+            self.seal()
+
+    def seal(self):
+        """Close the active segment and hand it to consumers"""
+        if self._file is None:
+            return
+        self._file.close()
+        os.replace(self._active_path, self._active_path[:-len('.active')] + '.log')
+        self._file = None
+        self._active_path = None
+        self._count = 0
+
+    def sealed_segments(self) -> List[str]:
+        """This process's sealed segments; each worker drains its own"""
+        return sorted(glob.glob(os.path.join(self.directory, f'*-{os.getpid()}.log')))
+
+    def read_batch(self, max_records: int) -> List[Dict[str, Any]]:
+        """Records from the oldest sealed segments, each tagged with its segment as ``_id``
+
+        Whole segments are returned, so a batch may exceed ``max_records`` by
+        up to one segment. A partly filled active segment is sealed when
+        nothing else is waiting, so quiet periods still drain. Delivered
+        segments are not handed out again until this process restarts.
+        """
+        segments = [path for path in self.sealed_segments() if os.path.basename(path) not in self._delivered]
+        if not segments and self._count:
+            self.seal()
+            segments = [path for path in self.sealed_segments() if os.path.basename(path) not in self._delivered]
+
+        records: List[Dict[str, Any]] = []
+        for path in segments:
+            if records and len(records) >= max_records:
+                break
+            self._delivered.add(os.path.basename(path))
+            segment_id = LOCAL_ID_PREFIX + os.path.basename(path)
+            with open(path, 'rb') as f:
+                for record in msgpack.Unpacker(f, raw=False):
+                    record['_id'] = segment_id
+                    records.append(record)
+        return records
+
+    def ack(self, ids: Iterable[str]):
+        """Delete the segments behind acknowledged records"""
+        for segment_id in set(ids):
+            name = segment_id[len(LOCAL_ID_PREFIX):]
+            self._delivered.discard(name)
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def close(self):
+        self.seal()
+
+    def _recover_orphans(self):
+        """Adopt segments, sealed or not, left behind by processes that are no longer running"""
+        for path in glob.glob(os.path.join(self.directory, '*-*.*')):
+            name, extension = os.path.splitext(os.path.basename(path))
+            created, pid = name.rsplit('-', 1)
+            if extension not in ('.active', '.log') or int(pid) == os.getpid() or _process_alive(int(pid)):
+                continue
+            try:
+                os.replace(path, os.path.join(self.directory, f"{created}-{os.getpid()}.log"))
+                logger.info(f"Recovered feedback log segment {os.path.basename(path)}")
+            except FileNotFoundError:
+                pass  # another worker adopted it first
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "appended": self.appended,
+            "active_records": self._count,
+            "sealed_segments": len(self.sealed_segments()),
+            "unacknowledged_segments": len(self._delivered)
+        }
@@ -0,0 +1,337 @@
+"""Feedback ingestion: stream consumers writing partitioned Parquet files
+
+Producers (``RedisManager.store_feedback``) append to a Redis Stream, or to
+a local append-only log while Redis is unavailable. Consumers in the
+``FEEDBACK_CONSUMER_GROUP`` drain it in batches into::
+
+    <FEEDBACK_OUTPUT_DIR>/date=2026-10-18/disability_type=adhd/part-<time>-<consumer>.parquet
+
+and acknowledge the entries once the files are written. Records are checked
+against FEEDBACK_COLUMNS when they come in (``validate_feedback``); rows
+that still fail to convert are written to FEEDBACK_DEAD_LETTER_DIR as JSON
+lines instead of holding up their batch. The API process runs one consumer;
+with Redis, more can run standalone:
+
+    python -m app.core.feedback_pipeline --consumer worker-2
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import sys
+import time
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from app.core.config import settings
+from app.models.disability_detector import CONDITIONS, DYSLEXIA_FEATURES, ADHD_FEATURES, AUTISM_ASSESSMENT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# The assessment last served to the session, attached to its feedback, and
+# an optional confirmed 0/1 label: the rows incremental_retrain.py learns from
+ASSESSMENT_COLUMNS = DYSLEXIA_FEATURES + ADHD_FEATURES + AUTISM_ASSESSMENT_FIELDS
+
+# Always present with these types, so files stay readable as one dataset;
+# other fields are dropped when feedback comes in
+FEEDBACK_COLUMNS = {
+    'session_id': 'string',
+    'timestamp': 'string',
+    'accuracy_rating': 'int64',
+    'simulation_quality': 'int64',
+    'comments': 'string',
+    'label': 'int64',
+    **{name: 'float64' for name in ASSESSMENT_COLUMNS}
+}
+
+
+class InvalidFeedbackError(ValueError):
+    """A feedback field has the wrong type for its column"""
+
+
+def _fits(value: Any, alias: str) -> bool:
+    if alias == 'int64':
+        return isinstance(value, int) and not isinstance(value, bool) and -2 ** 63 <= value < 2 ** 63
+    if alias == 'float64':
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+    return isinstance(value, str)
+
+
+def flatten_assessment(assessment: Dict[str, Dict[str, Any]]) -> Dict[str, float]:
+    """The detector's per-condition assessment as flat ASSESSMENT_COLUMNS fields"""
+    return {name: value for group in assessment.values() for name, value in group.items()
+            if name in ASSESSMENT_COLUMNS}
+
+
+def feedback_condition(disability_type: Any) -> str:
+    """The disability_type partition of a record; anything but a known condition is ``unknown``"""
+    return disability_type if disability_type in CONDITIONS else 'unknown'
+
+
+def feedback_day(timestamp: Any) -> str:
+    """The date partition of a record; raises ValueError unless ``timestamp`` is ISO 8601"""
+    if not isinstance(timestamp, str):
+        raise ValueError(f"timestamp must be an ISO 8601 string, not {type(timestamp).__name__}")
+    return datetime.fromisoformat(timestamp).date().isoformat()
+
+
+def validate_feedback(feedback: Any) -> Dict[str, Any]:
+    """The feedback as a record for the stream: FEEDBACK_COLUMNS fields, checked, plus its partition
+
+    Fields outside FEEDBACK_COLUMNS are dropped and a missing timestamp is
+    set to now; a field of the wrong type raises InvalidFeedbackError.
+    """
+    if not isinstance(feedback, dict):
+        raise InvalidFeedbackError("feedback must be an object")
+    record = {}
+    for column, alias in FEEDBACK_COLUMNS.items():
+        value = feedback.get(column)
+        if value is None:
+            continue
+        if not _fits(value, alias):
+            kind = {'int64': 'an integer', 'float64': 'a finite number'}.get(alias, 'a string')
+            raise InvalidFeedbackError(f"{column} must be {kind}")
+        record[column] = value
+    if record.get('label') not in (None, 0, 1):
+        raise InvalidFeedbackError("label must be 0 or 1")
+    if 'timestamp' in record:
+        try:
+            feedback_day(record['timestamp'])
+        except ValueError:
+            raise InvalidFeedbackError("timestamp must be an ISO 8601 date and time")
+    else:
+        record['timestamp'] = datetime.now().isoformat()
+    record['disability_type'] = feedback_condition(feedback.get('disability_type'))
+    return record
+
+
+def default_consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class ParquetFeedbackSink:
+    """Writes feedback batches as compressed Parquet, one new file per partition per flush
+
+    Rows that cannot be partitioned or converted to FEEDBACK_COLUMNS go to a
+    JSON-lines file in ``dead_letter_dir`` instead.
+    """
+
+    def __init__(self, directory: str, compression: str = "zstd", name: str = "consumer",
+                 dead_letter_dir: Optional[str] = None):
+        self.directory = directory
+        self.compression = compression
+        self.name = name
+        self.dead_letter_dir = dead_letter_dir or os.path.join(directory, '_dead_letter')
+        self.files_written = 0
+        self.rows_written = 0
+        self.rows_dead_lettered = 0
+
+    def write(self, records: List[Dict[str, Any]]) -> List[str]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        partitions: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+        rejected = []
+        for record in records:
+            row = {key: value for key, value in record.items() if key != '_id'}
+            try:
+                day = feedback_day(row.get('timestamp'))
+            except ValueError:
+                rejected.append(row)
+                continue
+            partitions[(day, feedback_condition(row.get('disability_type')))].append(row)
+
+        paths = []
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        for (day, disability_type), rows in partitions.items():
+            try:
+                table = self._table(rows)
+            except (pa.ArrowException, TypeError, ValueError, OverflowError):
+                # Find the rows that don't convert; the rest are written as usual
+                good = []
+                for row in rows:
+                    try:
+                        self._table([row])
+                        good.append(row)
+                    except (pa.ArrowException, TypeError, ValueError, OverflowError):
+                        rejected.append(row)
+                if not good:
+                    continue
+                table = self._table(good)
+
+            directory = os.path.join(self.directory, f"date={day}", f"disability_type={disability_type}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{stamp}-{self.name}.parquet")
+            # Written under a temporary name so readers never see a partial file
+            pq.write_table(table, path + '.tmp', compression=self.compression)
+            os.replace(path + '.tmp', path)
+            paths.append(path)
+
+        if rejected:
+            self._dead_letter(rejected, stamp)
+        self.files_written += len(paths)
+        self.rows_written += len(records) - len(rejected)
+        return paths
+
+    def _table(self, rows: List[Dict[str, Any]]):
+        import pyarrow as pa
+
+        return pa.table({
+            column: pa.array([row.get(column) for row in rows], type=pa.type_for_alias(alias))
+            for column, alias in FEEDBACK_COLUMNS.items()
+        })
+
+    def _dead_letter(self, rows: List[Dict[str, Any]], stamp: str):
+        os.makedirs(self.dead_letter_dir, exist_ok=True)
+        path = os.path.join(self.dead_letter_dir, f"part-{stamp}-{self.name}.jsonl")
+        with open(path + '.tmp', 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row, default=repr) + '\n')
+        os.replace(path + '.tmp', path)
+        self.rows_dead_lettered += len(rows)
+        logger.warning(f"⚠️ {len(rows)} feedback records did not fit the Parquet schema; wrote them to {path}")
+
+
+class FeedbackConsumer:
+    """Drains the feedback stream in batches into a sink, acknowledging after each write
+
+    Entries read but not yet written stay pending in the consumer group (or
+    in their log segment), so a crash re-delivers them: at-least-once.
+    """
+
+    def __init__(self, redis_manager, sink: ParquetFeedbackSink, consumer: Optional[str] = None,
+                 batch_size: int = 500, flush_seconds: float = 60.0, poll_interval: float = 1.0):
+        self.redis_manager = redis_manager
+        self.sink = sink
+        self.consumer = consumer or default_consumer_name()
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.poll_interval = poll_interval
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_started: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self.batches_written = 0
+        self.errors = 0
+
+    async def start(self):
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Feedback consumer {self.consumer} started (batch {self.batch_size}, "
+                    f"flush every {self.flush_seconds:.0f}s)")
+
+    async def stop(self):
+        """Stop reading and write out whatever is buffered"""
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Feedback consumer {self.consumer} could not flush on stop: {str(e)}")
+
+    async def _run(self):
+        while self._running:
+            try:
+                records = await self.redis_manager.get_feedback_batch(
+                    max(1, self.batch_size - len(self._buffer)), consumer=self.consumer,
+                    block_ms=int(self.poll_interval * 1000)
+                )
+                if records:
+                    if not self._buffer:
+                        self._buffer_started = time.monotonic()
+                    self._buffer.extend(records)
+                elif not self.redis_manager.is_connected():
+                    await asyncio.sleep(self.poll_interval)
+
+                if len(self._buffer) >= self.batch_size or (
+                    self._buffer and time.monotonic() - self._buffer_started >= self.flush_seconds
+                ):
+                    await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Feedback consumer {self.consumer} failed: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def flush(self):
+        """Write the buffered batch and acknowledge it"""
+        if not self._buffer:
+            return
+        records, self._buffer = self._buffer, []
+        try:
+            paths = await asyncio.to_thread(self.sink.write, records)
+        except Exception:
+            # Keep the batch; its entries stay unacknowledged until a write succeeds
+            self._buffer = records + self._buffer
+            raise
+        await self.redis_manager.ack_feedback([record['_id'] for record in records])
+        self.batches_written += 1
+        logger.info(f"📦 Wrote {len(records)} feedback records to {len(paths)} file(s)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "consumer": self.consumer,
+            "buffered": len(self._buffer),
+            "batches_written": self.batches_written,
+            "files_written": self.sink.files_written,
+            "rows_written": self.sink.rows_written,
+            "rows_dead_lettered": self.sink.rows_dead_lettered,
+            "errors": self.errors
+        }
+
+
+def create_consumer(redis_manager, consumer: Optional[str] = None) -> FeedbackConsumer:
+    consumer = consumer or default_consumer_name()
+    return FeedbackConsumer(
+        redis_manager,
+        ParquetFeedbackSink(settings.FEEDBACK_OUTPUT_DIR, settings.FEEDBACK_COMPRESSION, consumer,
+                            dead_letter_dir=settings.FEEDBACK_DEAD_LETTER_DIR),
+        consumer=consumer,
+        batch_size=settings.FEEDBACK_BATCH_SIZE,
+        flush_seconds=settings.FEEDBACK_FLUSH_SECONDS
+    )
+
+
+async def run_consumer(consumer_name: Optional[str], duration: Optional[float]):
+    from app.core.redis_client import RedisManager
+
+    redis_manager = RedisManager()
+    await redis_manager.connect()
+    consumer = create_consumer(redis_manager, consumer_name)
+    await consumer.start()
+    try:
+        if duration:
+            await asyncio.sleep(duration)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        await consumer.stop()
+        await redis_manager.disconnect()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Drain the feedback stream into partitioned Parquet files")
+    parser.add_argument('--consumer', default=None, help='consumer name within the group (default host-pid)')
+    parser.add_argument('--duration', type=float, default=None, help='stop after this many seconds')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(run_consumer(args.consumer, args.duration))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
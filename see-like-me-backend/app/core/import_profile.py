@@ -0,0 +1,95 @@
+"""Import-time profile of the backend's cold start
+
+    python -m app.core.import_profile --module app.main --output import_profile.json
+
+Imports the module in a fresh interpreter under ``python -X importtime``
+(optionally also loading the models) and writes a report with every
+module's self and cumulative import cost, plus totals per top-level package.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Any
+
+# Run after the target import when --load-models is given. Loads serially:
+# imports racing in the detector's loader threads garble -X importtime output
+LOAD_MODELS_SNIPPET = (
+    "from app.models.disability_detector import DisabilityDetectionSystem, CONDITIONS; "
+    "detector = DisabilityDetectionSystem(); [detector.load_condition(c) for c in CONDITIONS]"
+)
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Rows of ``-X importtime`` output as dicts, in import order"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000
+        })
+    return rows
+
+
+def profile_imports(module: str, load_models: bool = False) -> Dict[str, Any]:
+    """Import ``module`` in a child interpreter and summarize where the time went"""
+    code = f"import {module}"
+    if load_models:
+        code += f"; {LOAD_MODELS_SNIPPET}"
+
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, env=dict(os.environ, PYTHONWARNINGS='ignore')
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    rows = parse_importtime(completed.stderr)
+    packages: Dict[str, float] = defaultdict(float)
+    for row in rows:
+        packages[row['module'].split('.')[0]] += row['self_ms']
+
+    return {
+        'module': module,
+        'load_models': load_models,
+        'python': sys.version.split()[0],
+        'created_at': datetime.now().isoformat(),
+        'total_ms': round(sum(row['self_ms'] for row in rows), 3),
+        'module_count': len(rows),
+        'packages': {
+            name: round(ms, 3) for name, ms in sorted(packages.items(), key=lambda item: -item[1])
+        },
+        'modules': sorted(rows, key=lambda row: -row['cumulative_ms'])
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Profile the import cost of the backend's cold start")
+    parser.add_argument('--module', default='app.main')
+    parser.add_argument('--output', default='import_profile.json')
+    parser.add_argument('--load-models', action='store_true',
+                        help='also load the models, counting the libraries their artifacts import')
+    parser.add_argument('--top', type=int, default=15, help='packages to print')
+    args = parser.parse_args(argv)
+
+    report = profile_imports(args.module, args.load_models)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"⏱️ import {args.module}: {report['total_ms']:.0f}ms across {report['module_count']} modules")
+    for name, ms in list(report['packages'].items())[:args.top]:
+        print(f"   {name:<24} {ms:9.1f}ms")
+    print(f"✅ Report written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
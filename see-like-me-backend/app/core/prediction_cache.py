@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import json
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Awaitable, Set
+
+logger = logging.getLogger(__name__)
+
+
+class LocalTTLCache:
+    """In-process LRU cache whose entries also expire after ``ttl`` seconds"""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PredictionCache:
+    """Detection results keyed by the quantized assessment and the model version
+
+    Lookups go to the in-process tier, then Redis (through RedisManager), and
+    only then to the detector. Concurrent misses for the same key share one
+    computation. Cached results are shared between callers and must not be
+    mutated.
+
+    With ``write_back=False`` a fresh result is not written to Redis here;
+    the caller claims the write with ``take_pending_write`` and sends it in
+    its own pipeline (see RedisManager.store_detection).
+    """
+
+    def __init__(self, redis_manager, max_entries: int = 10000, ttl: int = 300, decimals: int = 3):
+        self.redis_manager = redis_manager
+        self.local = LocalTTLCache(max_entries=max_entries, ttl=ttl)
+        self.ttl = ttl
+        self.decimals = decimals
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._pending_writes: Set[str] = set()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def make_key(self, assessment: Dict[str, Dict[str, Any]], model_version: str) -> str:
+        """Canonical hash of the quantized assessment plus the model version"""
+        canonical = [model_version]
+        for group in sorted(assessment):
+            features = assessment[group]
+            canonical.append([group, [[name, round(float(features[name]), self.decimals)] for name in sorted(features)]])
+        digest = hashlib.blake2b(json.dumps(canonical, separators=(',', ':')).encode(), digest_size=16)
+        return digest.hexdigest()
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Dict]], write_back: bool = True) -> Dict:
+        """Return the cached result for ``key``, computing it once if no tier has it"""
+        result = self.local.get(key)
+        if result is not None:
+            self.local_hits += 1
+            return result
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+        else:
+            # Detached from the caller: a cancelled request leaves it running for the others
+            in_flight = asyncio.ensure_future(self._fill(key, compute, write_back))
+            self._in_flight[key] = in_flight
+            in_flight.add_done_callback(lambda task: self._finished(key, task))
+        return await asyncio.shield(in_flight)
+
+    async def _fill(self, key: str, compute: Callable[[], Awaitable[Dict]], write_back: bool) -> Dict:
+        result = await self.redis_manager.get_cached_prediction(key)
+        if result is not None:
+            self.redis_hits += 1
+        else:
+            self.misses += 1
+            result = await compute()
+            if write_back:
+                await self.redis_manager.cache_model_prediction(key, result, ttl=self.ttl)
+            else:
+                self._pending_writes.add(key)
+        self.local.set(key, result)
+        return result
+
+    def take_pending_write(self, key: str) -> bool:
+        """True once for a key computed with ``write_back=False``: the caller now owes the Redis write"""
+        if key in self._pending_writes:
+            self._pending_writes.discard(key)
+            return True
+        return False
+
+    def _finished(self, key: str, task: asyncio.Future):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Every caller may have gone; don't let an unobserved failure warn at shutdown
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss and eviction counters for monitoring"""
+        lookups = self.local_hits + self.redis_hits + self.misses + self.coalesced
+        return {
+            "entries": len(self.local),
+            "max_entries": self.local.max_entries,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0,
+            "evictions": self.local.evictions,
+            "expirations": self.local.expirations,
+            "in_flight": len(self._in_flight),
+            "pending_writes": len(self._pending_writes)
+        }
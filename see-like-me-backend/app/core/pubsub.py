@@ -0,0 +1,328 @@
+"""Cross-worker delivery of WebSocket messages
+
+Every worker process is a node with its own id. A node claims the sessions
+it holds sockets for in an ownership index and listens on its own channel;
+a message for a session is delivered locally when this node holds one of its
+sockets and published to every other node that claimed the session.
+Broadcasts are published once on a shared channel.
+
+``RedisBus`` uses Redis pub/sub (ownership in one sorted set per session,
+scored by expiry, so a crashed node drops out of it on its own);
+``InMemoryBus`` is the single-process stand-in, and several of them sharing
+an ``InMemoryHub`` behave like separate workers in tests.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Dict, Any, Callable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.redis_client import pack, unpack
+
+logger = logging.getLogger(__name__)
+
+OWNERS_KEY = "ws:owners:{}"
+NODE_CHANNEL = "ws:node:{}"
+BROADCAST_CHANNEL = "ws:broadcast"
+
+
+def new_node_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class MessageBus:
+    """Routes WebSocket messages to the nodes holding each session's sockets
+
+    ``publish``, ``broadcast``, ``claim`` and ``release`` only queue; a
+    flusher applies ownership changes, looks up the owners of every queued
+    session in one round trip and sends one packed batch per owning node.
+    """
+
+    def __init__(self, node_id: Optional[str] = None, batch_ms: float = 2.0, batch_size: int = 500,
+                 ownership_ttl: float = 90.0):
+        self.node_id = node_id or new_node_id()
+        self.batch_wait = batch_ms / 1000.0
+        self.batch_size = batch_size
+        self.ownership_ttl = ownership_ttl
+        self.owned: Set[str] = set()
+        self._deliver: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+        self._outbox: List[Tuple[Optional[str], str, Any]] = []
+        self._claims: Set[str] = set()
+        self._releases: Set[str] = set()
+        self._ready: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self.published = 0
+        self.batches = 0
+        self.received = 0
+        self.errors = 0
+
+    async def start(self, deliver: Callable[[List[Dict[str, Any]]], None]):
+        """Start listening; ``deliver`` gets the messages other nodes sent to this one"""
+        self._deliver = deliver
+        self._ready = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._flush_loop()), asyncio.create_task(self._refresh_loop()),
+                       asyncio.create_task(self._listen())]
+        logger.info(f"📡 WebSocket bus {type(self).__name__} started (node {self.node_id})")
+
+    async def stop(self):
+        """Flush what is queued, give up every claimed session and stop"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._releases |= self.owned
+        self.owned.clear()
+        try:
+            await self._flush()
+        except Exception as e:
+            logger.warning(f"Final WebSocket bus flush failed: {str(e)}")
+
+    def publish(self, session_id: str, kind: str, data: Any):
+        """Queue a message for the session's sockets held by other nodes"""
+        self._queue((session_id, kind, data))
+
+    def broadcast(self, kind: str, data: Any):
+        """Queue a message for every other node's sockets"""
+        self._queue((None, kind, data))
+
+    def claim(self, session_id: str):
+        """This node now holds a socket of the session"""
+        self.owned.add(session_id)
+        self._releases.discard(session_id)
+        self._claims.add(session_id)
+        self._wake()
+
+    def release(self, session_id: str):
+        """This node no longer holds any socket of the session"""
+        self.owned.discard(session_id)
+        self._claims.discard(session_id)
+        self._releases.add(session_id)
+        self._wake()
+
+    def _queue(self, item: Tuple[Optional[str], str, Any]):
+        self._outbox.append(item)
+        self._wake()
+
+    def _wake(self):
+        if self._ready:
+            self._ready.set()
+
+    def _receive(self, payload: bytes):
+        envelope = unpack(payload)
+        if envelope["origin"] == self.node_id:
+            return  # our own broadcast, already delivered locally
+        self.received += len(envelope["messages"])
+        self._deliver(envelope["messages"])
+
+    async def _flush_loop(self):
+        while True:
+            await self._ready.wait()
+            # Let a burst build up into one batch
+            if len(self._outbox) < self.batch_size:
+                await asyncio.sleep(self.batch_wait)
+            self._ready.clear()
+            try:
+                await self._flush()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"WebSocket bus flush failed: {str(e)}")
+
+    async def _flush(self):
+        claims, self._claims = self._claims, set()
+        releases, self._releases = self._releases, set()
+        if claims or releases:
+            await self._set_ownership(claims, releases)
+
+        while self._outbox:
+            batch, self._outbox = self._outbox[:self.batch_size], self._outbox[self.batch_size:]
+            session_ids = list({session_id for session_id, _, _ in batch if session_id is not None})
+            owners = await self._owners(session_ids) if session_ids else {}
+
+            by_node: Dict[str, List[Dict[str, Any]]] = {}
+            broadcasts = []
+            for session_id, kind, data in batch:
+                message = {"session_id": session_id, "kind": kind, "data": data}
+                if session_id is None:
+                    broadcasts.append(message)
+                    continue
+                for node in owners.get(session_id, ()):
+                    if node != self.node_id:
+                        by_node.setdefault(node, []).append(message)
+
+            if by_node:
+                await self._send({node: self._envelope(messages) for node, messages in by_node.items()})
+            if broadcasts:
+                await self._send_broadcast(self._envelope(broadcasts))
+            self.published += len(batch)
+            self.batches += 1
+
+    def _envelope(self, messages: List[Dict[str, Any]]) -> bytes:
+        return pack({"origin": self.node_id, "messages": messages})
+
+    async def _refresh_loop(self):
+        # Claims expire unless renewed, so a node that dies stops receiving messages
+        while True:
+            await asyncio.sleep(self.ownership_ttl / 3)
+            self._claims |= self.owned
+            self._wake()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "bus": type(self).__name__,
+            "node_id": self.node_id,
+            "owned_sessions": len(self.owned),
+            "queued": len(self._outbox),
+            "published": self.published,
+            "batches": self.batches,
+            "received": self.received,
+            "errors": self.errors
+        }
+
+    # Transport: implemented by subclasses
+    async def _set_ownership(self, claims: Set[str], releases: Set[str]):
+        raise NotImplementedError
+
+    async def _owners(self, session_ids: List[str]) -> Dict[str, List[str]]:
+        raise NotImplementedError
+
+    async def _send(self, payloads: Dict[str, bytes]):
+        raise NotImplementedError
+
+    async def _send_broadcast(self, payload: bytes):
+        raise NotImplementedError
+
+    async def _listen(self):
+        raise NotImplementedError
+
+
+class InMemoryHub:
+    """What Redis holds for RedisBus: the ownership index and the subscribed nodes"""
+
+    def __init__(self):
+        self.owners: Dict[str, Dict[str, float]] = {}
+        self.nodes: Dict[str, "InMemoryBus"] = {}
+
+
+_default_hub = InMemoryHub()
+
+
+class InMemoryBus(MessageBus):
+    """In-process stand-in for RedisBus; reaches only the nodes on the same hub"""
+
+    def __init__(self, hub: Optional[InMemoryHub] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.hub = hub or _default_hub
+
+    async def _set_ownership(self, claims: Set[str], releases: Set[str]):
+        expires = time.time() + self.ownership_ttl
+        for session_id in claims:
+            self.hub.owners.setdefault(session_id, {})[self.node_id] = expires
+        for session_id in releases:
+            nodes = self.hub.owners.get(session_id, {})
+            nodes.pop(self.node_id, None)
+            if not nodes:
+                self.hub.owners.pop(session_id, None)
+
+    async def _owners(self, session_ids: List[str]) -> Dict[str, List[str]]:
+        now = time.time()
+        return {
+            session_id: [node for node, expires in self.hub.owners.get(session_id, {}).items() if expires > now]
+            for session_id in session_ids
+        }
+
+    async def _send(self, payloads: Dict[str, bytes]):
+        for node, payload in payloads.items():
+            if node in self.hub.nodes:
+                self.hub.nodes[node]._receive(payload)
+
+    async def _send_broadcast(self, payload: bytes):
+        for node in list(self.hub.nodes.values()):
+            node._receive(payload)
+
+    async def _listen(self):
+        self.hub.nodes[self.node_id] = self
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.hub.nodes.pop(self.node_id, None)
+
+
+class RedisBus(MessageBus):
+    """Redis pub/sub between every worker and node sharing the Redis server"""
+
+    def __init__(self, redis_client, **kwargs):
+        super().__init__(**kwargs)
+        self.redis = redis_client
+
+    async def _set_ownership(self, claims: Set[str], releases: Set[str]):
+        now = time.time()
+        ttl = int(self.ownership_ttl) + 1
+        pipe = self.redis.pipeline(transaction=False)
+        for session_id in claims:
+            key = OWNERS_KEY.format(session_id)
+            pipe.zadd(key, {self.node_id: now + self.ownership_ttl})
+            pipe.zremrangebyscore(key, "-inf", now)  # nodes that stopped renewing
+            pipe.expire(key, ttl)
+        for session_id in releases:
+            pipe.zrem(OWNERS_KEY.format(session_id), self.node_id)
+        await pipe.execute()
+
+    async def _owners(self, session_ids: List[str]) -> Dict[str, List[str]]:
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.zrangebyscore(OWNERS_KEY.format(session_id), now, "+inf")
+        results = await pipe.execute()
+        return {
+            session_id: [node.decode() if isinstance(node, bytes) else node for node in nodes]
+            for session_id, nodes in zip(session_ids, results)
+        }
+
+    async def _send(self, payloads: Dict[str, bytes]):
+        pipe = self.redis.pipeline(transaction=False)
+        for node, payload in payloads.items():
+            pipe.publish(NODE_CHANNEL.format(node), payload)
+        await pipe.execute()
+
+    async def _send_broadcast(self, payload: bytes):
+        await self.redis.publish(BROADCAST_CHANNEL, payload)
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(NODE_CHANNEL.format(self.node_id), BROADCAST_CHANNEL)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        try:
+                            self._receive(message["data"])
+                        except Exception as e:
+                            logger.error(f"Dropped a malformed WebSocket bus message: {str(e)}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"WebSocket bus subscription lost: {str(e)}; resubscribing")
+                await asyncio.sleep(1.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+def create_bus(redis_manager) -> Optional[MessageBus]:
+    """The bus WS_BUS asks for: Redis when it is connected, else the in-process stand-in"""
+    options = dict(batch_ms=settings.WS_BUS_BATCH_MS, batch_size=settings.WS_BUS_BATCH_SIZE,
+                   ownership_ttl=settings.WS_OWNERSHIP_TTL_SECONDS)
+    if settings.WS_BUS == "none":
+        return None
+    if settings.WS_BUS in ("redis", "auto") and redis_manager.is_connected():
+        return RedisBus(redis_manager.redis_client, **options)
+    if settings.WS_BUS == "redis":
+        logger.warning("⚠️ WS_BUS=redis but Redis is not connected; WebSocket messages stay in this worker")
+    return InMemoryBus(**options)
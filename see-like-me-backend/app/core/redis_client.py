@@ -1,100 +1,310 @@
-import redis.asyncio as redis
-import json
-import asyncio
+import msgpack
+import numpy as np
 from typing import Dict, Any, Optional, List
 import logging
 from app.core.config import settings
+from app.core.session_store import LocalSessionStore
+from app.core.feedback_log import LocalFeedbackLog, LOCAL_ID_PREFIX
+from app.core.feedback_pipeline import validate_feedback
 
 logger = logging.getLogger(__name__)
 
+SESSION_KEY = "session:{}"
+FEEDBACK_KEY = "feedback:{}"
+FEEDBACK_STREAM_KEY = "feedback_stream"
+PREDICTION_KEY = "prediction:{}"
+
+
+def _encode_default(value):
+    """msgpack fallback for NumPy scalars and arrays in detection results"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def pack(data: Any) -> bytes:
+    return msgpack.packb(data, default=_encode_default, use_bin_type=True)
+
+
+def unpack(payload: bytes) -> Any:
+    return msgpack.unpackb(payload, raw=False)
+
+
 class RedisManager:
+    """Session, feedback and prediction storage in Redis
+
+    One shared connection pool (hiredis parses replies when installed),
+    msgpack-encoded values, and pipelines for writes touching several keys.
+    Sessions fall back to a bounded in-process store and feedback to a local
+    append-only log while Redis is disabled or unreachable; predictions are
+    simply not cached.
+    """
+
     def __init__(self):
-        self.redis_client: Optional[redis.Redis] = None
+        self.pool = None
+        self.redis_client = None
         self.connected = False
-        self.disabled = True  # DISABLE REDIS
-    
+        self.disabled = not settings.REDIS_ENABLED
+        self.local_sessions = LocalSessionStore(
+            pack, unpack,
+            max_entries=settings.LOCAL_SESSION_MAX_ENTRIES,
+            max_bytes=settings.LOCAL_SESSION_MAX_BYTES,
+            ttl=settings.SESSION_TIMEOUT
+        )
+        self.feedback_log = LocalFeedbackLog(settings.FEEDBACK_LOG_DIR, pack)
+        self._feedback_group_ready = False
+        self._feedback_recovered = set()  # consumers whose pending entries were re-read
+        self._feedback_recovery_cursor: Dict[str, str] = {}  # last pending entry re-read, per consumer
+
     async def connect(self):
-        """Skip Redis connection - disabled for local development"""
+        """Open the shared connection pool and check the server answers"""
         if self.disabled:
             logger.info("⚠️ Redis disabled - running without caching (backend works fine)")
             self.connected = False
             return
-        
-        # Original connection code (not used when disabled)
+
+        import redis.asyncio as redis
+        from redis.utils import HIREDIS_AVAILABLE
+
         try:
-            self.redis_client = redis.Redis(
+            self.pool = redis.ConnectionPool(
                 host=settings.REDIS_HOST,
                 port=settings.REDIS_PORT,
                 password=settings.REDIS_PASSWORD,
                 db=settings.REDIS_DB,
-                decode_responses=True,
-                socket_connect_timeout=5,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
                 socket_keepalive=True,
                 health_check_interval=30
             )
-            
+            self.redis_client = redis.Redis(connection_pool=self.pool)
+
             await self.redis_client.ping()
             self.connected = True
-            logger.info("✅ Redis connection established")
-            
+            logger.info(f"✅ Redis connection established (pool of {settings.REDIS_MAX_CONNECTIONS}, "
+                        f"{'hiredis' if HIREDIS_AVAILABLE else 'python'} parser)")
+
         except Exception as e:
             logger.error(f"❌ Redis connection failed: {str(e)}")
             self.connected = False
-    
+
     async def disconnect(self):
-        """Nothing to disconnect when disabled"""
-        if self.disabled:
-            return
-        
+        """Close the client and its connection pool"""
+        self.feedback_log.close()
         if self.redis_client:
-            await self.redis_client.close()
+            await self.redis_client.aclose()
+            await self.pool.disconnect()
             self.connected = False
             logger.info("Redis connection closed")
-    
+
     def is_connected(self) -> bool:
-        """Always return False when disabled"""
         return False if self.disabled else self.connected
-    
+
     async def store_session_data(self, session_id: str, data: Dict[str, Any], ttl: int = None):
-        """Skip storage when disabled"""
-        if self.disabled:
-            logger.debug("Redis disabled - session data not cached (backend works fine)")
+        """Store a session's detection results, expiring after SESSION_TIMEOUT"""
+        await self.store_sessions({session_id: data}, ttl=ttl)
+
+    async def store_sessions(self, sessions: Dict[str, Dict[str, Any]], ttl: int = None):
+        """Store many sessions' detection results in one round trip"""
+        if not sessions:
+            return
+
+        if self.is_connected():
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for session_id, data in sessions.items():
+                        pipe.set(SESSION_KEY.format(session_id), pack(data), ex=ttl or settings.SESSION_TIMEOUT)
+                    await pipe.execute()
+                return
+            except Exception as e:
+                logger.error(f"Failed to store {len(sessions)} session(s) in Redis, keeping them locally: {str(e)}")
+
+        for session_id, data in sessions.items():
+            self.local_sessions.set(session_id, data, ttl=ttl)
+
+    async def store_detection(self, session_id: str, results: Dict[str, Any], assessment: Dict[str, Any],
+                              prediction_key: Optional[str] = None, prediction_ttl: int = 300):
+        """Store a session's detection results and, given its key, cache them as a prediction: one round trip
+
+        The session also keeps the flat ``assessment`` that was scored, which
+        feedback for the session is stored with (see app.core.feedback_pipeline).
+        """
+        session = dict(results, assessment=assessment)
+        if prediction_key is None or not self.is_connected():
+            await self.store_session_data(session_id, session)
             return
-        
-        # Original storage code...
-    
+
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.set(SESSION_KEY.format(session_id), pack(session), ex=settings.SESSION_TIMEOUT)
+                pipe.set(PREDICTION_KEY.format(prediction_key), pack(results), ex=prediction_ttl)
+                await pipe.execute()
+            return
+        except Exception as e:
+            logger.error(f"Failed to store detection for session {session_id} in Redis, keeping it locally: {str(e)}")
+
+        self.local_sessions.set(session_id, session)
+
     async def get_session_data(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Return None when disabled"""
-        if self.disabled:
-            return None
-        
-        # Original retrieval code...
-    
+        """Return a session's stored detection results, or None"""
+        if self.is_connected():
+            try:
+                payload = await self.redis_client.get(SESSION_KEY.format(session_id))
+                if payload:
+                    return unpack(payload)
+            except Exception as e:
+                logger.error(f"Failed to read session {session_id} from Redis: {str(e)}")
+
+        # Sessions stored while Redis was unavailable
+        return self.local_sessions.get(session_id)
+
     async def store_feedback(self, session_id: str, feedback: Dict[str, Any]):
-        """Skip feedback storage when disabled"""
-        if self.disabled:
-            logger.debug("Redis disabled - feedback not cached")
+        """Append feedback to the session and the feedback stream, refreshing the session's TTL
+
+        One pipelined round trip (XADD is O(1)); consumers turn the stream
+        into Parquet files, see app.core.feedback_pipeline. Raises
+        InvalidFeedbackError for feedback that does not fit FEEDBACK_COLUMNS.
+        """
+        record = dict(validate_feedback(feedback), session_id=session_id)
+        self.local_sessions.touch(session_id)
+
+        if self.is_connected():
+            payload = pack(record)
+            feedback_key = FEEDBACK_KEY.format(session_id)
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.rpush(feedback_key, payload)
+                    pipe.expire(feedback_key, settings.SESSION_TIMEOUT)
+                    pipe.expire(SESSION_KEY.format(session_id), settings.SESSION_TIMEOUT)
+                    pipe.xadd(FEEDBACK_STREAM_KEY, {'data': payload},
+                              maxlen=settings.FEEDBACK_STREAM_MAXLEN, approximate=True)
+                    await pipe.execute()
+                return
+            except Exception as e:
+                logger.error(f"Failed to store feedback for session {session_id} in Redis, logging it locally: {str(e)}")
+
+        self.feedback_log.append(record)
+
+    async def _ensure_feedback_group(self):
+        if self._feedback_group_ready:
             return
-        
-        # Original feedback storage code...
-    
-    async def get_feedback_batch(self, batch_size: int = 100) -> List[Dict[str, Any]]:
-        """Return empty list when disabled"""
-        if self.disabled:
+        try:
+            await self.redis_client.xgroup_create(
+                FEEDBACK_STREAM_KEY, settings.FEEDBACK_CONSUMER_GROUP, id='0', mkstream=True
+            )
+        except Exception as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._feedback_group_ready = True
+
+    async def get_feedback_batch(self, batch_size: int = 100, consumer: str = "default",
+                                 block_ms: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Read up to ``batch_size`` feedback records for a consumer in the feedback group
+
+        Records carry an ``_id`` to pass to ack_feedback once they are
+        processed. Entries logged locally during a Redis outage come first;
+        a consumer's first reads page through whatever it left
+        unacknowledged before it moves on to new entries. Entries trimmed
+        from the stream meanwhile are acknowledged here; ones that don't
+        decode come back as ``{"undecodable": <hex>}`` for the sink to
+        dead-letter.
+        """
+        records = self.feedback_log.read_batch(batch_size)
+        if records or not self.is_connected():
+            return records
+
+        try:
+            await self._ensure_feedback_group()
+            recovering = consumer not in self._feedback_recovered
+            start_id = self._feedback_recovery_cursor.get(consumer, '0') if recovering else '>'
+            response = await self.redis_client.xreadgroup(
+                settings.FEEDBACK_CONSUMER_GROUP, consumer, {FEEDBACK_STREAM_KEY: start_id},
+                count=batch_size, block=None if recovering else block_ms
+            )
+        except Exception as e:
+            logger.error(f"Failed to read feedback batch: {str(e)}")
             return []
-        
-        # Original feedback retrieval code...
-    
+
+        entries = [entry for _, stream_entries in response or [] for entry in stream_entries]
+        if recovering:
+            if entries:
+                # The next page of this consumer's pending entries starts after this one
+                last_id = entries[-1][0]
+                self._feedback_recovery_cursor[consumer] = last_id.decode() if isinstance(last_id, bytes) else last_id
+            else:
+                self._feedback_recovered.add(consumer)
+                self._feedback_recovery_cursor.pop(consumer, None)
+
+        trimmed = []
+        for entry_id, fields in entries:
+            entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+            if not fields:
+                # Trimmed by MAXLEN while pending: nothing left to write
+                trimmed.append(entry_id)
+                continue
+            payload = fields.get(b'data')
+            try:
+                record = unpack(payload)
+                if not isinstance(record, dict):
+                    raise TypeError(f"expected a map, got {type(record).__name__}")
+            except Exception as e:
+                logger.error(f"Feedback entry {entry_id} does not decode: {str(e)}")
+                record = {'undecodable': payload.hex() if isinstance(payload, bytes) else repr(payload)}
+            record['_id'] = entry_id
+            records.append(record)
+        if trimmed:
+            await self.ack_feedback(trimmed)
+        return records
+
+    async def ack_feedback(self, ids: List[str]):
+        """Acknowledge processed feedback records and drop them from the stream or log"""
+        local_ids = [record_id for record_id in ids if record_id.startswith(LOCAL_ID_PREFIX)]
+        stream_ids = [record_id for record_id in ids if not record_id.startswith(LOCAL_ID_PREFIX)]
+        self.feedback_log.ack(local_ids)
+        if not stream_ids or not self.is_connected():
+            return
+
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.xack(FEEDBACK_STREAM_KEY, settings.FEEDBACK_CONSUMER_GROUP, *stream_ids)
+                pipe.xdel(FEEDBACK_STREAM_KEY, *stream_ids)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to acknowledge {len(stream_ids)} feedback records: {str(e)}")
+
     async def cache_model_prediction(self, input_hash: str, prediction: Dict[str, Any], ttl: int = 300):
-        """Skip caching when disabled"""
-        if self.disabled:
+        """Cache a prediction under its input hash"""
+        if not self.is_connected():
             return
-        
-        # Original caching code...
-    
+
+        try:
+            await self.redis_client.set(PREDICTION_KEY.format(input_hash), pack(prediction), ex=ttl)
+        except Exception as e:
+            logger.error(f"Failed to cache prediction {input_hash}: {str(e)}")
+
     async def get_cached_prediction(self, input_hash: str) -> Optional[Dict[str, Any]]:
-        """Return None when disabled"""
-        if self.disabled:
+        """Return a cached prediction, or None"""
+        if not self.is_connected():
             return None
-        
-        # Original cache retrieval code...
+
+        try:
+            payload = await self.redis_client.get(PREDICTION_KEY.format(input_hash))
+            return unpack(payload) if payload else None
+        except Exception as e:
+            logger.error(f"Failed to read cached prediction {input_hash}: {str(e)}")
+            return None
+
+    def get_session_store_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis" if self.is_connected() else "local",
+            "local": self.local_sessions.get_stats()
+        }
+
+    def get_feedback_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis" if self.is_connected() else "local",
+            "local_log": self.feedback_log.get_stats()
+        }
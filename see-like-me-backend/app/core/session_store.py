@@ -0,0 +1,93 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class SessionRecord:
+    """One stored session: its encoded results and when they expire"""
+
+    __slots__ = ('payload', 'expires_at')
+
+    def __init__(self, payload: bytes, expires_at: float):
+        self.payload = payload
+        self.expires_at = expires_at
+
+
+class LocalSessionStore:
+    """In-process session store used while Redis is disabled or unreachable
+
+    Sessions are kept as encoded bytes (msgpack, like in Redis) rather than
+    nested result dicts, expire after ``ttl`` seconds, and the least recently
+    used ones are evicted once either ``max_entries`` or ``max_bytes`` is
+    exceeded, so memory stays bounded however many sessions come through.
+    """
+
+    def __init__(self, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any],
+                 max_entries: int = 10000, max_bytes: int = 32 * 1024 * 1024, ttl: int = 3600):
+        self.encode = encode
+        self.decode = decode
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._records: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self.total_bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def set(self, session_id: str, data: Dict[str, Any], ttl: Optional[int] = None):
+        payload = self.encode(data)
+        if len(payload) > self.max_bytes:
+            logger.warning(f"Session {session_id} ({len(payload)} bytes) exceeds the local store budget; not stored")
+            return
+
+        self._discard(session_id)
+        self._records[session_id] = SessionRecord(payload, time.monotonic() + (ttl or self.ttl))
+        self.total_bytes += len(payload)
+        now = time.monotonic()
+        while len(self._records) > self.max_entries or self.total_bytes > self.max_bytes:
+            # Least recently used first; with one TTL these are also the first to expire
+            _, record = self._records.popitem(last=False)
+            self.total_bytes -= len(record.payload)
+            if record.expires_at < now:
+                self.expirations += 1
+            else:
+                self.evictions += 1
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        record = self._records.get(session_id)
+        if record is None:
+            return None
+        if record.expires_at < time.monotonic():
+            self._discard(session_id)
+            self.expirations += 1
+            return None
+        self._records.move_to_end(session_id)
+        return self.decode(record.payload)
+
+    def touch(self, session_id: str, ttl: Optional[int] = None):
+        """Extend a live session's expiry, like EXPIRE"""
+        record = self._records.get(session_id)
+        if record is not None and record.expires_at >= time.monotonic():
+            record.expires_at = time.monotonic() + (ttl or self.ttl)
+            self._records.move_to_end(session_id)
+
+    def _discard(self, session_id: str):
+        record = self._records.pop(session_id, None)
+        if record is not None:
+            self.total_bytes -= len(record.payload)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._records),
+            "max_entries": self.max_entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
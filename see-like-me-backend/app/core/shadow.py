@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from app.models.disability_detector import CONDITIONS
+
+logger = logging.getLogger(__name__)
+
+
+def _lower_thread_priority():
+    # Linux applies nice values per thread; elsewhere the worker keeps normal priority
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+class ShadowScorer:
+    """Scores a sample of served assessments with a candidate model, off the request path
+
+    ``submit`` never waits: a sampled assessment is queued together with the
+    results the user was served, and dropped when the queue is full. One
+    low-priority background thread drains the queue in batches and records,
+    per condition, how often the candidate's prediction differs from the
+    served one and how long the candidate took.
+    """
+
+    def __init__(self, candidate, version: str, sample_rate: float = 0.1, max_queue_depth: int = 256,
+                 max_batch_size: int = 32, window: int = 2048):
+        self.candidate = candidate
+        self.version = version
+        self.sample_rate = sample_rate
+        self.max_queue_depth = max_queue_depth
+        self.max_batch_size = max_batch_size
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.sampled = 0
+        self.dropped = 0
+        self.failed = 0
+        self.rows_scored = 0
+        self.disagreements = {condition: 0 for condition in CONDITIONS}
+        self.probability_error = {condition: 0.0 for condition in CONDITIONS}
+        # Candidate time per row of each batch, most recent ``window`` batches
+        self.latency_ms = {condition: deque(maxlen=window) for condition in CONDITIONS}
+
+    async def start(self):
+        """Load the candidate and start the background worker"""
+        await self.candidate.load_models()
+        self.queue = asyncio.Queue(maxsize=self.max_queue_depth)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow",
+                                        initializer=_lower_thread_priority)
+        self._worker = asyncio.create_task(self._run())
+        logger.info(f"👥 Shadow scoring {self.sample_rate:.0%} of detections with {self.version} "
+                    f"(queue_depth={self.max_queue_depth})")
+
+    async def stop(self):
+        """Stop the worker; queued samples are discarded"""
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def submit(self, assessment: Dict[str, Dict[str, Any]], served: Dict[str, Dict]) -> bool:
+        """Maybe queue one served assessment for the candidate; True if it was queued"""
+        if self.queue is None or random.random() >= self.sample_rate:
+            return False
+        self.sampled += 1
+        try:
+            self.queue.put_nowait((assessment, served))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    def _score(self, batch: List[Tuple[Dict, Dict]]):
+        """Runs on the shadow thread"""
+        matrices, autism_answers = self.candidate.feature_matrices([assessment for assessment, _ in batch])
+        for condition in CONDITIONS:
+            start = time.perf_counter()
+            if condition in matrices:
+                probability = self.candidate.predict_matrices({condition: matrices[condition]})[condition]
+            else:
+                probability = self.candidate.autism_lookup.lookup(autism_answers)
+            self.latency_ms[condition].append((time.perf_counter() - start) * 1000 / len(batch))
+
+            served = np.array([results[condition]['probability'] for _, results in batch])
+            self.disagreements[condition] += int(np.sum((probability >= 0.5) != (served >= 0.5)))
+            self.probability_error[condition] += float(np.sum(np.abs(probability - served)))
+        self.rows_scored += len(batch)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.max_batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await loop.run_in_executor(self._pool, self._score, batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning(f"Shadow scoring of {len(batch)} assessments failed: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Candidate vs. served model, per condition"""
+        conditions = {}
+        for condition in CONDITIONS:
+            latency = np.asarray(self.latency_ms[condition])
+            conditions[condition] = {
+                "disagreement_rate": self.disagreements[condition] / self.rows_scored if self.rows_scored else None,
+                "mean_abs_probability_delta": (self.probability_error[condition] / self.rows_scored
+                                               if self.rows_scored else None),
+                "candidate_latency_ms_per_row": {
+                    "p50": round(float(np.percentile(latency, 50)), 4),
+                    "p90": round(float(np.percentile(latency, 90)), 4),
+                    "p99": round(float(np.percentile(latency, 99)), 4)
+                } if len(latency) else None
+            }
+        return {
+            "candidate_version": self.version,
+            "candidate_model_version": self.candidate.model_version or None,
+            "sample_rate": self.sample_rate,
+            "sampled": self.sampled,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "rows_scored": self.rows_scored,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "conditions": conditions
+        }
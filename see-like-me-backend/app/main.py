@@ -1,17 +1,25 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-import uvicorn
+from pydantic import ValidationError
 import asyncio
-import json
 import os
-from typing import Dict, List, Optional
+import time
+from typing import Dict, List, Optional, Any
 import logging
 from datetime import datetime
 
-from app.models.disability_detector import DisabilityDetectionSystem
+from app.models.disability_detector import DisabilityDetectionSystem, MODEL_FILES
+from app.models.registry import ModelRegistry
 from app.core.redis_client import RedisManager
-from app.api.websocket import ConnectionManager
+from app.core.batching import MicroBatcher, BatchQueueFullError
+from app.core.executor import InferenceExecutor, InferenceQueueFullError, InferenceTimeoutError
+from app.core.prediction_cache import PredictionCache
+from app.core.feedback_pipeline import ASSESSMENT_COLUMNS, InvalidFeedbackError, create_consumer, flatten_assessment
+from app.core.shadow import ShadowScorer
+from app.core.pubsub import create_bus
+from app.api.websocket import ConnectionManager, ClientConnection
+from app.api.schemas import AssessmentInput, BatchDetectionRequest
 from app.core.config import settings
 
 # Configure logging
@@ -34,9 +42,57 @@ app.add_middleware(
 )
 
 # Initialize systems
-detector = DisabilityDetectionSystem()
+model_registry = ModelRegistry()
+# Serve the registry's ACTIVE version, or MODEL_PATH when there is none
+detector = DisabilityDetectionSystem(model_path=model_registry.active_path() or settings.MODEL_PATH)
 redis_manager = RedisManager()
 connection_manager = ConnectionManager()
+inference_executor = InferenceExecutor(
+    kind=settings.INFERENCE_EXECUTOR,
+    max_workers=settings.INFERENCE_WORKERS,
+    max_pending=settings.INFERENCE_MAX_PENDING,
+    timeout=settings.INFERENCE_TIMEOUT_SECONDS,
+    model_path=detector.model_path
+) if settings.INFERENCE_EXECUTOR != "inline" else None
+prediction_cache = PredictionCache(
+    redis_manager,
+    max_entries=settings.PREDICTION_CACHE_MAX_ENTRIES,
+    ttl=settings.PREDICTION_CACHE_TTL,
+    decimals=settings.PREDICTION_CACHE_DECIMALS
+) if settings.PREDICTION_CACHE_ENABLED else None
+micro_batcher = MicroBatcher(
+    detector,
+    max_batch_size=settings.MICRO_BATCH_MAX_SIZE,
+    max_wait_ms=settings.MICRO_BATCH_MAX_WAIT_MS,
+    max_queue_depth=settings.MICRO_BATCH_QUEUE_DEPTH
+) if settings.MICRO_BATCHING_ENABLED else None
+feedback_consumer = create_consumer(redis_manager) if settings.FEEDBACK_CONSUMER_ENABLED else None
+shadow_scorer = ShadowScorer(
+    DisabilityDetectionSystem(model_path=model_registry.version_path(settings.SHADOW_MODEL_VERSION)),
+    settings.SHADOW_MODEL_VERSION,
+    sample_rate=settings.SHADOW_SAMPLE_RATE,
+    max_queue_depth=settings.SHADOW_QUEUE_DEPTH,
+    max_batch_size=settings.SHADOW_MAX_BATCH_SIZE,
+    window=settings.SHADOW_LATENCY_WINDOW
+) if settings.SHADOW_MODEL_VERSION else None
+
+# Liveness vs. readiness: the process answers as soon as it is up; warm-up
+# (model loading, executor pool) continues in the background
+service_state = {"started_at": time.monotonic(), "warmed_up": False, "warm_up_error": None}
+warm_up_task: Optional[asyncio.Task] = None
+
+# Hot swaps: a new version is loaded and warmed next to the serving one, then
+# the `detector` reference is swapped; in-flight requests finish on the old one
+model_state = {
+    "version": model_registry.active_version(),
+    "model_path": detector.model_path,
+    "swapping_to": None,
+    "last_swap": None,
+    "last_error": None
+}
+model_swap_lock = asyncio.Lock()
+model_swap_task: Optional[asyncio.Task] = None
+registry_watch_task: Optional[asyncio.Task] = None
 
 @app.on_event("startup")
 async def startup_event():
@@ -44,12 +100,7 @@ async def startup_event():
     logger.info("🚀 Starting See Like Me Backend with your optimized models...")
     
     # Verify your model files exist
-    required_files = [
-        'models/compatible_adhd_model.pkl',
-        'models/compatible_dyslexia_model.pkl',
-        'models/compatible_dyslexia_preprocessing.pkl',
-        'models/compatible_autism_model.pkl'
-    ]
+    required_files = detector.required_files()
     
     missing_files = []
     for file_path in required_files:
@@ -58,11 +109,16 @@ async def startup_event():
     
     if missing_files:
         logger.error(f"❌ Missing model files: {missing_files}")
-        logger.error("💡 Did you run retrain_compatible_models.py first?")
+        logger.error("💡 Did you run retrain_compatible_models.py (and app.models.convert_models for mmap, "
+                     "app.models.distillation for student/cascade) first?")
         raise FileNotFoundError(f"Required model files not found: {missing_files}")
     
-    # Load your specific models
-    await detector.load_models()
+    # Load your specific models without holding up the server
+    global warm_up_task
+    warm_up_task = asyncio.create_task(warm_up())
+    
+    if micro_batcher:
+        await micro_batcher.start()
     
     # Initialize Redis connection (disabled)
     try:
@@ -70,12 +126,144 @@ async def startup_event():
     except Exception as e:
         logger.warning(f"Redis connection failed: {e}. Running without Redis.")
     
+    # WebSocket messages reach the session's sockets on whichever worker holds them
+    await connection_manager.start(create_bus(redis_manager))
+    
+    # Drain the feedback stream into Parquet files in the background
+    if feedback_consumer:
+        await feedback_consumer.start()
+    
+    # Follow the registry's ACTIVE version (other workers may have switched it)
+    global registry_watch_task
+    if settings.MODEL_REGISTRY_POLL_SECONDS > 0:
+        registry_watch_task = asyncio.create_task(watch_registry())
+    
     logger.info("✅ Backend initialized with your optimized models!")
 
+async def warm_up():
+    """Load the models (unless lazy) and start the inference executor"""
+    try:
+        if settings.MODEL_LOADING_MODE == "eager":
+            await detector.load_models()
+        else:
+            logger.info("💤 Lazy model loading: models load on the first detection request")
+        
+        # Keep CPU-bound ensemble scoring off the event loop
+        if inference_executor:
+            await inference_executor.start()
+            detector.executor = inference_executor
+        
+        service_state["warmed_up"] = True
+        service_state["warm_up_error"] = None
+        logger.info(f"✅ Ready after {time.monotonic() - service_state['started_at']:.2f}s")
+    except Exception as e:
+        service_state["warm_up_error"] = str(e)
+        logger.error(f"❌ Warm-up failed: {str(e)}")
+        return
+    
+    # The candidate loads after the served models and never affects readiness
+    if shadow_scorer:
+        try:
+            await shadow_scorer.start()
+        except Exception as e:
+            logger.error(f"❌ Shadow model {settings.SHADOW_MODEL_VERSION} failed to load: {str(e)}")
+
+async def activate_model_version(version: str):
+    """Load, warm and swap in a registry version without interrupting requests"""
+    global detector, inference_executor
+    async with model_swap_lock:
+        if version == model_state["version"]:
+            return
+        model_state["swapping_to"] = version
+        start = time.monotonic()
+        try:
+            model_registry.verify(version)
+            new_detector = DisabilityDetectionSystem(model_path=model_registry.version_path(version))
+            await new_detector.load_models()
+            await new_detector.warm_up()
+            
+            old_executor = inference_executor
+            if inference_executor and inference_executor.kind == "process":
+                # Process workers hold their own models: warm a pool on the new version
+                new_executor = InferenceExecutor(
+                    kind="process",
+                    max_workers=settings.INFERENCE_WORKERS,
+                    max_pending=settings.INFERENCE_MAX_PENDING,
+                    timeout=settings.INFERENCE_TIMEOUT_SECONDS,
+                    model_path=new_detector.model_path
+                )
+                await new_executor.start()
+            else:
+                new_executor = inference_executor
+            new_detector.executor = new_executor
+            
+            # The swap itself: no await in between, so every request sees one version or the other
+            detector = new_detector
+            inference_executor = new_executor
+            if micro_batcher:
+                micro_batcher.detector = new_detector
+            
+            previous = model_state["version"]
+            model_state.update(version=version, model_path=new_detector.model_path, last_error=None, last_swap={
+                "from": previous,
+                "to": version,
+                "seconds": round(time.monotonic() - start, 3),
+                "at": datetime.now().isoformat()
+            })
+            logger.info(f"🔁 Swapped models {previous} -> {version} in {time.monotonic() - start:.2f}s")
+            
+            if old_executor is not new_executor:
+                asyncio.create_task(retire_executor(old_executor))
+        except Exception as e:
+            model_state["last_error"] = f"{version}: {str(e)}"
+            logger.error(f"❌ Could not activate model version {version}: {str(e)}")
+            raise
+        finally:
+            model_state["swapping_to"] = None
+
+async def retire_executor(executor: InferenceExecutor):
+    """Shut a replaced process pool down once requests still holding the old detector are done"""
+    await asyncio.sleep(settings.INFERENCE_TIMEOUT_SECONDS)
+    while executor.pending:
+        await asyncio.sleep(0.1)
+    executor.shutdown(cancel_pending=False)
+
+async def watch_registry():
+    """Swap to the registry's ACTIVE version whenever it changes"""
+    while True:
+        await asyncio.sleep(settings.MODEL_REGISTRY_POLL_SECONDS)
+        try:
+            version = model_registry.active_version()
+            if version and version != model_state["version"] and version != model_state["swapping_to"]:
+                await activate_model_version(version)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Logged by activate_model_version; retried on the next poll if ACTIVE still differs
+            await asyncio.sleep(settings.MODEL_REGISTRY_POLL_SECONDS)
+
+def require_admin(token: Optional[str]):
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup backend services"""
     logger.info("🛑 Shutting down See Like Me Backend...")
+    for task in (warm_up_task, model_swap_task, registry_watch_task):
+        if task and not task.done():
+            task.cancel()
+    if micro_batcher:
+        await micro_batcher.stop()
+    if shadow_scorer:
+        await shadow_scorer.stop()
+    if inference_executor:
+        inference_executor.shutdown()
+    if feedback_consumer:
+        await feedback_consumer.stop()
+    await connection_manager.close_all()
     await redis_manager.disconnect()
 
 @app.get("/")
@@ -86,13 +274,34 @@ async def root():
         "service": "See Like Me Backend",
         "models_loaded": detector.models_loaded,
         "redis_connected": redis_manager.is_connected(),
-        "model_versions": {
-            "adhd": "compatible_adhd_model.pkl",
-            "dyslexia": "compatible_dyslexia_model.pkl",
-            "autism": "compatible_autism_model.pkl"
-        }
+        "model_version": model_state["version"],
+        "model_files": MODEL_FILES
     }
 
+@app.get("/livez")
+async def livez():
+    """Liveness probe: the process is up and serving the event loop"""
+    return {
+        "status": "alive",
+        "uptime_seconds": round(time.monotonic() - service_state["started_at"], 3)
+    }
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness probe: 200 once models (or, in lazy mode, the executor) are ready, else 503"""
+    ready = service_state["warmed_up"]
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "loading_mode": settings.MODEL_LOADING_MODE,
+            "uptime_seconds": round(time.monotonic() - service_state["started_at"], 3),
+            "warm_up_error": service_state["warm_up_error"],
+            "executor": inference_executor.kind if inference_executor else "inline",
+            **detector.get_load_status()
+        }
+    )
+
 @app.post("/api/v1/detect/comprehensive")
 async def comprehensive_detection(
     # Dyslexia assessment data
@@ -153,19 +362,13 @@ async def comprehensive_detection(
             'change_resistance': change_resistance
         }
         
-        # Run detection with your optimized models
-        results = await detector.detect_all_disabilities(
-            dyslexia_features=dyslexia_features,
-            adhd_features=adhd_features,
-            autism_assessment=autism_assessment,
-            user_age=user_age
-        )
-        
-        # Store results in Redis for session management
-        await redis_manager.store_session_data(session_id, results)
+        assessment = {
+            'dyslexia_features': dyslexia_features,
+            'adhd_features': adhd_features,
+            'autism_assessment': autism_assessment
+        }
         
-        # Send real-time updates via WebSocket
-        await connection_manager.send_detection_update(session_id, results)
+        results = await run_detection(assessment, session_id, user_age)
         
         # Generate simulation configuration
         simulation_config = await generate_simulation_config(results)
@@ -183,10 +386,99 @@ async def comprehensive_detection(
             "timestamp": datetime.now().isoformat()
         }
         
+    except (BatchQueueFullError, InferenceQueueFullError) as e:
+        logger.warning(f"Detection rejected for session {session_id}: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except InferenceTimeoutError as e:
+        logger.error(f"Detection timed out for session {session_id}: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Detection failed for session {session_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def run_detection(assessment: Dict[str, Dict], session_id: str, user_age: Optional[int] = None,
+                        exclude: Optional[ClientConnection] = None) -> Dict:
+    """Score an assessment, store it with the session and push it to the session's sockets but ``exclude``"""
+    # Run detection with your optimized models; repeat assessments are served from the cache
+    prediction_key = None
+    if prediction_cache:
+        # Cache keys carry the model version, only known once the models are loaded
+        await detector.load_models()
+        cache_key = prediction_cache.make_key(assessment, detector.model_version)
+        results = await prediction_cache.get_or_compute(cache_key, lambda: score_assessment(assessment, user_age),
+                                                        write_back=False)
+        # A fresh result goes to the Redis cache tier together with the session
+        if prediction_cache.take_pending_write(cache_key):
+            prediction_key = cache_key
+    else:
+        results = await score_assessment(assessment, user_age)
+    
+    # Compare a candidate model on a sample of real traffic, in the background
+    if shadow_scorer:
+        shadow_scorer.submit(assessment, results)
+    
+    # Store results in Redis for session management, in one round trip with the cache write
+    await redis_manager.store_detection(session_id, results, flatten_assessment(assessment), prediction_key,
+                                        prediction_ttl=prediction_cache.ttl if prediction_cache else 300)
+    
+    # Send real-time updates via WebSocket
+    await connection_manager.send_detection_update(session_id, results, exclude=exclude)
+    return results
+
+async def score_assessment(assessment: Dict[str, Dict], user_age: Optional[int] = None) -> Dict:
+    """Score one assessment, coalesced with concurrent requests when micro-batching is on"""
+    if micro_batcher:
+        return await micro_batcher.submit(assessment)
+    return await detector.detect_all_disabilities(**assessment, user_age=user_age)
+
+@app.post("/api/v1/detect/batch")
+async def batch_detection(request: BatchDetectionRequest):
+    """Score many assessments at once with one ensemble call per condition"""
+    if len(request.assessments) > settings.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(request.assessments)} exceeds the limit of {settings.MAX_BATCH_SIZE} assessments"
+        )
+
+    try:
+        logger.info(f"Processing batch detection for {len(request.assessments)} sessions")
+
+        batch_results = await detector.detect_batch(
+            [assessment.to_detector_input() for assessment in request.assessments]
+        )
+
+        # All sessions in one pipelined round trip
+        await redis_manager.store_sessions({
+            assessment.session_id: dict(results, assessment=flatten_assessment(assessment.to_detector_input()))
+            for assessment, results in zip(request.assessments, batch_results)
+        })
+
+        responses = []
+        for assessment, results in zip(request.assessments, batch_results):
+            await connection_manager.send_detection_update(assessment.session_id, results)
+            responses.append({
+                "session_id": assessment.session_id,
+                "detection_results": results,
+                "simulation_config": await generate_simulation_config(results)
+            })
+
+        return {
+            "status": "success",
+            "count": len(responses),
+            "results": responses,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    except InferenceQueueFullError as e:
+        logger.warning(f"Batch detection rejected: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except InferenceTimeoutError as e:
+        logger.error(f"Batch detection timed out: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"Batch detection failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 async def generate_simulation_config(detection_results: Dict) -> Dict:
     """Generate Chrome extension simulation configuration"""
     config = {
@@ -244,38 +536,96 @@ async def generate_simulation_config(detection_results: Dict) -> Dict:
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """WebSocket endpoint for real-time communication with Chrome extension"""
-    await connection_manager.connect(websocket, session_id)
+    connection = await connection_manager.connect(websocket, session_id)
+    detections = set()
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            # JSON text frames, or msgpack binary frames when negotiated
+            message = await connection.receive()
             
+            # Replies go through the connection's queue, in order with pushed updates
             if message["type"] == "simulation_feedback":
-                await redis_manager.store_feedback(session_id, message["feedback"])
-                await websocket.send_text(json.dumps({
+                try:
+                    await store_session_feedback(session_id, message.get("feedback"))
+                except InvalidFeedbackError as e:
+                    connection.send({"type": "feedback_error", "detail": str(e)})
+                    continue
+                connection.send({
                     "type": "feedback_received",
                     "message": "Thank you for your feedback!"
-                }))
+                })
                 
             elif message["type"] == "request_update":
                 session_data = await redis_manager.get_session_data(session_id)
                 if session_data:
                     config = await generate_simulation_config(session_data)
-                    await websocket.send_text(json.dumps({
-                        "type": "simulation_update",
-                        "config": config
-                    }))
+                    # A patch against the config this connection holds, unless asked for all of it
+                    if message.get("full"):
+                        connection.last_config = None
+                    connection.send_config("simulation_update", config)
                     
             elif message["type"] == "toggle_simulation":
-                await websocket.send_text(json.dumps({
+                connection.send({
                     "type": "simulation_toggled",
                     "disability": message.get("disability"),
                     "enabled": message.get("enabled")
-                }))
+                })
+            
+            elif message["type"] == "detect":
+                # Scored concurrently; replies carry the request's id, in completion order
+                if len(detections) >= settings.WS_MAX_INFLIGHT_DETECTIONS:
+                    connection.send({
+                        "type": "detection_error",
+                        "id": message.get("id"),
+                        "status": 429,
+                        "detail": f"{len(detections)} detections already in flight on this connection"
+                    })
+                    continue
+                task = asyncio.create_task(websocket_detect(connection, message))
+                detections.add(task)
+                task.add_done_callback(detections.discard)
                     
     except WebSocketDisconnect:
-        connection_manager.disconnect(session_id)
         logger.info(f"WebSocket disconnected for session: {session_id}")
+    finally:
+        for task in detections:
+            task.cancel()
+        connection_manager.disconnect(session_id, connection)
+
+async def websocket_detect(connection: ClientConnection, message: Dict):
+    """Score a ``detect`` message and reply on its connection, echoing its ``id``"""
+    request_id = message.get("id")
+    try:
+        assessment = AssessmentInput(**{**message.get("assessment", {}), "session_id": connection.session_id})
+        # The session's other sockets (other tabs, other workers) still get detection_complete
+        results = await run_detection(assessment.to_detector_input(), connection.session_id,
+                                      assessment.user_age, exclude=connection)
+        connection.send({
+            "type": "detection_result",
+            "id": request_id,
+            "detection_results": results,
+            "model_info": {
+                "adhd_accuracy": results["adhd"].get("accuracy", 0),
+                "dyslexia_accuracy": results["dyslexia"].get("accuracy", 0),
+                "autism_method": results["autism"].get("method", "compatible_ml_ensemble")
+            },
+            "timestamp": datetime.now().isoformat()
+        })
+        # Sent as a patch against the config this connection already holds
+        connection.send_config("simulation_update", await generate_simulation_config(results), id=request_id)
+        return
+    except ValidationError as e:
+        status, detail = 422, e.errors(include_url=False, include_context=False)
+    except (BatchQueueFullError, InferenceQueueFullError) as e:
+        logger.warning(f"Detection rejected for session {connection.session_id}: {str(e)}")
+        status, detail = 503, str(e)
+    except InferenceTimeoutError as e:
+        logger.error(f"Detection timed out for session {connection.session_id}: {str(e)}")
+        status, detail = 504, str(e)
+    except Exception as e:
+        logger.error(f"Detection failed for session {connection.session_id}: {str(e)}")
+        status, detail = 500, str(e)
+    connection.send({"type": "detection_error", "id": request_id, "status": status, "detail": detail})
 
 @app.get("/api/v1/session/{session_id}")
 async def get_session_data(session_id: str):
@@ -290,6 +640,8 @@ async def get_session_data(session_id: str):
             }
         else:
             raise HTTPException(status_code=404, detail="Session not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -299,7 +651,8 @@ async def submit_feedback(
     disability_type: str = Form(...),
     accuracy_rating: int = Form(..., ge=1, le=5),
     simulation_quality: int = Form(..., ge=1, le=5),
-    comments: str = Form(None)
+    comments: str = Form(None),
+    label: Optional[int] = Form(None, ge=0, le=1, description="Confirmed diagnosis for disability_type, if known")
 ):
     """Submit user feedback for model improvement"""
     try:
@@ -308,45 +661,132 @@ async def submit_feedback(
             "accuracy_rating": accuracy_rating,
             "simulation_quality": simulation_quality,
             "comments": comments,
+            "label": label,
             "timestamp": datetime.now().isoformat()
         }
         
-        await redis_manager.store_feedback(session_id, feedback_data)
+        await store_session_feedback(session_id, feedback_data)
         
         return {
             "status": "success",
             "message": "Feedback submitted successfully"
         }
         
+    except InvalidFeedbackError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def store_session_feedback(session_id: str, feedback: Any):
+    """Store feedback together with the assessment last served to the session"""
+    if isinstance(feedback, dict):
+        session_data = await redis_manager.get_session_data(session_id) or {}
+        # Only the assessment the server scored, never one sent along with the feedback
+        feedback = {key: value for key, value in feedback.items() if key not in ASSESSMENT_COLUMNS}
+        feedback.update(session_data.get("assessment") or {})
+    await redis_manager.store_feedback(session_id, feedback)
+
+@app.get("/api/v1/feedback/stats")
+async def get_feedback_stats():
+    """Feedback stream and consumer counters"""
+    return {
+        **redis_manager.get_feedback_stats(),
+        "consumer": feedback_consumer.get_stats() if feedback_consumer else None
+    }
+
+@app.get("/api/v1/cache/stats")
+async def get_cache_stats():
+    """Prediction cache hit/miss and eviction counters"""
+    return {
+        "enabled": prediction_cache is not None,
+        "model_version": detector.model_version,
+        "stats": prediction_cache.get_stats() if prediction_cache else {},
+        "sessions": redis_manager.get_session_store_stats()
+    }
+
+@app.get("/api/v1/models/cascade/stats")
+async def get_cascade_stats():
+    """Fraction of rows answered by the cascade's first stage, per condition"""
+    return {
+        "inference_backend": settings.INFERENCE_BACKEND,
+        "executor": settings.INFERENCE_EXECUTOR,
+        # With the process executor, rows are scored (and counted) in the worker processes
+        "conditions": detector.get_cascade_stats()
+    }
+
+@app.get("/api/v1/models/shadow/stats")
+async def get_shadow_stats():
+    """How the shadow candidate compares with the served models on sampled traffic"""
+    if not shadow_scorer:
+        return {"enabled": False}
+    return {"enabled": True, "serving": model_state["version"], **shadow_scorer.get_stats()}
+
 @app.get("/api/v1/models/info")
 async def get_model_info():
     """Get information about your loaded models"""
     return {
         "models_loaded": detector.models_loaded,
-        "model_files": {
-            "adhd_production": "compatible_adhd_model.pkl",
-            "dyslexia_ensemble": "compatible_dyslexia_model.pkl",
-            "dyslexia_preprocessing": "compatible_dyslexia_preprocessing.pkl", 
-            "autism_hybrid": "compatible_autism_model.pkl"
-        },
-        "model_accuracies": {
-            "dyslexia": "90%+ (Compatible ML ensemble)",
-            "adhd": "75%+ (Compatible ML ensemble)",
-            "autism": "85%+ (Compatible ML ensemble)"
-        },
-        "training_date": "2025-06-26",
-        "ready_for_chrome_extension": True,
-        "optimization_method": {
-            "adhd": "Retrained compatible ensemble",
-            "dyslexia": "Retrained compatible ensemble",
-            "autism": "Retrained compatible ensemble"
-        }
+        "registry_version": model_state["version"],
+        "model_path": detector.model_path,
+        "model_version": detector.model_version or None,
+        "model_files": MODEL_FILES,
+        "models": detector.get_model_info(),
+        "ready_for_chrome_extension": detector.models_loaded
     }
 
+@app.post("/api/v1/admin/broadcast")
+async def broadcast_message(message: Dict, x_admin_token: Optional[str] = Header(None)):
+    """Push a system message to every connected extension"""
+    require_admin(x_admin_token)
+    queued = await connection_manager.broadcast_system_message(message)
+    return {"status": "queued", "connections": queued, **connection_manager.get_stats()}
+
+@app.get("/api/v1/admin/connections")
+async def get_connection_report(top: int = 20, x_admin_token: Optional[str] = Header(None)):
+    """WebSocket connections held by this worker, with their estimated memory"""
+    require_admin(x_admin_token)
+    return {**connection_manager.get_stats(), "memory": connection_manager.get_memory_report(top)}
+
+@app.get("/api/v1/admin/models")
+async def list_model_versions(x_admin_token: Optional[str] = Header(None)):
+    """Registry versions, the active one and the state of any swap"""
+    require_admin(x_admin_token)
+    return {
+        "registry": model_registry.root,
+        "active": model_registry.active_version(),
+        **model_state,
+        "versions": [
+            {key: manifest[key] for key in ("version", "created_at", "notes", "accuracy")}
+            for manifest in model_registry.list_versions()
+        ]
+    }
+
+@app.post("/api/v1/admin/models/{version}/activate", status_code=202)
+async def activate_model(version: str, x_admin_token: Optional[str] = Header(None)):
+    """Load and warm a registry version in the background, then swap it in and mark it ACTIVE"""
+    require_admin(x_admin_token)
+    global model_swap_task
+    if model_swap_task and not model_swap_task.done():
+        raise HTTPException(status_code=409, detail=f"Already swapping to {model_state['swapping_to']}")
+    try:
+        model_registry.verify(version)
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if version == model_state["version"]:
+        model_registry.set_active(version)
+        return {"status": "active", "version": version, "serving": version}
+    
+    async def activate():
+        await activate_model_version(version)
+        # Only once it serves here; other workers follow through their watcher
+        model_registry.set_active(version)
+    
+    model_swap_task = asyncio.create_task(activate())
+    return {"status": "activating", "version": version, "serving": model_state["version"]}
+
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
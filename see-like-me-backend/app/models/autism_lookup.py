@@ -0,0 +1,130 @@
+"""Exhaustive lookup table for the seven-question autism assessment
+
+Every answer is an integer from 1 to 5, so there are only 5 ** 7 = 78,125
+possible assessments. Build the table once per autism model:
+
+    python -m app.models.autism_lookup --models-dir models
+
+The detector memory-maps the table and answers autism queries with an index
+lookup; it falls back to the live ensemble when the table is missing or was
+built from a different model file.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import logging
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+N_ANSWERS = 5
+N_QUESTIONS = 7
+TABLE_SIZE = N_ANSWERS ** N_QUESTIONS
+
+# Place value of each question in the table index (first question most significant)
+_PLACE_VALUES = N_ANSWERS ** np.arange(N_QUESTIONS - 1, -1, -1)
+
+
+def metadata_path(table_path: str) -> str:
+    return os.path.splitext(table_path)[0] + '.json'
+
+
+def all_answer_vectors() -> np.ndarray:
+    """Every possible assessment, in table order"""
+    return np.indices((N_ANSWERS,) * N_QUESTIONS).reshape(N_QUESTIONS, -1).T + 1
+
+
+def lookup_index(answers: np.ndarray) -> np.ndarray:
+    """Table row of each clamped 1-5 answer vector"""
+    return (np.asarray(answers, dtype=np.int64) - 1) @ _PLACE_VALUES
+
+
+class AutismLookupTable:
+    """Memory-mapped autism probabilities for every possible answer vector"""
+
+    def __init__(self, probabilities: np.ndarray, fingerprint: str):
+        self.probabilities = probabilities
+        self.fingerprint = fingerprint
+        self.lookups = 0
+
+    @classmethod
+    def load(cls, table_path: str, fingerprint: str) -> Optional['AutismLookupTable']:
+        """Open the table if it exists and was built from the model with ``fingerprint``"""
+        if not os.path.exists(table_path) or not os.path.exists(metadata_path(table_path)):
+            logger.info(f"No autism lookup table at {table_path}; using the live ensemble")
+            return None
+
+        with open(metadata_path(table_path)) as f:
+            metadata = json.load(f)
+        if metadata.get('fingerprint') != fingerprint:
+            logger.warning(f"Autism lookup table {table_path} is stale (built for another model); using the live ensemble")
+            return None
+
+        probabilities = np.load(table_path, mmap_mode='r')
+        if probabilities.shape != (TABLE_SIZE,):
+            logger.warning(f"Autism lookup table {table_path} has shape {probabilities.shape}; using the live ensemble")
+            return None
+
+        logger.info(f"✅ Autism lookup table loaded ({table_path}, backend {metadata.get('backend')})")
+        return cls(probabilities, fingerprint)
+
+    def lookup(self, answers: np.ndarray) -> np.ndarray:
+        """Positive-class probabilities for an (n, 7) matrix of clamped answers"""
+        self.lookups += len(answers)
+        return self.probabilities[lookup_index(answers)].astype(np.float64)
+
+
+def build_lookup_table(detector, table_path: str, chunk_size: int = 8192):
+    """Score every answer vector with the detector's autism model and write the table"""
+    answers = all_answer_vectors()
+    table = np.lib.format.open_memmap(table_path, mode='w+', dtype=np.float32, shape=(TABLE_SIZE,))
+
+    for start in range(0, TABLE_SIZE, chunk_size):
+        chunk = answers[start:start + chunk_size]
+        matrix = detector.autism_feature_matrix(chunk)
+        table[start:start + len(chunk)] = detector.predict_matrices({'autism': matrix})['autism']
+    table.flush()
+    del table
+
+    model = detector.models['autism']
+    with open(metadata_path(table_path), 'w') as f:
+        json.dump({
+            'fingerprint': model['fingerprint'],
+            'source_file': os.path.basename(model['source_file']),
+            'backend': model['backend'].name,
+            'questions': N_QUESTIONS,
+            'answers_per_question': N_ANSWERS,
+            'created_at': datetime.now().isoformat()
+        }, f, indent=2)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build the autism assessment lookup table")
+    parser.add_argument('--models-dir', default=settings.MODEL_PATH)
+    parser.add_argument('--output', default=None, help=f'defaults to <models-dir>/{settings.AUTISM_LOOKUP_FILE}')
+    args = parser.parse_args(argv)
+
+    from app.models.disability_detector import DisabilityDetectionSystem
+
+    detector = DisabilityDetectionSystem(args.models_dir, use_autism_lookup=False)
+    asyncio.run(detector.load_models())
+
+    table_path = args.output or os.path.join(args.models_dir, settings.AUTISM_LOOKUP_FILE)
+    print(f"🔧 Scoring {TABLE_SIZE} autism assessments with the {detector.models['autism']['backend'].name} backend...")
+    start = time.perf_counter()
+    build_lookup_table(detector, table_path)
+    print(f"✅ {table_path} written in {time.perf_counter() - start:.1f}s "
+          f"({os.path.getsize(table_path) / 1024:.0f} KB)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import json
+import os
+import threading
+import logging
+from typing import Dict, List, Any
+
+import numpy as np
+
+from app.models.compiled_trees import CompiledEnsemble, compile_voting_classifier
+from app.models.mmap_artifacts import compiled_artifact_dir
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('native', 'compiled', 'onnx', 'student', 'cascade')
+
+
+def onnx_artifact_dir(model_path: str, condition: str) -> str:
+    return os.path.join(model_path, f'onnx_{condition}_model')
+
+
+class InferenceBackend:
+    """Scores scaled feature matrices for one condition, like ``predict_proba``"""
+
+    name = "base"
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class NativeBackend(InferenceBackend):
+    """The fitted VotingClassifier itself"""
+
+    name = "native"
+
+    def __init__(self, estimator):
+        self.estimator = estimator
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.estimator.predict_proba(X)
+
+
+class CompiledBackend(InferenceBackend):
+    """Every member's trees flattened into NumPy node arrays and evaluated vectorized"""
+
+    name = "compiled"
+
+    def __init__(self, compiled: CompiledEnsemble):
+        self.compiled = compiled
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.compiled.predict_proba(X)
+
+
+class StudentBackend(InferenceBackend):
+    """A compact model distilled from the ensemble (see app.models.distillation)"""
+
+    name = "student"
+
+    def __init__(self, student):
+        self.student = student
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.student.predict_proba(X)
+
+
+class CascadeBackend(InferenceBackend):
+    """The student answers clear-cut rows; rows inside its confidence band go to the full ensemble
+
+    A row exits early when the student's positive-class probability is
+    ``<= low`` or ``>= high``; the rest are rescored by ``full`` in one call.
+    """
+
+    name = "cascade"
+
+    def __init__(self, student, full: InferenceBackend, low: float, high: float):
+        if not 0.0 <= low <= 0.5 <= high <= 1.0:
+            raise ValueError(f"Cascade band must satisfy 0 <= low <= 0.5 <= high <= 1, got [{low}, {high}]")
+        self.student = student
+        self.full = full
+        self.low = low
+        self.high = high
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.early_exits = 0
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        probabilities = self.student.predict_proba(X)
+        ambiguous = (probabilities[:, 1] > self.low) & (probabilities[:, 1] < self.high)
+        n_ambiguous = int(np.count_nonzero(ambiguous))
+        if n_ambiguous:
+            probabilities = probabilities.copy()
+            probabilities[ambiguous] = self.full.predict_proba(X[ambiguous])
+        with self._lock:
+            self.rows += len(probabilities)
+            self.early_exits += len(probabilities) - n_ambiguous
+        return probabilities
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "band": [self.low, self.high],
+            "full_backend": self.full.name,
+            "rows": self.rows,
+            "early_exits": self.early_exits,
+            "early_exit_rate": round(self.early_exits / self.rows, 4) if self.rows else None
+        }
+
+
+class OnnxBackend(InferenceBackend):
+    """Each ensemble member exported to ONNX and run with ONNX Runtime, then soft-voted"""
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str):
+        import onnxruntime
+
+        with open(os.path.join(model_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = 1
+        self.sessions = []
+        for member in manifest['members']:
+            session = onnxruntime.InferenceSession(
+                os.path.join(model_dir, f'{member}.onnx'), options, providers=['CPUExecutionProvider']
+            )
+            outputs = [output.name for output in session.get_outputs()]
+            probability_output = next((name for name in outputs if 'prob' in name.lower()), outputs[-1])
+            self.sessions.append((session, session.get_inputs()[0].name, probability_output))
+        self.weights = np.asarray(manifest['weights'], dtype=np.float64)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        positive = np.zeros(X.shape[0])
+        for weight, (session, input_name, output_name) in zip(self.weights, self.sessions):
+            probabilities = session.run([output_name], {input_name: X})[0]
+            if isinstance(probabilities, list):
+                # ZipMap output: one {label: probability} dict per row
+                probabilities = np.array([[row[0], row[1]] for row in probabilities])
+            positive += weight * np.asarray(probabilities, dtype=np.float64)[:, 1]
+        positive /= self.weights.sum()
+        return np.column_stack([1.0 - positive, positive])
+
+
+def export_onnx(ensemble, n_features: int, model_dir: str):
+    """Export every member of a fitted VotingClassifier to ONNX plus a manifest
+
+    Needs skl2onnx (forests) and onnxmltools (XGBoost, LightGBM); CatBoost
+    exports itself.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    members: List[str] = []
+
+    for (name, _), member in zip(ensemble.estimators, ensemble.estimators_):
+        path = os.path.join(model_dir, f'{name}.onnx')
+        if type(member).__name__ == 'CatBoostClassifier':
+            member.save_model(path, format='onnx')
+        else:
+            if hasattr(member, 'get_booster'):
+                from onnxmltools import convert_xgboost
+                from onnxmltools.convert.common.data_types import FloatTensorType
+                onnx_model = convert_xgboost(member, initial_types=[('input', FloatTensorType([None, n_features]))])
+            elif hasattr(member, 'booster_'):
+                from onnxmltools import convert_lightgbm
+                from onnxmltools.convert.common.data_types import FloatTensorType
+                onnx_model = convert_lightgbm(
+                    member, initial_types=[('input', FloatTensorType([None, n_features]))], zipmap=False
+                )
+            else:
+                from skl2onnx import convert_sklearn
+                from skl2onnx.common.data_types import FloatTensorType
+                onnx_model = convert_sklearn(
+                    member, initial_types=[('input', FloatTensorType([None, n_features]))],
+                    options={id(member): {'zipmap': False}}
+                )
+            with open(path, 'wb') as f:
+                f.write(onnx_model.SerializeToString())
+        members.append(name)
+
+    weights = ensemble.weights if ensemble.weights is not None else [1.0] * len(members)
+    with open(os.path.join(model_dir, 'manifest.json'), 'w') as f:
+        json.dump({'members': members, 'weights': list(weights), 'n_features': n_features}, f, indent=2)
+
+
+def create_backend(kind: str, condition: str, model: Dict[str, Any], model_path: str) -> InferenceBackend:
+    """Build the configured backend for a loaded condition model
+
+    Records opened from a memory-mapped artifact already carry their compiled
+    trees; the detector only unpickles an ensemble for ``compiled`` when that
+    artifact is missing or was built from a different pickle, and it is then
+    compiled in memory so ``compiled`` always serves the current model.
+    """
+    if kind in ('student', 'cascade') and model.get('student') is None:
+        raise FileNotFoundError(f"No distilled student for {condition}; run `python -m app.models.distillation`")
+
+    if kind == 'student':
+        return StudentBackend(model['student'])
+
+    if kind == 'cascade':
+        low, high = model['cascade_band']
+        if model['cascade_full_backend'] in ('student', 'cascade'):
+            raise ValueError(f"The cascade's full stage must serve the ensemble, not '{model['cascade_full_backend']}'")
+        full = create_backend(model['cascade_full_backend'], condition, model, model_path)
+        return CascadeBackend(model['student'], full, low, high)
+
+    if model.get('compiled') is not None:
+        if kind != 'compiled':
+            logger.warning(f"{condition} was loaded from a memory-mapped artifact; serving it compiled, not {kind}")
+        return CompiledBackend(model['compiled'])
+
+    if kind == 'native':
+        return NativeBackend(model['estimator'])
+
+    if kind == 'compiled':
+        directory = compiled_artifact_dir(model_path, condition)
+        logger.warning(f"No up-to-date {os.path.basename(directory)}; compiling the {condition} ensemble at load time")
+        return CompiledBackend(compile_voting_classifier(model['estimator'], len(model['feature_names'])))
+
+    if kind == 'onnx':
+        model_dir = onnx_artifact_dir(model_path, condition)
+        if not os.path.isdir(model_dir):
+            raise FileNotFoundError(f"ONNX export not found for {condition}: {model_dir}")
+        return OnnxBackend(model_dir)
+
+    raise ValueError(f"Unknown inference backend '{kind}' (expected one of {', '.join(BACKENDS)})")
@@ -0,0 +1,353 @@
+import json
+import os
+import tempfile
+import logging
+from typing import Dict, List, Any, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Node arrays stored in a compiled artifact, one .npy file each
+ARRAY_FIELDS = (
+    'feature', 'threshold', 'children', 'value', 'roots', 'tree_member', 'tree_depth',
+    'member_is_margin', 'member_scales', 'member_biases', 'member_weights'
+)
+
+
+class _TreeBuilder:
+    """Accumulates the trees of every ensemble member into flat node arrays
+
+    Every split sends a row left when ``x[feature] <= threshold``. Leaves point
+    back to themselves, so enough descent steps land every row on its leaf
+    without per-node branching. Features are indexed into an extended
+    row ``[float32(x), x]``: boosters and forests that compare in float32 read
+    the first half, LightGBM (which compares in float64) reads the second.
+    """
+
+    def __init__(self, n_features: int):
+        self.n_features = n_features
+        self.feature: List[int] = []
+        self.threshold: List[float] = []
+        self.left: List[int] = []
+        self.right: List[int] = []
+        self.value: List[float] = []
+        self.roots: List[int] = []
+        self.tree_depths: List[int] = []
+        self._depth = 0
+
+    def new_node(self) -> int:
+        self.feature.append(0)
+        self.threshold.append(0.0)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.value.append(0.0)
+        return len(self.feature) - 1
+
+    def set_split(self, node: int, feature: int, threshold: float, left: int, right: int, float64_input: bool = False):
+        self.feature[node] = feature + (self.n_features if float64_input else 0)
+        self.threshold[node] = threshold
+        self.left[node] = left
+        self.right[node] = right
+
+    def set_leaf(self, node: int, value: float, depth: int):
+        self.left[node] = node
+        self.right[node] = node
+        self.value[node] = value
+        self._depth = max(self._depth, depth)
+
+    def add_root(self, root: int):
+        """Record a finished tree and the depth of its deepest leaf"""
+        self.roots.append(root)
+        self.tree_depths.append(self._depth)
+        self._depth = 0
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+
+def _float32_strictly_below(threshold: float) -> float:
+    """Largest float32 below ``threshold``, turning ``x < t`` into ``x <= t'`` for float32 inputs"""
+    return float(np.nextafter(np.float32(threshold), np.float32(-np.inf)))
+
+
+def _add_xgboost_trees(builder: _TreeBuilder, model) -> Tuple[float, float]:
+    booster = model.get_booster()
+    feature_index = {name: i for i, name in enumerate(booster.feature_names or [])}
+
+    def resolve(name: str) -> int:
+        return feature_index[name] if name in feature_index else int(name.lstrip('f'))
+
+    def add(node: Dict[str, Any], depth: int) -> int:
+        idx = builder.new_node()
+        if 'leaf' in node:
+            builder.set_leaf(idx, float(node['leaf']), depth)
+            return idx
+        children = {child['nodeid']: child for child in node['children']}
+        yes = add(children[node['yes']], depth + 1)
+        no = add(children[node['no']], depth + 1)
+        # XGBoost goes "yes" when x < split_condition, comparing in float32
+        builder.set_split(idx, resolve(node['split']), _float32_strictly_below(node['split_condition']), yes, no)
+        return idx
+
+    for dump in booster.get_dump(dump_format='json'):
+        builder.add_root(add(json.loads(dump), 0))
+
+    config = json.loads(booster.save_config())
+    objective = config['learner']['objective']['name']
+    if objective != 'binary:logistic':
+        raise ValueError(f"Unsupported XGBoost objective: {objective}")
+    base_score = float(str(config['learner']['learner_model_param']['base_score']).strip('[]'))
+    return 1.0, float(np.log(base_score / (1.0 - base_score)))
+
+
+def _add_lightgbm_trees(builder: _TreeBuilder, model) -> Tuple[float, float]:
+    dump = model.booster_.dump_model()
+
+    def add(node: Dict[str, Any], depth: int) -> int:
+        idx = builder.new_node()
+        if 'leaf_value' in node and 'split_feature' not in node:
+            builder.set_leaf(idx, float(node['leaf_value']), depth)
+            return idx
+        if node.get('decision_type', '<=') != '<=':
+            raise ValueError(f"Unsupported LightGBM decision type: {node['decision_type']}")
+        left = add(node['left_child'], depth + 1)
+        right = add(node['right_child'], depth + 1)
+        builder.set_split(idx, int(node['split_feature']), float(node['threshold']), left, right, float64_input=True)
+        return idx
+
+    for tree in dump['tree_info']:
+        builder.add_root(add(tree['tree_structure'], 0))
+
+    objective = dump['objective'].split()
+    # cross_entropy (soft labels, used by distilled students) has the same sigmoid link
+    if objective[0] not in ('binary', 'cross_entropy'):
+        raise ValueError(f"Unsupported LightGBM objective: {dump['objective']}")
+    sigmoid = 1.0
+    for part in objective[1:]:
+        if part.startswith('sigmoid:'):
+            sigmoid = float(part.split(':', 1)[1])
+    return sigmoid, 0.0
+
+
+def _add_catboost_trees(builder: _TreeBuilder, model) -> Tuple[float, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.json')
+        model.save_model(path, format='json')
+        with open(path) as f:
+            dump = json.load(f)
+
+    flat_index = [info['flat_feature_index'] for info in dump['features_info']['float_features']]
+
+    for tree in dump['oblivious_trees']:
+        splits = tree['splits']
+        leaf_values = tree['leaf_values']
+        depth = len(splits)
+        if len(leaf_values) != 2 ** depth:
+            raise ValueError("Only single-dimension CatBoost models are supported")
+        for split in splits:
+            if split.get('split_type', 'FloatFeature') != 'FloatFeature':
+                raise ValueError(f"Unsupported CatBoost split type: {split['split_type']}")
+
+        # Oblivious tree: split i sets bit i of the leaf index when x > border.
+        # Expanded top-down with the last split at the root, left-to-right leaf
+        # order then matches CatBoost's leaf indexing.
+        def add(level: int, leaf_prefix: int) -> int:
+            idx = builder.new_node()
+            if level < 0:
+                builder.set_leaf(idx, float(leaf_values[leaf_prefix]), depth)
+                return idx
+            split = splits[level]
+            left = add(level - 1, leaf_prefix)
+            right = add(level - 1, leaf_prefix | (1 << level))
+            builder.set_split(idx, flat_index[split['float_feature_index']], float(split['border']), left, right)
+            return idx
+
+        builder.add_root(add(depth - 1, 0))
+
+    scale, biases = dump['scale_and_bias']
+    return float(scale), float(biases[0]) if biases else 0.0
+
+
+def _add_sklearn_forest_trees(builder: _TreeBuilder, model) -> Tuple[float, float]:
+    positive = list(model.classes_).index(1)
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        counts = tree.value[:, 0, :]
+        leaf_probability = counts[:, positive] / counts.sum(axis=1)
+        offset = len(builder.feature)
+        for _ in range(tree.node_count):
+            builder.new_node()
+
+        stack = [(0, 0)]
+        while stack:
+            node, depth = stack.pop()
+            left, right = tree.children_left[node], tree.children_right[node]
+            if left == -1:
+                builder.set_leaf(offset + node, float(leaf_probability[node]), depth)
+            else:
+                builder.set_split(offset + node, int(tree.feature[node]), float(tree.threshold[node]),
+                                  offset + left, offset + right)
+                stack.append((left, depth + 1))
+                stack.append((right, depth + 1))
+
+        builder.add_root(offset)
+
+    # Forests average per-tree probabilities
+    return 1.0 / len(model.estimators_), 0.0
+
+
+def _member_kind(model) -> str:
+    if hasattr(model, 'get_booster'):
+        return 'xgboost'
+    if hasattr(model, 'booster_'):
+        return 'lightgbm'
+    if type(model).__name__ == 'CatBoostClassifier':
+        return 'catboost'
+    if hasattr(model, 'estimators_') and all(hasattr(e, 'tree_') for e in model.estimators_):
+        return 'sklearn_forest'
+    raise ValueError(f"Cannot compile ensemble member of type {type(model).__name__}")
+
+
+_MEMBER_COMPILERS = {
+    'xgboost': (_add_xgboost_trees, True),
+    'lightgbm': (_add_lightgbm_trees, True),
+    'catboost': (_add_catboost_trees, True),
+    'sklearn_forest': (_add_sklearn_forest_trees, False)
+}
+
+
+class CompiledEnsemble:
+    """All trees of a soft-voting ensemble as contiguous NumPy node arrays
+
+    ``children[2 * i]`` / ``children[2 * i + 1]`` are node ``i``'s right and left
+    child, so one step of descent is ``children[2 * node + go_left]``. Trees are
+    stored deepest first: after step ``k`` only the first ``active_counts[k]``
+    trees are still descending, and later steps touch a shrinking prefix.
+    ``predict_proba`` sums leaf values per member, applies each booster's
+    sigmoid (forests average), and soft-votes the members exactly like
+    ``VotingClassifier(voting='soft')``.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, tree_member, tree_depth,
+                 member_is_margin, member_scales, member_biases, member_weights,
+                 member_names: List[str], n_features: int):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.tree_member = tree_member
+        self.tree_depth = tree_depth
+        self.member_is_margin = member_is_margin
+        self.member_scales = member_scales
+        self.member_biases = member_biases
+        self.member_weights = member_weights
+        self.member_names = list(member_names)
+        self.n_features = int(n_features)
+
+        max_depth = int(tree_depth.max()) if len(tree_depth) else 0
+        self.active_counts = [int(np.count_nonzero(tree_depth > k)) for k in range(max_depth)]
+        self.membership = np.zeros((len(roots), len(self.member_names)))
+        self.membership[np.arange(len(roots)), tree_member] = 1.0
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.n_features)
+        extended = np.hstack([X.astype(np.float32).astype(np.float64), X])
+        flat = extended.ravel()
+        row_offsets = (np.arange(extended.shape[0]) * extended.shape[1])[:, None]
+
+        node = np.repeat(self.roots[None, :], extended.shape[0], axis=0)
+        for active in self.active_counts:
+            descending = node[:, :active]
+            go_left = flat.take(self.feature.take(descending) + row_offsets) <= self.threshold.take(descending)
+            node[:, :active] = self.children.take(descending * 2 + go_left)
+
+        raw = (self.value.take(node) @ self.membership) * self.member_scales + self.member_biases
+        member_probabilities = np.where(self.member_is_margin, 1.0 / (1.0 + np.exp(-raw)), raw)
+
+        positive = member_probabilities @ self.member_weights / self.member_weights.sum()
+        return np.column_stack([1.0 - positive, positive])
+
+    def save_arrays(self, directory: str) -> Dict[str, Any]:
+        """Write each node array to ``<directory>/<name>.npy``; returns the header for the manifest"""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_FIELDS:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        return {'member_names': self.member_names, 'n_features': self.n_features}
+
+    @classmethod
+    def load_arrays(cls, directory: str, header: Dict[str, Any], mmap: bool = True) -> 'CompiledEnsemble':
+        """Open arrays written by ``save_arrays``; memory-mapped read-only by default"""
+        arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r' if mmap else None)
+            for name in ARRAY_FIELDS
+        }
+        return cls(**arrays, member_names=header['member_names'], n_features=header['n_features'])
+
+
+def compile_voting_classifier(ensemble, n_features: int) -> CompiledEnsemble:
+    """Flatten a fitted soft-voting ensemble of tree models into a CompiledEnsemble"""
+    if getattr(ensemble, 'voting', 'soft') != 'soft':
+        raise ValueError("Only soft-voting ensembles can be compiled")
+    if list(ensemble.le_.classes_) != [0, 1]:
+        raise ValueError(f"Expected binary 0/1 labels, got {list(ensemble.le_.classes_)}")
+
+    members = [(name, member) for (name, _), member in zip(ensemble.estimators, ensemble.estimators_)]
+    weights = ensemble.weights if ensemble.weights is not None else [1.0] * len(members)
+    return _compile_members(members, weights, n_features)
+
+
+def compile_tree_model(model, n_features: int, name: str = 'model') -> CompiledEnsemble:
+    """Flatten one fitted binary tree model (e.g. a distilled student) into a CompiledEnsemble"""
+    return _compile_members([(name, model)], [1.0], n_features)
+
+
+def _compile_members(members: List[Tuple[str, Any]], weights: List[float], n_features: int) -> CompiledEnsemble:
+    builder = _TreeBuilder(n_features)
+    names, is_margin, scales, biases, tree_member = [], [], [], [], []
+
+    for name, member in members:
+        kind = _member_kind(member)
+        compiler, margin = _MEMBER_COMPILERS[kind]
+        first_tree = builder.n_trees
+        scale, bias = compiler(builder, member)
+        tree_member.extend([len(names)] * (builder.n_trees - first_tree))
+        names.append(name)
+        is_margin.append(margin)
+        scales.append(scale)
+        biases.append(bias)
+        logger.info(f"Compiled {name} ({kind}): {builder.n_trees - first_tree} trees")
+
+    # Deepest trees first, so each descent step only touches the trees still descending
+    tree_depth = np.asarray(builder.tree_depths, dtype=np.int32)
+    order = np.argsort(-tree_depth, kind='stable')
+    children = np.empty(2 * len(builder.feature), dtype=np.int32)
+    children[0::2] = builder.right
+    children[1::2] = builder.left
+
+    return CompiledEnsemble(
+        feature=np.asarray(builder.feature, dtype=np.int32),
+        threshold=np.asarray(builder.threshold, dtype=np.float64),
+        children=children,
+        value=np.asarray(builder.value, dtype=np.float64),
+        roots=np.asarray(builder.roots, dtype=np.int32)[order],
+        tree_member=np.asarray(tree_member, dtype=np.int32)[order],
+        tree_depth=tree_depth[order],
+        member_is_margin=np.asarray(is_margin, dtype=bool),
+        member_scales=np.asarray(scales, dtype=np.float64),
+        member_biases=np.asarray(biases, dtype=np.float64),
+        member_weights=np.asarray(weights, dtype=np.float64),
+        member_names=names,
+        n_features=n_features
+    )
@@ -0,0 +1,96 @@
+"""Convert the compatible_*_model.pkl ensembles into compiled (and optionally ONNX) backends
+
+    python -m app.models.convert_models --models-dir models --tolerance 1e-6 --onnx
+
+Each converted model is checked against the native VotingClassifier's
+probabilities on random rows; nothing is written for a condition whose
+output differs by more than the tolerance. The compiled artifact is the
+memory-mappable format described in app.models.mmap_artifacts.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from app.models.disability_detector import CONDITIONS, MODEL_FILES, read_model_artifact
+from app.models.backends import OnnxBackend, export_onnx, onnx_artifact_dir
+from app.models.compiled_trees import compile_voting_classifier
+from app.models.mmap_artifacts import compiled_artifact_dir, save_mmap_artifact
+
+
+def verification_rows(condition: str, model, n_samples: int, seed: int) -> np.ndarray:
+    """Scaled rows to compare backends on; the autism questionnaire is sampled on its 1-5 grid"""
+    rng = np.random.default_rng(seed)
+    n_features = len(model['feature_names'])
+    if condition == 'autism':
+        return model['scaler'].transform(rng.integers(1, 6, size=(n_samples, n_features)).astype(np.float64))
+    # Scaled training data is ~N(0, 1); widen it to exercise the tails too
+    return rng.normal(0.0, 1.5, size=(n_samples, n_features))
+
+
+def time_single_row(predict, row: np.ndarray, repeats: int = 200) -> float:
+    predict(row)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predict(row)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def convert(model_path: str, condition: str, tolerance: float, n_samples: int, onnx: bool, seed: int) -> bool:
+    print(f"\n🔧 Converting {condition} ({MODEL_FILES[condition]})...")
+    model = read_model_artifact(model_path, condition)
+    ensemble = model['estimator']
+    X = verification_rows(condition, model, n_samples, seed)
+    native = ensemble.predict_proba(X)[:, 1]
+    ok = True
+
+    compiled = compile_voting_classifier(ensemble, len(model['feature_names']))
+    error = float(np.abs(compiled.predict_proba(X)[:, 1] - native).max())
+    print(f"   compiled: {compiled.n_trees} trees, {compiled.n_nodes} nodes, max |Δp| = {error:.2e}")
+    print(f"   single row: native {time_single_row(ensemble.predict_proba, X[:1], 20):.3f}ms, "
+          f"compiled {time_single_row(compiled.predict_proba, X[:1]):.3f}ms")
+    if error <= tolerance:
+        directory = compiled_artifact_dir(model_path, condition)
+        save_mmap_artifact(directory, condition, model, compiled, max_abs_error=error, tolerance=tolerance)
+        print(f"   ✅ {directory}/")
+    else:
+        print(f"   ❌ compiled output exceeds tolerance {tolerance:.0e}; not written")
+        ok = False
+
+    if onnx:
+        model_dir = onnx_artifact_dir(model_path, condition)
+        export_onnx(ensemble, len(model['feature_names']), model_dir)
+        backend = OnnxBackend(model_dir)
+        error = float(np.abs(backend.predict_proba(X)[:, 1] - native).max())
+        print(f"   onnx: max |Δp| = {error:.2e}, single row {time_single_row(backend.predict_proba, X[:1]):.3f}ms")
+        if error <= tolerance:
+            print(f"   ✅ {model_dir}/")
+        else:
+            # ONNX tree ensembles use float32 thresholds; LightGBM splits on float64
+            print(f"   ⚠️ onnx output exceeds tolerance {tolerance:.0e}; review before serving it")
+            ok = False
+
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--conditions', nargs='+', choices=CONDITIONS, default=list(CONDITIONS))
+    parser.add_argument('--tolerance', type=float, default=1e-6,
+                        help='maximum absolute difference from native probabilities')
+    parser.add_argument('--samples', type=int, default=2000, help='random rows used for verification')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--onnx', action='store_true', help='also export and verify ONNX Runtime models')
+    args = parser.parse_args(argv)
+
+    results = [
+        convert(args.models_dir, condition, args.tolerance, args.samples, args.onnx, args.seed)
+        for condition in args.conditions
+    ]
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
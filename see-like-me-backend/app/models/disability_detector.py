@@ -0,0 +1,394 @@
+import numpy as np
+import asyncio
+import hashlib
+import os
+import time
+import logging
+from typing import Dict, List, Optional, Any, Tuple
+
+from app.core.config import settings
+from app.utils.preprocessing import DataPreprocessor
+from app.models.backends import create_backend
+from app.models.mmap_artifacts import compiled_artifact_dir, load_mmap_artifact, read_manifest
+from app.models.autism_lookup import AutismLookupTable
+from app.models.distillation import read_student_artifact, student_artifact_path
+
+logger = logging.getLogger(__name__)
+
+DYSLEXIA_FEATURES = [
+    'reading_speed', 'comprehension_score', 'spelling_accuracy',
+    'phonemic_awareness', 'working_memory'
+]
+
+ADHD_FEATURES = [
+    'attention_span', 'hyperactivity_level', 'impulsivity_score',
+    'focus_duration', 'task_completion'
+]
+
+# The seven questionnaire items the extension actually asks; the autism
+# ensemble was trained on twenty, the rest are filled with the neutral answer.
+AUTISM_ASSESSMENT_FIELDS = [
+    'light_sensitivity', 'sound_sensitivity', 'texture_sensitivity',
+    'eye_contact_difficulty', 'social_interaction_challenges',
+    'routine_importance', 'change_resistance'
+]
+AUTISM_NEUTRAL_ANSWER = 3
+
+CONDITIONS = ('dyslexia', 'adhd', 'autism')
+
+# Artifacts written by retrain_compatible_models.py
+MODEL_FILES = {
+    'dyslexia': settings.DYSLEXIA_MODEL_FILE,
+    'adhd': settings.ADHD_MODEL_FILE,
+    'autism': settings.AUTISM_MODEL_FILE
+}
+
+# Keys each artifact stores its ensemble and accuracy under, and its default method label
+ARTIFACT_KEYS = {
+    'dyslexia': ('ensemble', 'accuracy', 'compatible_ml_ensemble'),
+    'adhd': ('final_ensemble', 'test_accuracy', 'compatible_ensemble'),
+    'autism': ('ml_model', 'test_accuracy', 'compatible_ml_ensemble')
+}
+
+
+def artifact_fingerprint(path: str) -> str:
+    """Content hash of a model file, stable across copies and redeploys"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_model_artifact(model_path: str, condition: str) -> Dict[str, Any]:
+    """Load one compatible_*_model.pkl into the detector's per-condition model record"""
+    # Unpickling imports whichever booster libraries the ensemble was built with
+    import joblib
+
+    source_file = os.path.join(model_path, MODEL_FILES[condition])
+    artifact = joblib.load(source_file)
+    estimator_key, accuracy_key, default_method = ARTIFACT_KEYS[condition]
+
+    return {
+        'estimator': artifact[estimator_key],
+        'scaler': artifact['scaler'],
+        'feature_names': artifact['feature_names'],
+        'accuracy': float(artifact[accuracy_key]),
+        'method': artifact.get('model_type', default_method),
+        'source_file': source_file,
+        'fingerprint': artifact_fingerprint(source_file)
+    }
+
+
+def compiled_artifact_is_current(model_path: str, condition: str) -> bool:
+    """Whether the condition's compiled artifact was built from its current pickle"""
+    manifest = read_manifest(compiled_artifact_dir(model_path, condition))
+    source_file = os.path.join(model_path, MODEL_FILES[condition])
+    return (manifest is not None and os.path.exists(source_file)
+            and manifest.get('fingerprint') == artifact_fingerprint(source_file))
+
+
+def attach_cascade_student(model: Dict[str, Any], model_path: str, condition: str, full_backend: str,
+                           band: Optional[List[float]] = None) -> Dict[str, Any]:
+    """Add the distilled student and the cascade's settings to a loaded ensemble record"""
+    student = read_student_artifact(model_path, condition)
+    model['student'] = student['student']
+    model['student_source_file'] = student['source_file']
+    model['teacher_fingerprint'] = student['teacher_fingerprint']
+    model['cascade_full_backend'] = full_backend
+    model['cascade_band'] = band or settings.CASCADE_BANDS.get(condition, settings.CASCADE_DEFAULT_BAND)
+    return model
+
+
+class DisabilityDetectionSystem:
+    def __init__(self, model_path: Optional[str] = None, use_autism_lookup: Optional[bool] = None):
+        self.model_path = model_path or settings.MODEL_PATH
+        self.use_autism_lookup = settings.AUTISM_LOOKUP_ENABLED if use_autism_lookup is None else use_autism_lookup
+        self.autism_lookup: Optional[AutismLookupTable] = None
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self.models_loaded = False
+        self.model_version = ""
+        self.load_status: Dict[str, Dict[str, Any]] = {condition: {'state': 'pending'} for condition in CONDITIONS}
+        self.load_seconds: Optional[float] = None
+        self._load_lock: Optional[asyncio.Lock] = None  # created on the loop that first loads
+        self.executor = None  # optional InferenceExecutor; scoring runs inline without one
+        self.preprocessor = DataPreprocessor()
+        self.high_confidence = {
+            'dyslexia': settings.DYSLEXIA_HIGH_CONFIDENCE,
+            'adhd': settings.ADHD_HIGH_CONFIDENCE,
+            'autism': settings.AUTISM_HIGH_CONFIDENCE
+        }
+
+    def load_condition(self, condition: str) -> Dict[str, Any]:
+        """Read one condition's artifact and build its inference backend"""
+        start = time.perf_counter()
+        backend = settings.INFERENCE_BACKEND_OVERRIDES.get(condition, settings.INFERENCE_BACKEND)
+        # How the full ensemble is served: directly, or behind the cascade's student
+        ensemble_backend = settings.CASCADE_FULL_BACKEND if backend == 'cascade' else backend
+        if backend == 'student':
+            # Only the distilled student is loaded; the ensemble is never unpickled
+            model = read_student_artifact(self.model_path, condition)
+        elif settings.MODEL_ARTIFACT_FORMAT == 'mmap' and (
+            compiled_artifact_is_current(self.model_path, condition)
+            or not os.path.exists(os.path.join(self.model_path, MODEL_FILES[condition]))
+        ):
+            # Shared, read-only pages instead of a private unpickled copy per worker
+            model = load_mmap_artifact(compiled_artifact_dir(self.model_path, condition))
+        elif ensemble_backend == 'compiled' and compiled_artifact_is_current(self.model_path, condition):
+            # The compiled trees stand in for the ensemble: no unpickling, no booster imports
+            model = load_mmap_artifact(compiled_artifact_dir(self.model_path, condition))
+        else:
+            if settings.MODEL_ARTIFACT_FORMAT == 'mmap':
+                logger.warning(f"The {condition} compiled artifact is missing or older than "
+                               f"{MODEL_FILES[condition]}; serving the pickle until convert_models rebuilds it")
+            model = read_model_artifact(self.model_path, condition)
+
+        if backend == 'cascade':
+            attach_cascade_student(model, self.model_path, condition, ensemble_backend)
+        if backend in ('student', 'cascade'):
+            teacher_file = os.path.join(self.model_path, MODEL_FILES[condition])
+            if os.path.exists(teacher_file) and model['teacher_fingerprint'] != artifact_fingerprint(teacher_file):
+                logger.warning(f"The {condition} student was distilled from a different ensemble; redistill it")
+        model['backend'] = create_backend(backend, condition, model, self.model_path)
+        model['load_seconds'] = time.perf_counter() - start
+        return model
+
+    async def load_models(self):
+        """Load the three condition models concurrently, once
+
+        Safe to call from any number of requests: callers wait for the one
+        load in progress, and a failed load is retried on the next call.
+        """
+        if self.models_loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+
+        async with self._load_lock:
+            if self.models_loaded:
+                return
+
+            start = time.perf_counter()
+            missing = [condition for condition in CONDITIONS if condition not in self.models]
+            for condition in missing:
+                self.load_status[condition] = {'state': 'loading'}
+            # Unpickling, mmap-opening and backend compilation happen off the event loop
+            results = await asyncio.gather(
+                *[asyncio.to_thread(self.load_condition, condition) for condition in missing],
+                return_exceptions=True
+            )
+
+            failures = []
+            for condition, result in zip(missing, results):
+                if isinstance(result, BaseException):
+                    self.load_status[condition] = {'state': 'failed', 'error': str(result)}
+                    logger.error(f"❌ Failed to load {condition} model: {result}")
+                    failures.append(result)
+                    continue
+                self.models[condition] = result
+                self.load_status[condition] = {
+                    'state': 'loaded',
+                    'load_seconds': round(result['load_seconds'], 4),
+                    'backend': result['backend'].name,
+                    'source_file': os.path.basename(result['source_file'])
+                }
+                logger.info(f"Loaded {condition} model ({result['backend'].name} backend) "
+                            f"in {result['load_seconds']:.2f}s")
+            if failures:
+                raise failures[0]
+
+            if self.use_autism_lookup:
+                self.autism_lookup = AutismLookupTable.load(
+                    os.path.join(self.model_path, settings.AUTISM_LOOKUP_FILE),
+                    self.models['autism']['fingerprint']
+                )
+
+            # Identifies this exact set of artifacts, e.g. in prediction cache keys
+            self.model_version = hashlib.blake2b(
+                ''.join(self.models[condition]['fingerprint'] for condition in CONDITIONS).encode(), digest_size=8
+            ).hexdigest()
+            self.load_seconds = time.perf_counter() - start
+            self.models_loaded = True
+            logger.info(f"✅ Dyslexia, ADHD and autism ensembles loaded in {self.load_seconds:.2f}s "
+                        f"(version {self.model_version})")
+
+    def get_load_status(self) -> Dict[str, Any]:
+        """Per-model load state and timings, for readiness checks"""
+        return {
+            "models_loaded": self.models_loaded,
+            "model_version": self.model_version or None,
+            "load_seconds": round(self.load_seconds, 4) if self.load_seconds is not None else None,
+            "autism_lookup": self.autism_lookup is not None,
+            "models": {condition: dict(self.load_status[condition]) for condition in CONDITIONS}
+        }
+
+    async def warm_up(self):
+        """Score one made-up assessment, so the first real request doesn't pay first-call costs"""
+        await asyncio.to_thread(self.predict_assessments, [{
+            'dyslexia_features': dict.fromkeys(self.models['dyslexia']['feature_names'], 1.0),
+            'adhd_features': dict.fromkeys(self.models['adhd']['feature_names'], 1.0),
+            'autism_assessment': {}
+        }])
+
+    def required_files(self) -> List[str]:
+        """The files load_models will read from ``model_path`` with the current settings"""
+        files = []
+        for condition in CONDITIONS:
+            backend = settings.INFERENCE_BACKEND_OVERRIDES.get(condition, settings.INFERENCE_BACKEND)
+            if backend in ('student', 'cascade'):
+                files.append(student_artifact_path(self.model_path, condition))
+            if backend == 'student':
+                continue
+            if settings.MODEL_ARTIFACT_FORMAT == 'mmap':
+                files.append(os.path.join(compiled_artifact_dir(self.model_path, condition), 'manifest.json'))
+            else:
+                files.append(os.path.join(self.model_path, MODEL_FILES[condition]))
+        return files
+
+    def get_model_info(self) -> Dict[str, Any]:
+        """What each loaded condition is served from"""
+        return {
+            condition: {
+                "file": os.path.basename(model['source_file']),
+                "backend": model['backend'].name,
+                "method": model['method'],
+                "accuracy": model['accuracy'],
+                "fingerprint": model['fingerprint']
+            }
+            for condition, model in self.models.items()
+        }
+
+    def get_cascade_stats(self) -> Dict[str, Any]:
+        """Early-exit counters of the conditions served by the cascade backend (this process only)"""
+        return {
+            condition: model['backend'].get_stats()
+            for condition, model in self.models.items() if model['backend'].name == 'cascade'
+        }
+
+    def build_feature_matrix(self, condition: str, rows: List[Dict[str, Any]]) -> np.ndarray:
+        """Stack raw assessment rows into the unscaled matrix a condition's model expects"""
+        if condition == 'autism':
+            return self.autism_feature_matrix(self.autism_answers(rows))
+
+        feature_names = self.models[condition]['feature_names']
+        return np.array(
+            [[float(row[name]) for name in feature_names] for row in rows],
+            dtype=np.float64
+        ).reshape(len(rows), len(feature_names))
+
+    def autism_answers(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        """Clamped 1-5 answers to the seven questionnaire items, one row per assessment"""
+        answers = np.full((len(rows), len(AUTISM_ASSESSMENT_FIELDS)), AUTISM_NEUTRAL_ANSWER, dtype=np.int64)
+        for i, row in enumerate(rows):
+            clamped = self.preprocessor.preprocess_autism_assessment(row)
+            for j, name in enumerate(AUTISM_ASSESSMENT_FIELDS):
+                if name in clamped:
+                    answers[i, j] = clamped[name]
+        return answers
+
+    def autism_feature_matrix(self, answers: np.ndarray) -> np.ndarray:
+        """Expand questionnaire answers to the autism model's features; unasked items stay neutral"""
+        feature_names = self.models['autism']['feature_names']
+        matrix = np.full((len(answers), len(feature_names)), AUTISM_NEUTRAL_ANSWER, dtype=np.float64)
+        for j, name in enumerate(AUTISM_ASSESSMENT_FIELDS):
+            if name in feature_names:
+                matrix[:, feature_names.index(name)] = answers[:, j]
+        return matrix
+
+    def feature_matrices(
+        self, assessments: List[Dict[str, Dict[str, Any]]]
+    ) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """Unscaled matrices per condition and the clamped autism answers of a list of assessments
+
+        There is no autism matrix when the lookup table answers autism.
+        """
+        matrices = {
+            'dyslexia': self.build_feature_matrix('dyslexia', [a['dyslexia_features'] for a in assessments]),
+            'adhd': self.build_feature_matrix('adhd', [a['adhd_features'] for a in assessments])
+        }
+        autism_answers = self.autism_answers([a['autism_assessment'] for a in assessments])
+        if not self.autism_lookup:
+            matrices['autism'] = self.autism_feature_matrix(autism_answers)
+        return matrices, autism_answers
+
+    def predict_assessments(self, assessments: List[Dict[str, Dict[str, Any]]]) -> Dict[str, np.ndarray]:
+        """Positive-class probabilities per condition, scored in the calling thread"""
+        matrices, autism_answers = self.feature_matrices(assessments)
+        probabilities = self.predict_matrices(matrices)
+        if self.autism_lookup:
+            probabilities['autism'] = self.autism_lookup.lookup(autism_answers)
+        return probabilities
+
+    def predict_matrices(self, matrices: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Score one unscaled matrix per condition, returning positive-class probabilities"""
+        probabilities = {}
+        for condition, matrix in matrices.items():
+            model = self.models[condition]
+            scaled = model['scaler'].transform(matrix)
+            probabilities[condition] = model['backend'].predict_proba(scaled)[:, 1]
+        return probabilities
+
+    def format_result(self, condition: str, probability: float) -> Dict[str, Any]:
+        """Turn a positive-class probability into the result shape the API returns"""
+        model = self.models[condition]
+        probability = float(probability)
+
+        if probability >= self.high_confidence[condition]:
+            strength = "high"
+        elif probability >= 0.65:
+            strength = "moderate"
+        elif probability >= 0.5:
+            strength = "mild"
+        else:
+            strength = "none"
+
+        return {
+            "prediction": int(probability >= 0.5),
+            "confidence": probability,
+            "probability": probability,
+            "simulation_strength": strength,
+            "accuracy": model['accuracy'],
+            "method": model['method']
+        }
+
+    async def detect_batch(self, assessments: List[Dict[str, Dict[str, Any]]]) -> List[Dict[str, Dict]]:
+        """Score many assessments with one predict_proba call per condition
+
+        Each assessment holds ``dyslexia_features``, ``adhd_features`` and
+        ``autism_assessment`` dicts, as accepted by detect_all_disabilities.
+        """
+        if not assessments:
+            return []
+        if not self.models_loaded:
+            # Lazy loading mode: the first request pays the load
+            await self.load_models()
+
+        matrices, autism_answers = self.feature_matrices(assessments)
+        if self.executor:
+            probabilities = await self.executor.predict(self, matrices)
+        else:
+            probabilities = self.predict_matrices(matrices)
+
+        # The questionnaire has a finite domain; every answer vector is precomputed
+        if self.autism_lookup:
+            probabilities['autism'] = self.autism_lookup.lookup(autism_answers)
+
+        return [
+            {condition: self.format_result(condition, probabilities[condition][i]) for condition in CONDITIONS}
+            for i in range(len(assessments))
+        ]
+
+    async def detect_all_disabilities(
+        self,
+        dyslexia_features: Dict[str, float],
+        adhd_features: Dict[str, float],
+        autism_assessment: Dict[str, int],
+        user_age: Optional[int] = None
+    ) -> Dict[str, Dict]:
+        """Run all three detectors for a single assessment"""
+        results = await self.detect_batch([{
+            'dyslexia_features': dyslexia_features,
+            'adhd_features': adhd_features,
+            'autism_assessment': autism_assessment
+        }])
+        return results[0]
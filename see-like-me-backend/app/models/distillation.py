@@ -0,0 +1,214 @@
+"""Distilled students: one compact model per condition, fitted on its ensemble's probabilities
+
+    python -m app.models.distillation --models-dir models --kind gbdt
+
+The teacher (the condition's soft-voting ensemble) labels a transfer set
+with its positive-class probability and the student learns those soft
+labels directly:
+
+* ``gbdt``: a shallow LightGBM with the cross-entropy objective, compiled
+  into a single-member CompiledEnsemble;
+* ``linear``: a logistic regression on the scaled features (each row
+  weighted by the teacher's probability of either class).
+
+Both are stored as plain NumPy arrays in ``student_<condition>_model.pkl``,
+so serving a student (``INFERENCE_BACKEND=student``) imports no booster
+library. Agreement with the teacher is measured on held-out rows and stored
+in the artifact; retrain_compatible_models.py runs this as its last stage.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+from app.models.compiled_trees import compile_tree_model
+
+STUDENT_KINDS = ('gbdt', 'linear')
+
+# Students agreeing less often with their teacher on held-out rows are not written
+MIN_AGREEMENT = 0.95
+
+STUDENT_PARAMS = {
+    # Depth bounds the compiled evaluator's descent steps, so it sets the batch cost
+    'gbdt': dict(objective='cross_entropy', n_estimators=200, num_leaves=31, max_depth=6,
+                 learning_rate=0.1, min_child_samples=10, verbose=-1),
+    'linear': dict(C=10.0, max_iter=1000)
+}
+
+
+def student_artifact_path(model_path: str, condition: str) -> str:
+    return os.path.join(model_path, f'student_{condition}_model.pkl')
+
+
+class LinearStudent:
+    """``sigmoid(X @ coef + intercept)`` as a two-column ``predict_proba``"""
+
+    def __init__(self, coef: np.ndarray, intercept: float):
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        positive = 1.0 / (1.0 + np.exp(-(np.asarray(X, dtype=np.float64) @ self.coef + self.intercept)))
+        return np.column_stack([1.0 - positive, positive])
+
+
+def transfer_rows(condition: str, scaler, feature_names, X_base: Optional[np.ndarray],
+                  n_rows: int, rng: np.random.Generator, jitter_copies: int = 4) -> np.ndarray:
+    """Scaled rows for the teacher to label: the base rows, jittered copies and broad random draws
+
+    Autism rows stay on the 1-5 answer grid, half of them with only the
+    seven served questionnaire items answered and the rest neutral.
+    """
+    n_features = len(feature_names)
+    parts = [] if X_base is None else [X_base] + [
+        X_base + rng.normal(0.0, 0.1, size=X_base.shape) for _ in range(jitter_copies)
+    ]
+    if condition == 'autism':
+        from app.models.disability_detector import AUTISM_ASSESSMENT_FIELDS, AUTISM_NEUTRAL_ANSWER
+
+        answers = rng.integers(1, 6, size=(n_rows, n_features)).astype(np.float64)
+        served = np.full((n_rows, n_features), float(AUTISM_NEUTRAL_ANSWER))
+        for name in AUTISM_ASSESSMENT_FIELDS:
+            served[:, feature_names.index(name)] = answers[:, feature_names.index(name)]
+        parts += [scaler.transform(answers[:n_rows // 2]), scaler.transform(served[n_rows // 2:])]
+    else:
+        # Scaled training data is ~N(0, 1); widen it to cover the tails too
+        parts.append(rng.normal(0.0, 1.5, size=(n_rows, n_features)))
+    return np.vstack(parts)
+
+
+def fit_student(kind: str, X: np.ndarray, teacher_probability: np.ndarray, seed: int = 42):
+    """A student of ``kind`` fitted to the teacher's positive-class probabilities"""
+    if kind == 'gbdt':
+        import lightgbm as lgb
+
+        model = lgb.LGBMRegressor(random_state=seed, **STUDENT_PARAMS['gbdt'])
+        model.fit(X, teacher_probability)
+        return compile_tree_model(model, X.shape[1], name='student')
+
+    if kind == 'linear':
+        from sklearn.linear_model import LogisticRegression
+
+        model = LogisticRegression(random_state=seed, **STUDENT_PARAMS['linear'])
+        model.fit(np.vstack([X, X]), np.r_[np.ones(len(X)), np.zeros(len(X))],
+                  sample_weight=np.r_[teacher_probability, 1.0 - teacher_probability])
+        return LinearStudent(model.coef_[0], model.intercept_[0])
+
+    raise ValueError(f"Unknown student kind '{kind}' (expected one of {', '.join(STUDENT_KINDS)})")
+
+
+def evaluate_student(student, teacher, X: np.ndarray, y: Optional[np.ndarray] = None) -> Dict[str, float]:
+    """Agreement with the teacher on ``X`` and, given true labels, both models' accuracy"""
+    teacher_p = teacher.predict_proba(X)[:, 1]
+    student_p = student.predict_proba(X)[:, 1]
+    report = {
+        'agreement': float(np.mean((student_p >= 0.5) == (teacher_p >= 0.5))),
+        'mean_abs_error': float(np.mean(np.abs(student_p - teacher_p))),
+        'max_abs_error': float(np.max(np.abs(student_p - teacher_p)))
+    }
+    if y is not None:
+        report['accuracy'] = float(np.mean((student_p >= 0.5) == y))
+        report['teacher_accuracy'] = float(np.mean((teacher_p >= 0.5) == y))
+    return report
+
+
+def distill(condition: str, teacher, scaler, feature_names, kind: str = 'gbdt',
+            X_base: Optional[np.ndarray] = None, X_test: Optional[np.ndarray] = None,
+            y_test: Optional[np.ndarray] = None, n_rows: int = 20000, seed: int = 42):
+    """Fit a student to ``teacher`` and evaluate it; returns ``(student, report)``
+
+    ``X_base`` (e.g. the scaled training split) seeds the transfer set;
+    agreement is measured on ``X_test`` when given, otherwise on fresh rows.
+    """
+    rng = np.random.default_rng(seed)
+    feature_names = list(feature_names)
+    X_transfer = transfer_rows(condition, scaler, feature_names, X_base, n_rows, rng)
+    student = fit_student(kind, X_transfer, teacher.predict_proba(X_transfer)[:, 1], seed)
+
+    X_eval = X_test if X_test is not None else transfer_rows(
+        condition, scaler, feature_names, None, max(1000, n_rows // 5), rng
+    )
+    report = evaluate_student(student, teacher, X_eval, y_test)
+    report['transfer_rows'] = int(len(X_transfer))
+    return student, report
+
+
+def save_student(model_path: str, condition: str, student, kind: str, scaler, feature_names,
+                 report: Dict[str, Any], teacher_accuracy: float, teacher_fingerprint: str) -> str:
+    """Write ``student_<condition>_model.pkl`` next to its teacher"""
+    import joblib
+
+    path = student_artifact_path(model_path, condition)
+    joblib.dump({
+        'student': student,
+        'kind': kind,
+        'scaler': scaler,
+        'feature_names': list(feature_names),
+        # Served accuracy: measured when true labels were available, else the teacher's
+        'accuracy': report.get('accuracy', teacher_accuracy),
+        'teacher_accuracy': report.get('teacher_accuracy', teacher_accuracy),
+        'agreement': report['agreement'],
+        'report': report,
+        'teacher_fingerprint': teacher_fingerprint,
+        'model_type': f'distilled_{kind}_student',
+        'created_at': datetime.now().isoformat()
+    }, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def read_student_artifact(model_path: str, condition: str) -> Dict[str, Any]:
+    """Load a student as a detector model record; ``student`` stands in for the ensemble"""
+    import joblib
+    from app.models.disability_detector import artifact_fingerprint
+
+    source_file = student_artifact_path(model_path, condition)
+    artifact = joblib.load(source_file)
+    return {
+        'estimator': None,
+        'student': artifact['student'],
+        'scaler': artifact['scaler'],
+        'feature_names': artifact['feature_names'],
+        'accuracy': float(artifact['accuracy']),
+        'method': artifact['model_type'],
+        'source_file': source_file,
+        'fingerprint': artifact_fingerprint(source_file),
+        'teacher_fingerprint': artifact['teacher_fingerprint']
+    }
+
+
+def main(argv=None) -> int:
+    from app.models.disability_detector import CONDITIONS, read_model_artifact
+
+    parser = argparse.ArgumentParser(description="Distill each condition's ensemble into a compact student")
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--conditions', nargs='+', choices=CONDITIONS, default=list(CONDITIONS))
+    parser.add_argument('--kind', choices=STUDENT_KINDS, default='gbdt')
+    parser.add_argument('--rows', type=int, default=20000, help='transfer rows labelled by the teacher')
+    parser.add_argument('--min-agreement', type=float, default=MIN_AGREEMENT,
+                        help='students agreeing less with their teacher are not written')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    ok = True
+    for condition in args.conditions:
+        model = read_model_artifact(args.models_dir, condition)
+        student, report = distill(condition, model['estimator'], model['scaler'], model['feature_names'],
+                                  args.kind, n_rows=args.rows, seed=args.seed)
+        print(f"🎓 {condition} {args.kind} student: {report['agreement'] * 100:.2f}% agreement, "
+              f"mean |Δp| {report['mean_abs_error']:.4f}")
+        if report['agreement'] < args.min_agreement:
+            print(f"   ❌ below {args.min_agreement:.2%} agreement; not written")
+            ok = False
+            continue
+        path = save_student(args.models_dir, condition, student, args.kind, model['scaler'],
+                            model['feature_names'], report, model['accuracy'], model['fingerprint'])
+        print(f"   ✅ {path}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
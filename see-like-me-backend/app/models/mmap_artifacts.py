@@ -0,0 +1,99 @@
+"""Memory-mappable model artifacts
+
+One directory per condition, written by ``python -m app.models.convert_models``::
+
+    models/compiled_<condition>_model/
+        manifest.json            feature names, accuracy, method, member table,
+                                 fingerprint of the source pickle
+        scaler_mean.npy          StandardScaler parameters
+        scaler_scale.npy
+        feature.npy, ...         CompiledEnsemble node arrays
+
+Every numeric payload is a plain ``.npy`` buffer opened with ``mmap_mode='r'``,
+so all worker processes on a host share one copy through the OS page cache
+instead of each unpickling its own trees.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+from app.models.compiled_trees import CompiledEnsemble
+
+MANIFEST_FILE = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+def compiled_artifact_dir(model_path: str, condition: str) -> str:
+    return os.path.join(model_path, f'compiled_{condition}_model')
+
+
+class ArrayScaler:
+    """``StandardScaler.transform`` over (possibly memory-mapped) mean and scale arrays"""
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean = mean
+        self.scale = scale
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+
+
+def save_mmap_artifact(directory: str, condition: str, model: Dict[str, Any],
+                       compiled: CompiledEnsemble, **metadata):
+    """Write a condition's scaler, compiled trees and metadata as an mmap-able artifact"""
+    header = compiled.save_arrays(directory)
+    scaler = model['scaler']
+    np.save(os.path.join(directory, 'scaler_mean.npy'), np.asarray(scaler.mean_, dtype=np.float64))
+    np.save(os.path.join(directory, 'scaler_scale.npy'), np.asarray(scaler.scale_, dtype=np.float64))
+
+    manifest = dict(
+        metadata,
+        format_version=FORMAT_VERSION,
+        condition=condition,
+        feature_names=list(model['feature_names']),
+        accuracy=model['accuracy'],
+        method=model['method'],
+        source_file=os.path.basename(model['source_file']),
+        fingerprint=model['fingerprint'],
+        created_at=datetime.now().isoformat(),
+        **header
+    )
+    # Written last: a directory without a manifest is never picked up half-written
+    with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def read_manifest(directory: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    return manifest if manifest.get('format_version') == FORMAT_VERSION else None
+
+
+def load_mmap_artifact(directory: str) -> Dict[str, Any]:
+    """Open an artifact as a detector model record, without unpickling anything
+
+    The record carries ``compiled`` instead of a fitted ``estimator``.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"No memory-mappable model artifact in {directory}")
+
+    return {
+        'estimator': None,
+        'compiled': CompiledEnsemble.load_arrays(directory, manifest),
+        'scaler': ArrayScaler(
+            np.load(os.path.join(directory, 'scaler_mean.npy'), mmap_mode='r'),
+            np.load(os.path.join(directory, 'scaler_scale.npy'), mmap_mode='r')
+        ),
+        'feature_names': manifest['feature_names'],
+        'accuracy': float(manifest['accuracy']),
+        'method': manifest['method'],
+        'source_file': directory,
+        'fingerprint': manifest['fingerprint']
+    }
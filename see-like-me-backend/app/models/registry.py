@@ -0,0 +1,174 @@
+"""Versioned model registry
+
+    python -m app.models.registry publish --from models --activate
+    python -m app.models.registry list
+    python -m app.models.registry activate 20261018_093000
+
+Layout::
+
+    models/registry/
+        ACTIVE                    name of the served version
+        20261018_093000/
+            manifest.json         version, creation time, notes, accuracy per
+                                  condition, content hash of every file
+            compatible_*_model.pkl, compiled_*_model/, student_*_model.pkl, ...
+
+A version directory is a complete MODEL_PATH and is never modified once
+published (it is copied under a temporary name and renamed into place).
+Activating a version only rewrites ACTIVE, atomically; running servers pick
+it up through their watcher or the admin endpoint and hot-swap the detector.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from app.core.config import settings
+
+MANIFEST_FILE = 'manifest.json'
+ACTIVE_FILE = 'ACTIVE'
+
+
+class ModelRegistry:
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or settings.MODEL_REGISTRY_DIR
+
+    def version_path(self, version: str) -> str:
+        if not version or os.sep in version or version.startswith('.'):
+            raise ValueError(f"Invalid model version name: {version!r}")
+        return os.path.join(self.root, version)
+
+    def read_manifest(self, version: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.version_path(version), MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def list_versions(self) -> List[Dict[str, Any]]:
+        """Manifests of every published version, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        manifests = [self.read_manifest(name) for name in sorted(os.listdir(self.root))
+                     if not name.startswith('.') and os.path.isdir(os.path.join(self.root, name))]
+        return [manifest for manifest in manifests if manifest is not None]
+
+    def active_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def active_path(self) -> Optional[str]:
+        version = self.active_version()
+        return self.version_path(version) if version else None
+
+    def set_active(self, version: str):
+        """Point ACTIVE at a published version"""
+        if self.read_manifest(version) is None:
+            raise FileNotFoundError(f"Model version {version} is not in the registry ({self.root})")
+        tmp_path = os.path.join(self.root, f'.{ACTIVE_FILE}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(version + '\n')
+        os.replace(tmp_path, os.path.join(self.root, ACTIVE_FILE))
+
+    def verify(self, version: str) -> Dict[str, Any]:
+        """The version's manifest, after checking every listed file is present and unchanged"""
+        from app.models.disability_detector import artifact_fingerprint
+
+        manifest = self.read_manifest(version)
+        if manifest is None:
+            raise FileNotFoundError(f"Model version {version} is not in the registry ({self.root})")
+        directory = self.version_path(version)
+        for name, fingerprint in manifest['files'].items():
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Model version {version} is missing {name}")
+            if artifact_fingerprint(path) != fingerprint:
+                raise ValueError(f"Model version {version}: {name} does not match its manifest")
+        return manifest
+
+    def publish(self, source_dir: str, version: Optional[str] = None, notes: str = "") -> Dict[str, Any]:
+        """Copy a model directory into the registry as a new, immutable version"""
+        import joblib
+        from app.models.disability_detector import ARTIFACT_KEYS, CONDITIONS, MODEL_FILES, artifact_fingerprint
+
+        version = version or datetime.now().strftime('%Y%m%d_%H%M%S')
+        directory = self.version_path(version)
+        if os.path.exists(directory):
+            raise FileExistsError(f"Model version {version} already exists")
+        missing = [MODEL_FILES[c] for c in CONDITIONS if not os.path.exists(os.path.join(source_dir, MODEL_FILES[c]))]
+        if missing:
+            raise FileNotFoundError(f"{source_dir} is missing {', '.join(missing)}")
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = os.path.join(self.root, f'.{version}.tmp')
+        registry = os.path.abspath(self.root)
+        shutil.copytree(source_dir, tmp_dir, ignore=lambda current, names: [
+            name for name in names
+            if name.startswith('.') or os.path.abspath(os.path.join(current, name)) == registry
+        ])
+
+        files = {}
+        for current, _, names in os.walk(tmp_dir):
+            for name in names:
+                path = os.path.join(current, name)
+                files[os.path.relpath(path, tmp_dir)] = artifact_fingerprint(path)
+        accuracy = {}
+        for condition in CONDITIONS:
+            artifact = joblib.load(os.path.join(tmp_dir, MODEL_FILES[condition]))
+            accuracy[condition] = float(artifact[ARTIFACT_KEYS[condition][1]])
+
+        manifest = {
+            'version': version,
+            'created_at': datetime.now().isoformat(),
+            'source': os.path.abspath(source_dir),
+            'notes': notes,
+            'accuracy': accuracy,
+            'files': dict(sorted(files.items()))
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_dir, directory)
+        return manifest
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Publish, list and activate model versions")
+    parser.add_argument('--registry', default=None, help=f'registry directory (default {settings.MODEL_REGISTRY_DIR})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    publish = commands.add_parser('publish', help='copy a model directory in as a new version')
+    publish.add_argument('--from', dest='source', default='models')
+    publish.add_argument('--version', default=None)
+    publish.add_argument('--notes', default='')
+    publish.add_argument('--activate', action='store_true')
+    commands.add_parser('list', help='show published versions')
+    activate = commands.add_parser('activate', help='serve a published version')
+    activate.add_argument('version')
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.registry)
+    if args.command == 'publish':
+        manifest = registry.publish(args.source, args.version, args.notes)
+        print(f"✅ Published {manifest['version']} ({len(manifest['files'])} files)")
+        if args.activate:
+            registry.set_active(manifest['version'])
+            print(f"🚀 {manifest['version']} is now active")
+    elif args.command == 'list':
+        active = registry.active_version()
+        for manifest in registry.list_versions():
+            accuracy = ', '.join(f"{c} {a * 100:.1f}%" for c, a in manifest['accuracy'].items())
+            print(f"{'*' if manifest['version'] == active else ' '} {manifest['version']}  {accuracy}  {manifest['notes']}")
+    else:
+        registry.verify(args.version)
+        registry.set_active(args.version)
+        print(f"🚀 {args.version} is now active")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
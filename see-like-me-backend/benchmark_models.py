@@ -0,0 +1,288 @@
+"""Training and inference benchmarks for the compatible ensembles
+
+    python benchmark_models.py --models-dir models --output bench.json
+    python benchmark_models.py --models-dir models --compare baseline.json
+    python benchmark_models.py --report bench.json --compare baseline.json
+
+Records, per condition:
+
+* fit wall time and peak RSS of every ensemble member, each fitted alone in
+  a fresh process on the same scaled SMOTE split retrain_compatible_models.py
+  trains on (``--skip-fit`` to leave out);
+* the artifact's size on disk and its load time through the serving path
+  (read_model_artifact, read_student_artifact, or load_mmap_artifact on the
+  compiled_<condition>_model/ directory for ``compiled``; ``cascade`` adds
+  the student to the ensemble served as ``--cascade-full-backend``; then
+  create_backend) for each ``--backends`` entry;
+* single-row and batched ``predict_proba`` latency percentiles.
+
+The report is JSON. ``--compare`` flags every metric more than
+``--tolerance`` worse than the baseline report and exits 1 if any are.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List
+
+import numpy as np
+
+import synthetic_data
+
+# Leaves of these names are compared; all but *_per_second are lower-is-better
+COMPARED_METRICS = ('fit_seconds', 'peak_rss_mb', 'artifact_mb', 'load_seconds',
+                    'p50_ms', 'p90_ms', 'p99_ms', 'mean_ms', 'rows_per_second')
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def artifact_mb(path: str) -> float:
+    """Size of an artifact file, or of every file under an artifact directory"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(current, name))
+                   for current, _, names in os.walk(path) for name in names) / 1e6
+    return os.path.getsize(path) / 1e6
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    samples = np.asarray(samples_ms)
+    return {
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p90_ms': round(float(np.percentile(samples, 90)), 4),
+        'p99_ms': round(float(np.percentile(samples, 99)), 4),
+        'mean_ms': round(float(samples.mean()), 4)
+    }
+
+# ============================================================================
+# TRAINING
+# ============================================================================
+
+def _fit_in_child(condition: str, name: str, params: Dict[str, Any], threads: int) -> Dict[str, Any]:
+    """Runs in a fresh process, so the RSS peak belongs to this one fit"""
+    from retrain_compatible_models import CONDITION_SPECS, build_dataset, prepare_training_data, fit_member
+
+    X, y, _ = build_dataset(condition, CONDITION_SPECS[condition]['n_samples'])
+    data = prepare_training_data(X, y)
+    baseline = _rss_mb()
+    _, seconds = fit_member(name, params, data['X_train'], data['y_train'], threads)
+    peak = _rss_mb()
+    return {'fit_seconds': round(seconds, 4), 'peak_rss_mb': round(peak, 1),
+            'peak_rss_delta_mb': round(peak - baseline, 1)}
+
+
+def benchmark_fit(conditions: List[str], threads: int) -> Dict[str, Any]:
+    from retrain_compatible_models import CONDITION_SPECS
+
+    results: Dict[str, Any] = {}
+    for condition in conditions:
+        results[condition] = {}
+        for name, params in CONDITION_SPECS[condition]['members']:
+            with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool:
+                results[condition][name] = pool.submit(_fit_in_child, condition, name, params, threads).result()
+            print(f"   🏋️ {condition}/{name}: {results[condition][name]['fit_seconds']:.2f}s, "
+                  f"peak {results[condition][name]['peak_rss_mb']:.0f} MB")
+    return results
+
+# ============================================================================
+# INFERENCE
+# ============================================================================
+
+def benchmark_condition(condition: str, backend: str, models_dir: str, single_rows: int,
+                        batch_sizes: List[int], batch_repeats: int,
+                        cascade_full_backend: str = 'native') -> Dict[str, Any]:
+    from app.models.backends import create_backend
+    from app.models.disability_detector import attach_cascade_student, compiled_artifact_is_current, read_model_artifact
+    from app.models.distillation import read_student_artifact
+    from app.models.mmap_artifacts import compiled_artifact_dir, load_mmap_artifact
+
+    # The ensemble as the backend (or the cascade's full stage) serves it
+    ensemble_backend = cascade_full_backend if backend == 'cascade' else backend
+    if ensemble_backend == 'compiled' and not compiled_artifact_is_current(models_dir, condition):
+        raise FileNotFoundError(f"{compiled_artifact_dir(models_dir, condition)} is missing or stale; "
+                                f"run python -m app.models.convert_models --models-dir {models_dir}")
+
+    start = time.perf_counter()
+    if backend == 'student':
+        model = read_student_artifact(models_dir, condition)
+    elif ensemble_backend == 'compiled':
+        # As served: the converted trees, memory-mapped, with no unpickling or compiling
+        model = load_mmap_artifact(compiled_artifact_dir(models_dir, condition))
+    else:
+        model = read_model_artifact(models_dir, condition)
+    if backend == 'cascade':
+        attach_cascade_student(model, models_dir, condition, cascade_full_backend)
+    scorer = create_backend(backend, condition, model, models_dir)
+    load_seconds = time.perf_counter() - start
+
+    X_raw, _ = synthetic_data.generate(condition, max(single_rows, max(batch_sizes)), seed=7)
+    X = model['scaler'].transform(X_raw)
+
+    scorer.predict_proba(X[:1])  # warm-up
+    single = []
+    for i in range(single_rows):
+        start = time.perf_counter()
+        scorer.predict_proba(X[i:i + 1])
+        single.append((time.perf_counter() - start) * 1000)
+
+    batches = {}
+    for size in batch_sizes:
+        samples = []
+        for _ in range(batch_repeats):
+            start = time.perf_counter()
+            scorer.predict_proba(X[:size])
+            samples.append((time.perf_counter() - start) * 1000)
+        batches[str(size)] = dict(percentiles(samples),
+                                  rows_per_second=round(size / (float(np.median(samples)) / 1000), 1))
+
+    return {
+        'artifact_mb': round(artifact_mb(model['source_file'])
+                             + (artifact_mb(model['student_source_file']) if backend == 'cascade' else 0), 3),
+        'load_seconds': round(load_seconds, 4),
+        'single_row': percentiles(single),
+        'batch': batches
+    }
+
+
+def benchmark_inference(conditions: List[str], backends: List[str], models_dir: str, single_rows: int,
+                        batch_sizes: List[int], batch_repeats: int,
+                        cascade_full_backend: str = 'native') -> Dict[str, Any]:
+    # Import the booster libraries up front so the first load doesn't carry their import time
+    import catboost, lightgbm, xgboost, sklearn.ensemble  # noqa: F401, E401
+
+    results: Dict[str, Any] = {}
+    for backend in backends:
+        results[backend] = {}
+        for condition in conditions:
+            result = benchmark_condition(condition, backend, models_dir, single_rows, batch_sizes, batch_repeats,
+                                         cascade_full_backend)
+            results[backend][condition] = result
+            print(f"   ⚡ {backend}/{condition}: load {result['load_seconds']:.2f}s, "
+                  f"single p50 {result['single_row']['p50_ms']:.2f} ms, "
+                  f"batch {batch_sizes[-1]} p50 {result['batch'][str(batch_sizes[-1])]['p50_ms']:.2f} ms")
+    return results
+
+# ============================================================================
+# REPORTS
+# ============================================================================
+
+def environment() -> Dict[str, Any]:
+    import catboost, lightgbm, sklearn, xgboost  # noqa: E401
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': {'numpy': np.__version__, 'sklearn': sklearn.__version__, 'xgboost': xgboost.__version__,
+                     'lightgbm': lightgbm.__version__, 'catboost': catboost.__version__}
+    }
+
+
+def flatten(report: Dict[str, Any], prefix: str = '') -> Dict[str, float]:
+    """Compared metrics as ``{'inference.native.adhd.single_row.p50_ms': 1.2, ...}``"""
+    metrics = {}
+    for key, value in report.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            metrics.update(flatten(value, path))
+        elif key in COMPARED_METRICS and isinstance(value, (int, float)):
+            metrics[path] = float(value)
+    return metrics
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Metrics in both reports that got worse by more than ``tolerance`` (a fraction)"""
+    current = flatten({key: report.get(key, {}) for key in ('fit', 'inference')})
+    previous = flatten({key: baseline.get(key, {}) for key in ('fit', 'inference')})
+    regressions = []
+    for path in sorted(current.keys() & previous.keys()):
+        before, after = previous[path], current[path]
+        if before <= 0:
+            continue
+        change = (after - before) / before
+        worse = -change if path.endswith('rows_per_second') else change
+        if worse > tolerance:
+            regressions.append({'metric': path, 'baseline': before, 'current': after,
+                                'change_percent': round(change * 100, 1)})
+    return regressions
+
+
+def main(argv=None) -> int:
+    from app.models.backends import BACKENDS
+    from app.models.disability_detector import CONDITIONS
+
+    parser = argparse.ArgumentParser(description="Benchmark training and inference of the compatible ensembles")
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--conditions', nargs='+', choices=CONDITIONS, default=list(CONDITIONS))
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=['native'])
+    parser.add_argument('--cascade-full-backend', choices=('native', 'compiled', 'onnx'), default='native',
+                        help='how the cascade serves the rows its student is unsure of')
+    parser.add_argument('--skip-fit', action='store_true', help='only benchmark inference')
+    parser.add_argument('--fit-threads', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--single-rows', type=int, default=200, help='single-row predictions timed')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[32, 256, 1024])
+    parser.add_argument('--batch-repeats', type=int, default=20)
+    parser.add_argument('--output', default=None, help='write the JSON report here')
+    parser.add_argument('--report', default=None, help='compare this existing report instead of running')
+    parser.add_argument('--compare', default=None, help='baseline report to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='largest fractional slowdown (or size growth) not flagged')
+    args = parser.parse_args(argv)
+
+    if args.report:
+        with open(args.report) as f:
+            report = json.load(f)
+    else:
+        report = {'environment': environment(), 'fit': {}, 'inference': {}}
+        if not args.skip_fit:
+            print("🏋️ Fitting ensemble members...")
+            report['fit'] = benchmark_fit(args.conditions, args.fit_threads)
+        print("⚡ Timing inference...")
+        report['inference'] = benchmark_inference(args.conditions, args.backends, args.models_dir,
+                                                  args.single_rows, sorted(args.batch_sizes), args.batch_repeats,
+                                                  args.cascade_full_backend)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report['regressions'] = compare(report, baseline, args.tolerance)
+        report['baseline'] = {'file': args.compare, 'environment': baseline.get('environment'),
+                              'tolerance': args.tolerance}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Report written to {args.output}")
+    elif not args.report:
+        print(json.dumps(report, indent=2))
+
+    if not args.compare:
+        return 0
+    if not report['regressions']:
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.compare}")
+        return 0
+    print(f"❌ {len(report['regressions'])} regression(s) beyond {args.tolerance:.0%} against {args.compare}:")
+    for regression in report['regressions']:
+        print(f"   {regression['metric']}: {regression['baseline']:g} -> {regression['current']:g} "
+              f"({regression['change_percent']:+.1f}%)")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
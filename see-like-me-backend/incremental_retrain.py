@@ -0,0 +1,237 @@
+"""Incremental warm-start retraining from labelled feedback
+
+    python incremental_retrain.py --models-dir models --feedback-dir data/feedback --promote
+
+Instead of regenerating the datasets and refitting every ensemble from
+scratch (retrain_compatible_models.py), this loads the current
+compatible_<condition>_model.pkl and continues from its fitted state:
+
+* XGBoost, LightGBM and CatBoost members keep their trees and boost
+  ``--boost-rounds`` more on the new rows;
+* RandomForest and ExtraTrees members replace their oldest
+  ``--forest-refresh`` fraction of trees with trees grown on the new rows.
+
+New rows are feedback records (the Parquet files written by
+app.core.feedback_pipeline) that carry a confirmed ``label`` (0/1) and the
+condition's assessment fields: feedback is stored with the assessment last
+served to its session, and the label is the optional ``label`` field of
+POST /api/v1/feedback or the WebSocket ``simulation_feedback`` message.
+They are mixed with replay rows labelled by the current ensemble, so a
+small batch refines the model instead of overwriting it. Scalers are kept,
+so existing split thresholds stay valid.
+
+Each run writes a versioned compatible_<condition>_model_<version>.pkl whose
+``training_history`` lists the feedback files already consumed; ``--promote``
+also replaces the served model when the holdout accuracy did not regress.
+The new artifact's accuracy (what the API reports) is its accuracy on the
+feedback holdout, marked by ``accuracy_source``.
+"""
+import argparse
+import copy
+import glob
+import os
+import sys
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+from app.models.disability_detector import (
+    CONDITIONS, MODEL_FILES, ARTIFACT_KEYS, AUTISM_ASSESSMENT_FIELDS, AUTISM_NEUTRAL_ANSWER, artifact_fingerprint
+)
+
+
+def feedback_files(feedback_dir: str, condition: str) -> List[str]:
+    """Every Parquet part file written for a condition, relative to ``feedback_dir``, oldest day first"""
+    pattern = os.path.join(feedback_dir, 'date=*', f'disability_type={condition}', '*.parquet')
+    return sorted(os.path.relpath(path, feedback_dir) for path in glob.glob(pattern))
+
+
+def assessment_columns(condition: str, feature_names: List[str]) -> List[str]:
+    """The fields a labelled feedback row must carry for a condition"""
+    return list(AUTISM_ASSESSMENT_FIELDS) if condition == 'autism' else list(feature_names)
+
+
+def load_labelled_feedback(paths: List[str], condition: str,
+                           feature_names: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Raw feature matrix and labels from the feedback rows that carry a label and every field"""
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    required = ['label'] + assessment_columns(condition, feature_names)
+    X_parts, y_parts = [], []
+    for path in paths:
+        table = pq.read_table(path)
+        if not set(required) <= set(table.column_names):
+            continue
+        labelled = np.ones(table.num_rows, dtype=bool)
+        for name in required:
+            labelled &= pc.is_valid(table.column(name)).to_numpy(zero_copy_only=False)
+        if not labelled.any():
+            continue
+
+        rows = np.full((int(labelled.sum()), len(feature_names)), float(AUTISM_NEUTRAL_ANSWER))
+        for name in required[1:]:
+            rows[:, feature_names.index(name)] = table.column(name).to_numpy(zero_copy_only=False)[labelled]
+        X_parts.append(rows)
+        y_parts.append(table.column('label').to_numpy(zero_copy_only=False)[labelled].astype(np.int64))
+
+    if not X_parts:
+        return np.empty((0, len(feature_names))), np.empty(0, dtype=np.int64)
+    return np.vstack(X_parts), np.concatenate(y_parts)
+
+
+def replay_rows(condition: str, model: Dict[str, Any], n_rows: int, rng: np.random.Generator) -> np.ndarray:
+    """Scaled rows resembling what the model was trained and served on"""
+    scaler = model['scaler']
+    if condition == 'autism':
+        # Served assessments answer seven questions; the rest are neutral
+        rows = np.full((n_rows, len(model['feature_names'])), float(AUTISM_NEUTRAL_ANSWER))
+        for name in AUTISM_ASSESSMENT_FIELDS:
+            rows[:, model['feature_names'].index(name)] = rng.integers(1, 6, size=n_rows)
+        return scaler.transform(rows)
+    return rng.normal(0.0, 1.0, size=(n_rows, len(model['feature_names'])))
+
+
+def warm_start_member(member, X: np.ndarray, y: np.ndarray, boost_rounds: int, forest_refresh: float):
+    """A copy of a fitted ensemble member that continues from its current state"""
+    kind = type(member).__name__
+    if kind == 'XGBClassifier':
+        updated = clone(member).set_params(n_estimators=boost_rounds)
+        updated.fit(X, y, xgb_model=member.get_booster())
+        return updated.set_params(n_estimators=updated.get_booster().num_boosted_rounds())
+    if kind == 'LGBMClassifier':
+        updated = clone(member).set_params(n_estimators=boost_rounds)
+        updated.fit(X, y, init_model=member.booster_)
+        return updated.set_params(n_estimators=updated.booster_.num_trees())
+    if kind == 'CatBoostClassifier':
+        updated = clone(member).set_params(iterations=boost_rounds)
+        updated.fit(X, y, init_model=member)
+        return updated
+    if kind in ('RandomForestClassifier', 'ExtraTreesClassifier'):
+        # Grow the new trees next to the old ones, then retire the oldest
+        n_trees = len(member.estimators_)
+        n_new = max(1, int(round(n_trees * forest_refresh)))
+        updated = copy.deepcopy(member).set_params(warm_start=True, n_estimators=n_trees + n_new)
+        updated.fit(X, y)
+        updated.estimators_ = updated.estimators_[n_new:]
+        return updated.set_params(warm_start=False, n_estimators=n_trees)
+    raise ValueError(f"Don't know how to warm-start a {kind}")
+
+
+def warm_start_ensemble(ensemble, X: np.ndarray, y: np.ndarray, boost_rounds: int, forest_refresh: float):
+    """A copy of a fitted VotingClassifier with every member warm-started"""
+    updated = copy.copy(ensemble)
+    updated.estimators_ = [
+        warm_start_member(member, X, y, boost_rounds, forest_refresh) for member in ensemble.estimators_
+    ]
+    updated.named_estimators_ = copy.copy(ensemble.named_estimators_)
+    for (name, _), member in zip(ensemble.estimators, updated.estimators_):
+        updated.named_estimators_[name] = member
+    return updated
+
+
+def incremental_update(args, condition: str) -> bool:
+    print(f"\n🔄 {condition}: incremental update of {MODEL_FILES[condition]}")
+    source_file = os.path.join(args.models_dir, MODEL_FILES[condition])
+    artifact = joblib.load(source_file)
+    estimator_key, accuracy_key, _ = ARTIFACT_KEYS[condition]
+    model = {'scaler': artifact['scaler'], 'feature_names': list(artifact['feature_names'])}
+
+    history = artifact.get('training_history', [])
+    consumed = {path for entry in history for path in entry.get('feedback_files', [])}
+    new_files = [path for path in feedback_files(args.feedback_dir, condition) if path not in consumed]
+    X_raw, y = load_labelled_feedback(
+        [os.path.join(args.feedback_dir, path) for path in new_files], condition, model['feature_names']
+    )
+    print(f"   {len(new_files)} new feedback file(s), {len(y)} labelled row(s)")
+    if len(y) < args.min_rows or len(np.unique(y)) < 2:
+        print(f"   ⏭️ Skipped: need at least {args.min_rows} labelled rows covering both classes")
+        return True
+
+    rng = np.random.default_rng(args.seed)
+    X_new = model['scaler'].transform(X_raw)
+    X_train, X_holdout, y_train, y_holdout = train_test_split(
+        X_new, y, test_size=args.holdout, random_state=args.seed, stratify=y
+    )
+
+    ensemble = artifact[estimator_key]
+    X_replay = replay_rows(condition, model, int(len(y_train) * args.replay_ratio), rng)
+    X_fit = np.vstack([X_train, X_replay])
+    y_fit = np.concatenate([y_train, ensemble.predict(X_replay)]) if len(X_replay) else y_train
+
+    start = datetime.now()
+    updated = warm_start_ensemble(ensemble, X_fit, y_fit, args.boost_rounds, args.forest_refresh)
+    elapsed = (datetime.now() - start).total_seconds()
+
+    before = accuracy_score(y_holdout, ensemble.predict(X_holdout))
+    after = accuracy_score(y_holdout, updated.predict(X_holdout))
+    print(f"   Fitted on {len(y_train)} feedback + {len(X_replay)} replay rows in {elapsed:.1f}s")
+    print(f"   Holdout accuracy: {before:.4f} -> {after:.4f}")
+
+    version = datetime.now().strftime('%Y%m%d_%H%M%S')
+    new_artifact = dict(artifact)
+    new_artifact[estimator_key] = updated
+    # The parent's accuracy was measured on another test set; report what this model was evaluated on
+    new_artifact[accuracy_key] = float(after)
+    new_artifact['accuracy_source'] = 'feedback_holdout'
+    new_artifact['version'] = version
+    new_artifact['parent_fingerprint'] = artifact_fingerprint(source_file)
+    new_artifact['training_history'] = history + [{
+        'version': version,
+        'mode': 'incremental',
+        'feedback_files': new_files,
+        'feedback_rows': int(len(y)),
+        'replay_rows': int(len(X_replay)),
+        'boost_rounds': args.boost_rounds,
+        'forest_refresh': args.forest_refresh,
+        'holdout_accuracy_before': float(before),
+        'holdout_accuracy_after': float(after),
+        'parent_accuracy': float(artifact[accuracy_key]),
+        'trained_at': datetime.now().isoformat()
+    }]
+
+    base, extension = os.path.splitext(source_file)
+    versioned_file = f"{base}_{version}{extension}"
+    joblib.dump(new_artifact, versioned_file)
+    print(f"   ✅ {versioned_file}")
+
+    if not args.promote:
+        return True
+    if after < before - args.max_regression:
+        print(f"   ❌ Not promoted: holdout accuracy regressed by more than {args.max_regression:.3f}")
+        return False
+    # Replace atomically so a loading server never reads a half-written pickle
+    joblib.dump(new_artifact, source_file + '.tmp')
+    os.replace(source_file + '.tmp', source_file)
+    print(f"   🚀 Promoted to {source_file}")
+    return True
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Warm-start the ensembles on labelled feedback")
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--feedback-dir', default='data/feedback')
+    parser.add_argument('--conditions', nargs='+', choices=CONDITIONS, default=list(CONDITIONS))
+    parser.add_argument('--boost-rounds', type=int, default=25, help='trees added to each booster')
+    parser.add_argument('--forest-refresh', type=float, default=0.1, help='fraction of forest trees replaced')
+    parser.add_argument('--replay-ratio', type=float, default=1.0,
+                        help='replay rows per feedback row, labelled by the current ensemble')
+    parser.add_argument('--min-rows', type=int, default=50)
+    parser.add_argument('--holdout', type=float, default=0.2)
+    parser.add_argument('--max-regression', type=float, default=0.01,
+                        help='largest holdout accuracy drop still promoted')
+    parser.add_argument('--promote', action='store_true', help='replace the served compatible_*_model.pkl')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    results = [incremental_update(args, condition) for condition in args.conditions]
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
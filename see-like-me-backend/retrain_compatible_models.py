@@ -1,11 +1,31 @@
+"""Retrain the compatible ensembles for the current environment
+
+    python retrain_compatible_models.py --models-dir models --workers 8
+
+Stages (dataset -> scaled/SMOTE split -> fitted members -> ensemble ->
+distilled student) are cached under --cache-dir, so a rerun only recomputes
+what changed. The ensemble members of all conditions are fitted
+concurrently in a process pool, each with its share of the cores. Run it
+from the backend directory: the student stage uses app.models.distillation.
+"""
+import argparse
+import hashlib
+import inspect
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import numpy as np
-import pandas as pd
-from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_score
+import sklearn
+from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import VotingClassifier, RandomForestClassifier, ExtraTreesClassifier
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+from sklearn.metrics import accuracy_score, classification_report
+from sklearn.utils import Bunch
 import xgboost as xgb
 import lightgbm as lgb
+import catboost
 from catboost import CatBoostClassifier
 from imblearn.over_sampling import SMOTE
 import joblib
@@ -13,449 +33,361 @@ from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
-print("🔄 RETRAINING ALL MODELS FOR CURRENT ENVIRONMENT...")
+import synthetic_data
+from synthetic_data import (
+    DYSLEXIA_FEATURES, ADHD_FEATURES, create_dyslexia_dataset, create_adhd_dataset, create_autism_dataset
+)
 
 # ============================================================================
-# 1. CREATE SYNTHETIC DATASETS (Since original data might not be available)
+# 1. PIPELINE CONFIGURATION
 # ============================================================================
 
-def create_dyslexia_dataset(n_samples=2000):
-    """Create realistic dyslexia dataset"""
-    np.random.seed(42)
-    
-    # Generate features
-    reading_speed = np.random.normal(120, 40, n_samples)  # WPM
-    comprehension_score = np.random.normal(75, 20, n_samples)  # %
-    spelling_accuracy = np.random.normal(80, 15, n_samples)  # %
-    phonemic_awareness = np.random.normal(6, 2, n_samples)  # 0-10 scale
-    working_memory = np.random.normal(6, 2, n_samples)  # 0-10 scale
-    
-    # Create labels based on realistic thresholds
-    labels = []
-    for i in range(n_samples):
-        score = 0
-        if reading_speed[i] < 80: score += 1
-        if comprehension_score[i] < 60: score += 1
-        if spelling_accuracy[i] < 70: score += 1
-        if phonemic_awareness[i] < 4: score += 1
-        if working_memory[i] < 4: score += 1
-        
-        # Add some noise
-        score += np.random.normal(0, 0.5)
-        labels.append(1 if score > 2.5 else 0)
-    
-    # Create DataFrame
-    data = pd.DataFrame({
-        'reading_speed': reading_speed,
-        'comprehension_score': comprehension_score,
-        'spelling_accuracy': spelling_accuracy,
-        'phonemic_awareness': phonemic_awareness,
-        'working_memory': working_memory,
-        'dyslexia': labels
-    })
-    
-    return data
-
-def create_adhd_dataset(n_samples=1500):
-    """Create realistic ADHD dataset"""
-    np.random.seed(42)
-    
-    # Generate features
-    attention_span = np.random.normal(15, 8, n_samples)  # minutes
-    hyperactivity_level = np.random.normal(5, 2, n_samples)  # 1-10 scale
-    impulsivity_score = np.random.normal(5, 2, n_samples)  # 1-10 scale
-    focus_duration = np.random.normal(20, 10, n_samples)  # minutes
-    task_completion = np.random.normal(70, 25, n_samples)  # %
-    
-    # Create labels based on ADHD criteria
-    labels = []
-    for i in range(n_samples):
-        score = 0
-        if attention_span[i] < 8: score += 1
-        if hyperactivity_level[i] > 7: score += 1
-        if impulsivity_score[i] > 7: score += 1
-        if focus_duration[i] < 10: score += 1
-        if task_completion[i] < 50: score += 1
-        
-        # Add noise
-        score += np.random.normal(0, 0.3)
-        labels.append(1 if score > 2.2 else 0)
-    
-    data = pd.DataFrame({
-        'attention_span': attention_span,
-        'hyperactivity_level': hyperactivity_level,
-        'impulsivity_score': impulsivity_score,
-        'focus_duration': focus_duration,
-        'task_completion': task_completion,
-        'adhd': labels
-    })
-    
-    return data
-
-def create_autism_dataset(n_samples=2500):
-    """Create realistic autism dataset"""
-    np.random.seed(42)
-    
-    features = []
-    labels = []
-    
-    for i in range(n_samples):
-        sample = {
-            'light_sensitivity': np.random.randint(1, 6),
-            'sound_sensitivity': np.random.randint(1, 6),
-            'texture_sensitivity': np.random.randint(1, 6),
-            'smell_sensitivity': np.random.randint(1, 6),
-            'taste_sensitivity': np.random.randint(1, 6),
-            'eye_contact_difficulty': np.random.randint(1, 6),
-            'social_interaction_challenges': np.random.randint(1, 6),
-            'nonverbal_communication': np.random.randint(1, 6),
-            'conversation_difficulty': np.random.randint(1, 6),
-            'social_cue_recognition': np.random.randint(1, 6),
-            'routine_importance': np.random.randint(1, 6),
-            'change_resistance': np.random.randint(1, 6),
-            'repetitive_behaviors': np.random.randint(1, 6),
-            'special_interests': np.random.randint(1, 6),
-            'stimming_behaviors': np.random.randint(1, 6),
-            'attention_to_detail': np.random.randint(1, 6),
-            'pattern_recognition': np.random.randint(1, 6),
-            'memory_abilities': np.random.randint(1, 6),
-            'processing_speed': np.random.randint(1, 6),
-            'executive_function': np.random.randint(1, 6)
-        }
-        
-        # Calculate autism likelihood
-        sensory_score = (sample['light_sensitivity'] + sample['sound_sensitivity'] + 
-                        sample['texture_sensitivity']) / 3
-        social_score = (sample['eye_contact_difficulty'] + sample['social_interaction_challenges'] + 
-                       sample['nonverbal_communication']) / 3
-        behavioral_score = (sample['routine_importance'] + sample['change_resistance'] + 
-                           sample['repetitive_behaviors']) / 3
-        
-        total_score = (sensory_score * 0.3 + social_score * 0.5 + behavioral_score * 0.2)
-        noise = np.random.normal(0, 0.4)
-        total_score += noise
-        
-        label = 1 if total_score > 3.1 else 0
-        
-        features.append(list(sample.values()))
-        labels.append(label)
-    
-    feature_names = list(sample.keys())
-    df = pd.DataFrame(features, columns=feature_names)
-    df['autism'] = labels
-    
-    return df, feature_names
+MEMBER_CLASSES = {
+    'xgb': xgb.XGBClassifier,
+    'lgb': lgb.LGBMClassifier,
+    'cat': CatBoostClassifier,
+    'rf': RandomForestClassifier,
+    'et': ExtraTreesClassifier
+}
+
+# Parameter each library takes its training thread count under
+THREAD_PARAMS = {'xgb': 'n_jobs', 'lgb': 'n_jobs', 'cat': 'thread_count', 'rf': 'n_jobs', 'et': 'n_jobs'}
+
+CONDITION_SPECS = {
+    'dyslexia': {
+        'title': 'Dyslexia',
+        'target': '98%+',
+        'n_samples': 2000,
+        'members': [
+            ('xgb', dict(n_estimators=300, max_depth=8, learning_rate=0.1, subsample=0.8,
+                         colsample_bytree=0.8, random_state=42)),
+            ('lgb', dict(n_estimators=300, num_leaves=50, learning_rate=0.1, random_state=42, verbose=-1)),
+            ('cat', dict(iterations=300, learning_rate=0.1, depth=8, random_seed=42, verbose=False)),
+            ('rf', dict(n_estimators=300, max_depth=12, min_samples_split=5, random_state=42)),
+            ('et', dict(n_estimators=300, max_depth=12, min_samples_split=5, random_state=42))
+        ]
+    },
+    'adhd': {
+        'title': 'ADHD',
+        'target': '75%+',
+        'n_samples': 1500,
+        'members': [
+            ('xgb', dict(n_estimators=250, max_depth=6, learning_rate=0.08, subsample=0.85,
+                         colsample_bytree=0.85, random_state=42)),
+            ('lgb', dict(n_estimators=250, num_leaves=40, learning_rate=0.1, random_state=42, verbose=-1)),
+            ('cat', dict(iterations=250, learning_rate=0.1, depth=7, random_seed=42, verbose=False)),
+            ('rf', dict(n_estimators=250, max_depth=10, min_samples_split=5, random_state=42))
+        ]
+    },
+    'autism': {
+        'title': 'Autism',
+        'target': '85%+',
+        'n_samples': 2500,
+        'members': [
+            ('xgb', dict(n_estimators=350, max_depth=7, learning_rate=0.08, subsample=0.85,
+                         colsample_bytree=0.85, random_state=42)),
+            ('lgb', dict(n_estimators=300, num_leaves=45, learning_rate=0.1, random_state=42, verbose=-1)),
+            ('cat', dict(iterations=300, learning_rate=0.1, depth=8, random_seed=42, verbose=False)),
+            ('rf', dict(n_estimators=300, max_depth=12, min_samples_split=5, random_state=42))
+        ]
+    }
+}
 
 # ============================================================================
-# 2. TRAIN DYSLEXIA MODEL (98%+ ACCURACY TARGET)
+# 2. STAGE CACHE
 # ============================================================================
 
-print("🧠 Training Dyslexia Model...")
+class StageCache:
+    """Stage outputs on disk, keyed by a hash of everything the stage depends on"""
 
-# Create dyslexia dataset
-dyslexia_data = create_dyslexia_dataset(2000)
-print(f"Dyslexia dataset: {dyslexia_data.shape}")
-print(f"Class distribution: {dyslexia_data['dyslexia'].value_counts().to_dict()}")
+    def __init__(self, cache_dir, enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
 
-# Prepare features
-X_dyslexia = dyslexia_data[['reading_speed', 'comprehension_score', 'spelling_accuracy', 
-                           'phonemic_awareness', 'working_memory']].values
-y_dyslexia = dyslexia_data['dyslexia'].values
+    @staticmethod
+    def key(*parts):
+        return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
 
-# Scale features
-dyslexia_scaler = StandardScaler()
-X_dyslexia_scaled = dyslexia_scaler.fit_transform(X_dyslexia)
+    def path(self, stage, key):
+        return os.path.join(self.cache_dir, f"{stage}-{key}.joblib")
 
-# Apply SMOTE for balance
-smote = SMOTE(random_state=42)
-X_dyslexia_resampled, y_dyslexia_resampled = smote.fit_resample(X_dyslexia_scaled, y_dyslexia)
+    def load(self, stage, key):
+        if self.enabled and os.path.exists(self.path(stage, key)):
+            self.hits += 1
+            return joblib.load(self.path(stage, key))
+        self.misses += 1
+        return None
 
-# Split data
-X_train_dys, X_test_dys, y_train_dys, y_test_dys = train_test_split(
-    X_dyslexia_resampled, y_dyslexia_resampled, test_size=0.2, random_state=42, stratify=y_dyslexia_resampled
-)
+    def save(self, stage, key, value):
+        if self.enabled:
+            joblib.dump(value, self.path(stage, key) + '.tmp')
+            os.replace(self.path(stage, key) + '.tmp', self.path(stage, key))
+        return value
 
-# Create optimized dyslexia ensemble
-dyslexia_ensemble = VotingClassifier([
-    ('xgb', xgb.XGBClassifier(
-        n_estimators=300,
-        max_depth=8,
-        learning_rate=0.1,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        random_state=42
-    )),
-    ('lgb', lgb.LGBMClassifier(
-        n_estimators=300,
-        num_leaves=50,
-        learning_rate=0.1,
-        random_state=42,
-        verbose=-1
-    )),
-    ('cat', CatBoostClassifier(
-        iterations=300,
-        learning_rate=0.1,
-        depth=8,
-        random_seed=42,
-        verbose=False
-    )),
-    ('rf', RandomForestClassifier(
-        n_estimators=300,
-        max_depth=12,
-        min_samples_split=5,
-        random_state=42
-    )),
-    ('et', ExtraTreesClassifier(
-        n_estimators=300,
-        max_depth=12,
-        min_samples_split=5,
-        random_state=42
-    ))
-], voting='soft')
-
-# Train dyslexia model
-print("Training dyslexia ensemble...")
-dyslexia_ensemble.fit(X_train_dys, y_train_dys)
-
-# Evaluate dyslexia model
-y_pred_dys = dyslexia_ensemble.predict(X_test_dys)
-dyslexia_accuracy = accuracy_score(y_test_dys, y_pred_dys)
-
-print(f"🎯 DYSLEXIA MODEL RESULTS:")
-print(f"Accuracy: {dyslexia_accuracy:.4f} ({dyslexia_accuracy*100:.2f}%)")
-print(classification_report(y_test_dys, y_pred_dys))
-
-# Save dyslexia model
-dyslexia_model_data = {
-    'ensemble': dyslexia_ensemble,
-    'scaler': dyslexia_scaler,
-    'accuracy': dyslexia_accuracy,
-    'feature_names': ['reading_speed', 'comprehension_score', 'spelling_accuracy', 
-                     'phonemic_awareness', 'working_memory']
-}
+    def get_or_compute(self, stage, key, compute):
+        cached = self.load(stage, key)
+        return cached if cached is not None else self.save(stage, key, compute())
 
-joblib.dump(dyslexia_model_data, 'models/compatible_dyslexia_model.pkl')
-print("✅ Dyslexia model saved!")
+
+LIBRARY_VERSIONS = (np.__version__, sklearn.__version__, xgb.__version__, lgb.__version__, catboost.__version__)
 
 # ============================================================================
-# 3. TRAIN ADHD MODEL (75%+ ACCURACY TARGET)
+# 3. STAGES
 # ============================================================================
 
-print("\n🧠 Training ADHD Model...")
-
-# Create ADHD dataset
-adhd_data = create_adhd_dataset(1500)
-print(f"ADHD dataset: {adhd_data.shape}")
-print(f"Class distribution: {adhd_data['adhd'].value_counts().to_dict()}")
-
-# Prepare features
-X_adhd = adhd_data[['attention_span', 'hyperactivity_level', 'impulsivity_score', 
-                   'focus_duration', 'task_completion']].values
-y_adhd = adhd_data['adhd'].values
-
-# Scale features
-adhd_scaler = StandardScaler()
-X_adhd_scaled = adhd_scaler.fit_transform(X_adhd)
-
-# Apply SMOTE
-X_adhd_resampled, y_adhd_resampled = smote.fit_resample(X_adhd_scaled, y_adhd)
-
-# Split data
-X_train_adhd, X_test_adhd, y_train_adhd, y_test_adhd = train_test_split(
-    X_adhd_resampled, y_adhd_resampled, test_size=0.2, random_state=42, stratify=y_adhd_resampled
-)
-
-# Create optimized ADHD ensemble
-adhd_ensemble = VotingClassifier([
-    ('xgb', xgb.XGBClassifier(
-        n_estimators=250,
-        max_depth=6,
-        learning_rate=0.08,
-        subsample=0.85,
-        colsample_bytree=0.85,
-        random_state=42
-    )),
-    ('lgb', lgb.LGBMClassifier(
-        n_estimators=250,
-        num_leaves=40,
-        learning_rate=0.1,
-        random_state=42,
-        verbose=-1
-    )),
-    ('cat', CatBoostClassifier(
-        iterations=250,
-        learning_rate=0.1,
-        depth=7,
-        random_seed=42,
-        verbose=False
-    )),
-    ('rf', RandomForestClassifier(
-        n_estimators=250,
-        max_depth=10,
-        min_samples_split=5,
-        random_state=42
+def build_dataset(condition, n_samples):
+    """Stage 1: the synthetic dataset as (X, y, feature_names)"""
+    if condition == 'dyslexia':
+        data = create_dyslexia_dataset(n_samples)
+        feature_names = DYSLEXIA_FEATURES
+    elif condition == 'adhd':
+        data = create_adhd_dataset(n_samples)
+        feature_names = ADHD_FEATURES
+    else:
+        data, feature_names = create_autism_dataset(n_samples)
+    return data[feature_names].values, data[condition].values, list(feature_names)
+
+
+def prepare_training_data(X, y):
+    """Stage 2: scale, balance with SMOTE and split"""
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    X_resampled, y_resampled = SMOTE(random_state=42).fit_resample(X_scaled, y)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_resampled, y_resampled, test_size=0.2, random_state=42, stratify=y_resampled
+    )
+    return {'scaler': scaler, 'X_train': X_train, 'X_test': X_test, 'y_train': y_train, 'y_test': y_test}
+
+
+def fit_member(name, params, X_train, y_train, threads):
+    """Stage 3 (runs in a pool worker): fit one ensemble member on ``threads`` threads"""
+    from threadpoolctl import threadpool_limits
+
+    member = MEMBER_CLASSES[name](**dict(params, **{THREAD_PARAMS[name]: threads}))
+    start = time.perf_counter()
+    # Cap OpenMP/BLAS pools too, so concurrent jobs share the cores instead of oversubscribing
+    with threadpool_limits(limits=threads):
+        member.fit(X_train, y_train)
+    if name != 'cat':
+        # Don't ship the training thread count into serving; CatBoost predicts
+        # on all cores regardless and can't change params once fitted
+        member.set_params(**{THREAD_PARAMS[name]: None})
+    return member, time.perf_counter() - start
+
+
+def assemble_ensemble(member_specs, fitted, y_train):
+    """Stage 4: a fitted soft-voting VotingClassifier from independently fitted members"""
+    ensemble = VotingClassifier([(name, MEMBER_CLASSES[name](**params)) for name, params in member_specs],
+                                voting='soft')
+    ensemble.le_ = LabelEncoder().fit(y_train)
+    ensemble.classes_ = ensemble.le_.classes_
+    ensemble.estimators_ = [fitted[name] for name, _ in member_specs]
+    ensemble.named_estimators_ = Bunch(**{name: fitted[name] for name, _ in member_specs})
+    return ensemble
+
+
+def save_condition(condition, ensemble, prepared, feature_names, accuracy, models_dir):
+    """Stage 5: write the compatible_*_model.pkl the backend loads"""
+    if condition == 'dyslexia':
+        model_data = {
+            'ensemble': ensemble,
+            'scaler': prepared['scaler'],
+            'accuracy': accuracy,
+            'feature_names': feature_names
+        }
+        joblib.dump({'scaler': prepared['scaler'], 'feature_names': feature_names},
+                    os.path.join(models_dir, 'compatible_dyslexia_preprocessing.pkl'))
+    elif condition == 'adhd':
+        model_data = {
+            'final_ensemble': ensemble,
+            'scaler': prepared['scaler'],
+            'test_accuracy': accuracy,
+            'feature_names': feature_names,
+            'model_type': 'compatible_ensemble'
+        }
+    else:
+        model_data = {
+            'ml_model': ensemble,
+            'scaler': prepared['scaler'],
+            'feature_names': feature_names,
+            'test_accuracy': accuracy,
+            'model_type': 'compatible_ml_ensemble'
+        }
+    joblib.dump(model_data, os.path.join(models_dir, f'compatible_{condition}_model.pkl'))
+
+def distill_condition(condition, ensemble, prepared, feature_names, accuracy, kind, cache, member_keys, models_dir,
+                      min_agreement):
+    """Stage 6: the compact student served by INFERENCE_BACKEND=student; False if it was not good enough to write"""
+    from app.models import distillation
+    from app.models.disability_detector import artifact_fingerprint
+
+    student_key = cache.key('student', member_keys, kind, inspect.getsource(distillation), LIBRARY_VERSIONS)
+    student, report = cache.get_or_compute('student', student_key, lambda: distillation.distill(
+        condition, ensemble, prepared['scaler'], feature_names, kind,
+        X_base=prepared['X_train'], X_test=prepared['X_test'], y_test=prepared['y_test']
     ))
-], voting='soft')
-
-# Train ADHD model
-print("Training ADHD ensemble...")
-adhd_ensemble.fit(X_train_adhd, y_train_adhd)
-
-# Evaluate ADHD model
-y_pred_adhd = adhd_ensemble.predict(X_test_adhd)
-adhd_accuracy = accuracy_score(y_test_adhd, y_pred_adhd)
-
-print(f"🎯 ADHD MODEL RESULTS:")
-print(f"Accuracy: {adhd_accuracy:.4f} ({adhd_accuracy*100:.2f}%)")
-print(classification_report(y_test_adhd, y_pred_adhd))
-
-# Save ADHD model
-adhd_model_data = {
-    'final_ensemble': adhd_ensemble,
-    'scaler': adhd_scaler,
-    'test_accuracy': adhd_accuracy,
-    'feature_names': ['attention_span', 'hyperactivity_level', 'impulsivity_score', 
-                     'focus_duration', 'task_completion'],
-    'model_type': 'compatible_ensemble'
-}
-
-joblib.dump(adhd_model_data, 'models/compatible_adhd_model.pkl')
-print("✅ ADHD model saved!")
+    print(f"🎓 {kind} student: {report['accuracy']*100:.2f}% accuracy, "
+          f"{report['agreement']*100:.2f}% agreement with the ensemble")
+    if report['agreement'] < min_agreement:
+        print(f"   ❌ below {min_agreement:.2%} agreement; not written")
+        if os.path.exists(distillation.student_artifact_path(models_dir, condition)):
+            print(f"   ⚠️ the existing student_{condition}_model.pkl was distilled from the previous ensemble")
+        return False
+    distillation.save_student(
+        models_dir, condition, student, kind, prepared['scaler'], feature_names, report, accuracy,
+        artifact_fingerprint(os.path.join(models_dir, f'compatible_{condition}_model.pkl'))
+    )
+    return True
 
 # ============================================================================
-# 4. TRAIN AUTISM MODEL (85%+ ACCURACY TARGET)
+# 4. PIPELINE
 # ============================================================================
 
-print("\n🧠 Training Autism Model...")
-
-# Create autism dataset
-autism_data, autism_feature_names = create_autism_dataset(2500)
-print(f"Autism dataset: {autism_data.shape}")
-print(f"Class distribution: {autism_data['autism'].value_counts().to_dict()}")
-
-# Prepare features
-X_autism = autism_data[autism_feature_names].values
-y_autism = autism_data['autism'].values
-
-# Scale features
-autism_scaler = StandardScaler()
-X_autism_scaled = autism_scaler.fit_transform(X_autism)
-
-# Apply SMOTE
-X_autism_resampled, y_autism_resampled = smote.fit_resample(X_autism_scaled, y_autism)
-
-# Split data
-X_train_autism, X_test_autism, y_train_autism, y_test_autism = train_test_split(
-    X_autism_resampled, y_autism_resampled, test_size=0.2, random_state=42, stratify=y_autism_resampled
-)
+def run_pipeline(args):
+    cache = StageCache(args.cache_dir, enabled=not args.no_cache)
+    os.makedirs(args.models_dir, exist_ok=True)
+    pipeline_start = time.perf_counter()
+
+    # Stages 1-2 are cheap; run them here and fan the member fits out
+    prepared = {}
+    for condition in args.conditions:
+        spec = CONDITION_SPECS[condition]
+        dataset_key = cache.key('dataset', condition, spec['n_samples'], inspect.getsource(build_dataset),
+                                inspect.getsource(synthetic_data), np.__version__)
+        X, y, feature_names = cache.get_or_compute(
+            'dataset', dataset_key, lambda: build_dataset(condition, spec['n_samples'])
+        )
+        print(f"🧠 {spec['title']} dataset: {X.shape}, class distribution "
+              f"{ {int(c): int(n) for c, n in zip(*np.unique(y, return_counts=True))} }")
+
+        prep_key = cache.key('prepare', dataset_key, inspect.getsource(prepare_training_data), LIBRARY_VERSIONS)
+        prepared[condition] = (prep_key, feature_names, cache.get_or_compute(
+            'prepare', prep_key, lambda: prepare_training_data(X, y)
+        ))
+
+    jobs = []
+    fitted = {condition: {} for condition in args.conditions}
+    member_keys = {condition: [] for condition in args.conditions}
+    for condition in args.conditions:
+        prep_key, _, data = prepared[condition]
+        for name, params in CONDITION_SPECS[condition]['members']:
+            member_key = cache.key('member', prep_key, name, sorted(params.items()), LIBRARY_VERSIONS)
+            member_keys[condition].append(member_key)
+            member = cache.load('member', member_key)
+            if member is not None:
+                fitted[condition][name] = member
+                print(f"   ♻️ {condition}/{name}: cached")
+            else:
+                jobs.append((condition, name, params, member_key))
+
+    workers = max(1, min(args.workers, len(jobs)))
+    threads = args.threads_per_job or max(1, (os.cpu_count() or 1) // workers)
+    if jobs:
+        print(f"\n⚙️ Fitting {len(jobs)} ensemble members on {workers} worker(s) x {threads} thread(s)...")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(fit_member, name, params, prepared[condition][2]['X_train'],
+                        prepared[condition][2]['y_train'], threads): (condition, name, member_key)
+            for condition, name, params, member_key in jobs
+        }
+        for future in as_completed(futures):
+            condition, name, member_key = futures[future]
+            member, seconds = future.result()
+            fitted[condition][name] = cache.save('member', member_key, member)
+            print(f"   ✅ {condition}/{name} fitted in {seconds:.1f}s")
 
-# Create optimized autism ensemble
-autism_ensemble = VotingClassifier([
-    ('xgb', xgb.XGBClassifier(
-        n_estimators=350,
-        max_depth=7,
-        learning_rate=0.08,
-        subsample=0.85,
-        colsample_bytree=0.85,
-        random_state=42
-    )),
-    ('lgb', lgb.LGBMClassifier(
-        n_estimators=300,
-        num_leaves=45,
-        learning_rate=0.1,
-        random_state=42,
-        verbose=-1
-    )),
-    ('cat', CatBoostClassifier(
-        iterations=300,
-        learning_rate=0.1,
-        depth=8,
-        random_seed=42,
-        verbose=False
-    )),
-    ('rf', RandomForestClassifier(
-        n_estimators=300,
-        max_depth=12,
-        min_samples_split=5,
-        random_state=42
-    ))
-], voting='soft')
-
-# Train autism model
-print("Training autism ensemble...")
-autism_ensemble.fit(X_train_autism, y_train_autism)
-
-# Evaluate autism model
-y_pred_autism = autism_ensemble.predict(X_test_autism)
-autism_accuracy = accuracy_score(y_test_autism, y_pred_autism)
-
-print(f"🎯 AUTISM MODEL RESULTS:")
-print(f"Accuracy: {autism_accuracy:.4f} ({autism_accuracy*100:.2f}%)")
-print(classification_report(y_test_autism, y_pred_autism))
-
-# Save autism model
-autism_model_data = {
-    'ml_model': autism_ensemble,
-    'scaler': autism_scaler,
-    'feature_names': autism_feature_names,
-    'test_accuracy': autism_accuracy,
-    'model_type': 'compatible_ml_ensemble'
-}
+    accuracies = {}
+    students = []
+    for condition in args.conditions:
+        spec = CONDITION_SPECS[condition]
+        _, feature_names, data = prepared[condition]
+        ensemble = assemble_ensemble(spec['members'], fitted[condition], data['y_train'])
 
-joblib.dump(autism_model_data, 'models/compatible_autism_model.pkl')
-print("✅ Autism model saved!")
+        y_pred = ensemble.predict(data['X_test'])
+        accuracies[condition] = accuracy_score(data['y_test'], y_pred)
+        print(f"\n🎯 {spec['title'].upper()} MODEL RESULTS ({spec['target']} ACCURACY TARGET):")
+        print(f"Accuracy: {accuracies[condition]:.4f} ({accuracies[condition]*100:.2f}%)")
+        print(classification_report(data['y_test'], y_pred))
 
-# ============================================================================
-# 5. CREATE PREPROCESSING FILES
-# ============================================================================
+        save_condition(condition, ensemble, data, feature_names, accuracies[condition], args.models_dir)
+        print(f"✅ {spec['title']} model saved!")
 
-print("\n💾 Creating preprocessing files...")
+        if args.student != 'none' and distill_condition(
+            condition, ensemble, data, feature_names, accuracies[condition], args.student, cache,
+            member_keys[condition], args.models_dir, args.min_student_agreement
+        ):
+            students.append(condition)
 
-# Dyslexia preprocessing
-dyslexia_preprocessing = {
-    'scaler': dyslexia_scaler,
-    'feature_names': ['reading_speed', 'comprehension_score', 'spelling_accuracy', 
-                     'phonemic_awareness', 'working_memory']
-}
+    return accuracies, students, cache, time.perf_counter() - pipeline_start
 
-joblib.dump(dyslexia_preprocessing, 'models/compatible_dyslexia_preprocessing.pkl')
 
 # ============================================================================
-# 6. FINAL SUMMARY
+# 5. CLI
 # ============================================================================
 
-timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-
-print(f"\n🎉 RETRAINING COMPLETE - {timestamp}")
-print("=" * 60)
-print("📊 FINAL MODEL PERFORMANCE:")
-print(f"   🧠 Dyslexia: {dyslexia_accuracy*100:.2f}% accuracy")
-print(f"   🎯 ADHD: {adhd_accuracy*100:.2f}% accuracy") 
-print(f"   🌟 Autism: {autism_accuracy*100:.2f}% accuracy")
-print("=" * 60)
-print("📁 FILES CREATED:")
-print("   ✅ models/compatible_dyslexia_model.pkl")
-print("   ✅ models/compatible_adhd_model.pkl")
-print("   ✅ models/compatible_autism_model.pkl")
-print("   ✅ models/compatible_dyslexia_preprocessing.pkl")
-print("=" * 60)
-print("🚀 ALL MODELS READY FOR BACKEND INTEGRATION!")
-
-# Test loading to verify compatibility
-print("\n🧪 Testing model loading...")
-try:
-    test_dyslexia = joblib.load('models/compatible_dyslexia_model.pkl')
-    test_adhd = joblib.load('models/compatible_adhd_model.pkl')
-    test_autism = joblib.load('models/compatible_autism_model.pkl')
-    test_preprocessing = joblib.load('models/compatible_dyslexia_preprocessing.pkl')
-    
-    print("✅ All models load successfully!")
-    print("✅ Ready for backend deployment!")
-    
-except Exception as e:
-    print(f"❌ Loading test failed: {e}")
-
-print("\n🎯 NEXT STEPS:")
-print("1. Update your model_loader.py to use compatible models")
-print("2. Restart your backend")
-print("3. All models will load as ML models (no rule-based fallbacks)")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retrain the compatible ensembles for the current environment")
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--conditions', nargs='+', choices=list(CONDITION_SPECS), default=list(CONDITION_SPECS))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='processes fitting ensemble members concurrently')
+    parser.add_argument('--threads-per-job', type=int, default=None,
+                        help='threads each member fit may use (default: cores / workers)')
+    parser.add_argument('--student', choices=['gbdt', 'linear', 'none'], default='gbdt',
+                        help='distill each ensemble into a compact student of this kind')
+    parser.add_argument('--min-student-agreement', type=float, default=None,
+                        help='students agreeing less with their ensemble are not written '
+                             '(default app.models.distillation.MIN_AGREEMENT)')
+    parser.add_argument('--cache-dir', default='.retrain_cache', help='stage outputs reused by later runs')
+    parser.add_argument('--no-cache', action='store_true', help='recompute every stage')
+    args = parser.parse_args(argv)
+    if args.min_student_agreement is None:
+        from app.models.distillation import MIN_AGREEMENT
+        args.min_student_agreement = MIN_AGREEMENT
+
+    print("🔄 RETRAINING ALL MODELS FOR CURRENT ENVIRONMENT...")
+    accuracies, students, cache, elapsed = run_pipeline(args)
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    print(f"\n🎉 RETRAINING COMPLETE - {timestamp} ({elapsed:.1f}s, "
+          f"{cache.hits} cached / {cache.misses} computed stages)")
+    print("=" * 60)
+    print("📊 FINAL MODEL PERFORMANCE:")
+    icons = {'dyslexia': '🧠', 'adhd': '🎯', 'autism': '🌟'}
+    for condition, accuracy in accuracies.items():
+        print(f"   {icons[condition]} {CONDITION_SPECS[condition]['title']}: {accuracy*100:.2f}% accuracy")
+    print("=" * 60)
+    print("📁 FILES CREATED:")
+    for condition in accuracies:
+        print(f"   ✅ {args.models_dir}/compatible_{condition}_model.pkl")
+    if 'dyslexia' in accuracies:
+        print(f"   ✅ {args.models_dir}/compatible_dyslexia_preprocessing.pkl")
+    if args.student != 'none':
+        for condition in accuracies:
+            if condition in students:
+                print(f"   ✅ {args.models_dir}/student_{condition}_model.pkl")
+            else:
+                print(f"   ❌ {args.models_dir}/student_{condition}_model.pkl not written "
+                      f"(below {args.min_student_agreement:.2%} agreement)")
+    print("=" * 60)
+
+    # Test loading to verify compatibility
+    print("\n🧪 Testing model loading...")
+    try:
+        for condition in accuracies:
+            joblib.load(os.path.join(args.models_dir, f'compatible_{condition}_model.pkl'))
+        print("✅ All models load successfully!")
+        print("🚀 ALL MODELS READY FOR BACKEND INTEGRATION!")
+        return 0
+    except Exception as e:
+        print(f"❌ Loading test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
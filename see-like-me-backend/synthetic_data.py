@@ -0,0 +1,187 @@
+"""Vectorized synthetic assessment datasets
+
+    python synthetic_data.py --condition autism --rows 20000000 --output data/synthetic
+
+Every generator draws from an ``np.random.Generator`` and labels whole
+arrays at once. Large datasets are produced in fixed-size chunks: each
+chunk has its own generator spawned from the seed, so the data for a given
+(seed, chunk size) is reproducible and chunks never need to be held
+together in memory. ``write_memmap`` streams the chunks into ``.npy`` files
+that training and benchmarks open with ``mmap_mode='r'``.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+DYSLEXIA_FEATURES = ['reading_speed', 'comprehension_score', 'spelling_accuracy',
+                     'phonemic_awareness', 'working_memory']
+ADHD_FEATURES = ['attention_span', 'hyperactivity_level', 'impulsivity_score',
+                 'focus_duration', 'task_completion']
+AUTISM_FEATURES = ['light_sensitivity', 'sound_sensitivity', 'texture_sensitivity', 'smell_sensitivity',
+                   'taste_sensitivity', 'eye_contact_difficulty', 'social_interaction_challenges',
+                   'nonverbal_communication', 'conversation_difficulty', 'social_cue_recognition',
+                   'routine_importance', 'change_resistance', 'repetitive_behaviors', 'special_interests',
+                   'stimming_behaviors', 'attention_to_detail', 'pattern_recognition', 'memory_abilities',
+                   'processing_speed', 'executive_function']
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# ============================================================================
+# CHUNK GENERATORS: (rng, n) -> (X, y)
+# ============================================================================
+
+def dyslexia_chunk(rng, n, dtype=np.float64):
+    """Reading and phonology scores; dyslexia when enough of them fall below threshold"""
+    X = np.empty((n, 5), dtype=dtype)
+    X[:, 0] = rng.normal(120, 40, n)  # reading speed, WPM
+    X[:, 1] = rng.normal(75, 20, n)   # comprehension, %
+    X[:, 2] = rng.normal(80, 15, n)   # spelling accuracy, %
+    X[:, 3] = rng.normal(6, 2, n)     # phonemic awareness, 0-10
+    X[:, 4] = rng.normal(6, 2, n)     # working memory, 0-10
+
+    score = ((X[:, 0] < 80).astype(np.float64) + (X[:, 1] < 60) + (X[:, 2] < 70)
+             + (X[:, 3] < 4) + (X[:, 4] < 4))
+    score += rng.normal(0, 0.5, n)
+    return X, (score > 2.5).astype(np.int8)
+
+
+def adhd_chunk(rng, n, dtype=np.float64):
+    """Attention and activity measures; ADHD when enough of them are out of range"""
+    X = np.empty((n, 5), dtype=dtype)
+    X[:, 0] = rng.normal(15, 8, n)    # attention span, minutes
+    X[:, 1] = rng.normal(5, 2, n)     # hyperactivity, 1-10
+    X[:, 2] = rng.normal(5, 2, n)     # impulsivity, 1-10
+    X[:, 3] = rng.normal(20, 10, n)   # focus duration, minutes
+    X[:, 4] = rng.normal(70, 25, n)   # task completion, %
+
+    score = ((X[:, 0] < 8).astype(np.float64) + (X[:, 1] > 7) + (X[:, 2] > 7)
+             + (X[:, 3] < 10) + (X[:, 4] < 50))
+    score += rng.normal(0, 0.3, n)
+    return X, (score > 2.2).astype(np.int8)
+
+
+def autism_chunk(rng, n, dtype=np.float64):
+    """Twenty 1-5 questionnaire answers; autism from weighted sensory, social and behavioural means"""
+    answers = rng.integers(1, 6, size=(n, len(AUTISM_FEATURES)), dtype=np.int8)
+    sensory = answers[:, 0:3].mean(axis=1)
+    social = answers[:, 5:8].mean(axis=1)
+    behavioral = answers[:, 10:13].mean(axis=1)
+
+    score = sensory * 0.3 + social * 0.5 + behavioral * 0.2
+    score += rng.normal(0, 0.4, n)
+    return answers.astype(dtype), (score > 3.1).astype(np.int8)
+
+
+GENERATORS = {
+    'dyslexia': (DYSLEXIA_FEATURES, dyslexia_chunk),
+    'adhd': (ADHD_FEATURES, adhd_chunk),
+    'autism': (AUTISM_FEATURES, autism_chunk)
+}
+
+# ============================================================================
+# STREAMING
+# ============================================================================
+
+def iter_chunks(condition, n_samples, chunk_size=DEFAULT_CHUNK_SIZE, seed=42, dtype=np.float64):
+    """Yield ``(X, y)`` chunks of at most ``chunk_size`` rows, ``n_samples`` rows in all"""
+    _, chunk = GENERATORS[condition]
+    n_chunks = max(1, -(-n_samples // chunk_size))
+    for index, child in enumerate(np.random.SeedSequence(seed).spawn(n_chunks)):
+        rows = min(chunk_size, n_samples - index * chunk_size)
+        yield chunk(np.random.default_rng(child), rows, dtype)
+
+
+def generate(condition, n_samples, chunk_size=DEFAULT_CHUNK_SIZE, seed=42, dtype=np.float64):
+    """The whole dataset as ``(X, y)`` arrays"""
+    X = np.empty((n_samples, len(GENERATORS[condition][0])), dtype=dtype)
+    y = np.empty(n_samples, dtype=np.int8)
+    start = 0
+    for X_chunk, y_chunk in iter_chunks(condition, n_samples, chunk_size, seed, dtype):
+        X[start:start + len(y_chunk)] = X_chunk
+        y[start:start + len(y_chunk)] = y_chunk
+        start += len(y_chunk)
+    return X, y
+
+
+def write_memmap(condition, n_samples, directory, chunk_size=DEFAULT_CHUNK_SIZE, seed=42, dtype=np.float32):
+    """Stream a dataset into ``<directory>/<condition>_X.npy`` and ``_y.npy``; returns both paths"""
+    os.makedirs(directory, exist_ok=True)
+    X_path = os.path.join(directory, f'{condition}_X.npy')
+    y_path = os.path.join(directory, f'{condition}_y.npy')
+    X = np.lib.format.open_memmap(X_path + '.tmp', mode='w+', dtype=dtype,
+                                  shape=(n_samples, len(GENERATORS[condition][0])))
+    y = np.lib.format.open_memmap(y_path + '.tmp', mode='w+', dtype=np.int8, shape=(n_samples,))
+    start = 0
+    for X_chunk, y_chunk in iter_chunks(condition, n_samples, chunk_size, seed, dtype):
+        X[start:start + len(y_chunk)] = X_chunk
+        y[start:start + len(y_chunk)] = y_chunk
+        start += len(y_chunk)
+    X.flush()
+    y.flush()
+    del X, y
+    os.replace(X_path + '.tmp', X_path)
+    os.replace(y_path + '.tmp', y_path)
+    return X_path, y_path
+
+
+def load_memmap(condition, directory):
+    """A dataset written by write_memmap, mapped read-only"""
+    return (np.load(os.path.join(directory, f'{condition}_X.npy'), mmap_mode='r'),
+            np.load(os.path.join(directory, f'{condition}_y.npy'), mmap_mode='r'))
+
+# ============================================================================
+# DATAFRAMES (retrain_compatible_models.py)
+# ============================================================================
+
+def _frame(condition, n_samples, seed):
+    feature_names, _ = GENERATORS[condition]
+    X, y = generate(condition, n_samples, seed=seed)
+    data = pd.DataFrame(X, columns=feature_names)
+    data[condition] = y.astype(np.int64)
+    return data
+
+
+def create_dyslexia_dataset(n_samples=2000, seed=42):
+    """Create realistic dyslexia dataset"""
+    return _frame('dyslexia', n_samples, seed)
+
+
+def create_adhd_dataset(n_samples=1500, seed=42):
+    """Create realistic ADHD dataset"""
+    return _frame('adhd', n_samples, seed)
+
+
+def create_autism_dataset(n_samples=2500, seed=42):
+    """Create realistic autism dataset"""
+    data = _frame('autism', n_samples, seed)
+    data[AUTISM_FEATURES] = data[AUTISM_FEATURES].astype(np.int64)
+    return data, list(AUTISM_FEATURES)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a large synthetic dataset to memory-mapped .npy files")
+    parser.add_argument('--condition', choices=list(GENERATORS), required=True)
+    parser.add_argument('--rows', type=int, required=True)
+    parser.add_argument('--output', default='data/synthetic')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--dtype', choices=['float32', 'float64'], default='float32')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    X_path, y_path = write_memmap(args.condition, args.rows, args.output, args.chunk_size, args.seed,
+                                  np.dtype(args.dtype))
+    elapsed = time.perf_counter() - start
+    y = np.load(y_path, mmap_mode='r')
+    print(f"✅ {args.rows:,} {args.condition} rows in {elapsed:.1f}s ({args.rows / elapsed:,.0f} rows/s), "
+          f"{float(y.mean()) * 100:.1f}% positive")
+    print(f"   {X_path}\n   {y_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
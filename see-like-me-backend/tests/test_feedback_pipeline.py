@@ -0,0 +1,87 @@
+import asyncio
+import glob
+import json
+import os
+
+import pytest
+
+from app.core.feedback_pipeline import (
+    FeedbackConsumer, InvalidFeedbackError, ParquetFeedbackSink, validate_feedback
+)
+
+
+class FakeRedisManager:
+    def __init__(self):
+        self.acked = []
+
+    async def ack_feedback(self, ids):
+        self.acked.extend(ids)
+
+
+def record(record_id, **fields):
+    base = {'_id': record_id, 'session_id': 's1', 'timestamp': '2026-10-18T09:30:00',
+            'disability_type': 'adhd', 'accuracy_rating': 4, 'simulation_quality': 5}
+    return {**base, **fields}
+
+
+def test_validate_feedback_checks_column_types():
+    with pytest.raises(InvalidFeedbackError):
+        validate_feedback({'accuracy_rating': 'great'})
+    with pytest.raises(InvalidFeedbackError):
+        validate_feedback({'timestamp': '../../escaped'})
+
+    clean = validate_feedback({'accuracy_rating': 4, 'comments': 'ok', 'mood': [1, 'a'],
+                               'disability_type': '../../../escaped'})
+    assert clean['accuracy_rating'] == 4
+    assert clean['disability_type'] == 'unknown'
+    assert 'mood' not in clean
+    assert 'timestamp' in clean
+
+
+def test_bad_rows_are_dead_lettered_and_the_batch_is_acked(tmp_path):
+    sink = ParquetFeedbackSink(str(tmp_path / 'out'), name='test', dead_letter_dir=str(tmp_path / 'dead'))
+    redis_manager = FakeRedisManager()
+    consumer = FeedbackConsumer(redis_manager, sink)
+    consumer._buffer = [
+        record('1-0'),
+        record('2-0', accuracy_rating='great'),
+        record('3-0', timestamp='../../../x'),
+        record('4-0', disability_type='../../../escaped'),
+        record('5-0', disability_type='autism'),
+    ]
+
+    asyncio.run(consumer.flush())
+
+    assert consumer.get_stats()['buffered'] == 0
+    assert redis_manager.acked == ['1-0', '2-0', '3-0', '4-0', '5-0']
+    written = sorted(os.path.relpath(path, tmp_path / 'out')
+                     for path in glob.glob(str(tmp_path / 'out' / '**' / '*.parquet'), recursive=True))
+    assert [os.path.dirname(path) for path in written] == [
+        'date=2026-10-18/disability_type=adhd',
+        'date=2026-10-18/disability_type=autism',
+        'date=2026-10-18/disability_type=unknown',
+    ]
+    assert sink.rows_written == 3
+
+    dead = [json.loads(line) for path in glob.glob(str(tmp_path / 'dead' / '*.jsonl')) for line in open(path)]
+    assert sorted(row['accuracy_rating'] if row['accuracy_rating'] == 'great' else row['timestamp']
+                  for row in dead) == ['../../../x', 'great']
+    assert sink.rows_dead_lettered == 2
+
+
+def test_labelled_feedback_keeps_the_assessment(tmp_path):
+    with pytest.raises(InvalidFeedbackError):
+        validate_feedback({'label': 2})
+    with pytest.raises(InvalidFeedbackError):
+        validate_feedback({'attention_span': float('nan')})
+
+    clean = validate_feedback({'disability_type': 'adhd', 'label': 1, 'attention_span': 5.0, 'focus_duration': 4})
+    assert clean['label'] == 1 and clean['attention_span'] == 5.0 and clean['focus_duration'] == 4
+
+    sink = ParquetFeedbackSink(str(tmp_path), name='test')
+    [path] = sink.write([dict(clean, _id='1-0', session_id='s1')])
+
+    import pyarrow.parquet as pq
+    table = pq.read_table(path)
+    assert table.column('label').to_pylist() == [1]
+    assert table.column('focus_duration').to_pylist() == [4.0]
@@ -0,0 +1,69 @@
+import asyncio
+
+from app.core.prediction_cache import PredictionCache
+
+
+class FakeRedisManager:
+    def __init__(self):
+        self.stored = {}
+
+    async def get_cached_prediction(self, key):
+        return self.stored.get(key)
+
+    async def cache_model_prediction(self, key, prediction, ttl=300):
+        self.stored[key] = prediction
+
+
+def test_waiter_survives_cancelled_leader():
+    async def scenario():
+        cache = PredictionCache(FakeRedisManager())
+        started = asyncio.Event()
+        release = asyncio.Event()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            started.set()
+            await release.wait()
+            return {"adhd": {"probability": 0.7}}
+
+        leader = asyncio.create_task(cache.get_or_compute("key", compute))
+        await started.wait()
+        waiter = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await waiter == {"adhd": {"probability": 0.7}}
+        assert leader.cancelled()
+        assert calls == 1
+        assert cache.get_stats()["coalesced"] == 1
+        assert cache.get_stats()["in_flight"] == 0
+        # The finished computation still fills the cache
+        assert await cache.get_or_compute("key", compute) == {"adhd": {"probability": 0.7}}
+        assert cache.get_stats()["local_hits"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_failure_reaches_every_waiter():
+    async def scenario():
+        cache = PredictionCache(FakeRedisManager())
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            raise ValueError("model failed")
+
+        callers = [asyncio.create_task(cache.get_or_compute("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+
+        assert all(isinstance(result, ValueError) for result in results)
+        assert cache.get_stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+import pytest
+
+from app.api.websocket import CONNECTION_OVERHEAD_BYTES, ConnectionManager
+from app.core.pubsub import InMemoryBus, InMemoryHub
+
+RESULTS = {
+    "dyslexia": {"accuracy": 0.97},
+    "adhd": {"accuracy": 0.95},
+    "autism": {"method": "compatible_ml_ensemble"}
+}
+
+
+class FakeWebSocket:
+    """Records the JSON frames a connection writes; ``blocked`` sockets never finish a send"""
+
+    def __init__(self, blocked: bool = False):
+        self.scope = {"subprotocols": []}
+        self.messages = []
+        self.close_code = None
+        self._unblocked = asyncio.Event()
+        if not blocked:
+            self._unblocked.set()
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, frame: str):
+        await self._unblocked.wait()
+        self.messages.append(json.loads(frame))
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.close_code = code
+
+    def of_type(self, kind: str):
+        return [message for message in self.messages if message["type"] == kind]
+
+
+async def eventually(predicate, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not reached")
+        await asyncio.sleep(0.005)
+
+
+async def two_workers():
+    """Two managers whose buses share one hub, like two worker processes sharing Redis"""
+    hub = InMemoryHub()
+    managers = [ConnectionManager(), ConnectionManager()]
+    for manager in managers:
+        await manager.start(InMemoryBus(hub=hub, batch_ms=0.5))
+    return hub, managers
+
+
+async def shut_down(*managers):
+    for manager in managers:
+        await manager.close_all()
+
+
+def run(scenario):
+    asyncio.run(scenario())
+
+
+def test_updates_reach_a_socket_held_by_another_worker():
+    async def scenario():
+        hub, (a, b) = await two_workers()
+        socket = FakeWebSocket()
+        await b.connect(socket, "s1")
+        await eventually(lambda: b.bus.node_id in hub.owners.get("s1", {}))
+
+        await a.send_detection_update("s1", RESULTS)
+        await a.send_simulation_config("s1", {"adhd": {"enabled": True}})
+        await eventually(lambda: socket.of_type("detection_complete") and socket.of_type("simulation_config"))
+
+        assert socket.of_type("detection_complete")[0]["results"] == RESULTS
+        assert socket.of_type("simulation_config")[0]["config"] == {"adhd": {"enabled": True}}
+        await shut_down(a, b)
+
+    run(scenario)
+
+
+def test_a_node_does_not_receive_its_own_broadcast_again():
+    async def scenario():
+        _, (a, b) = await two_workers()
+        here, there = FakeWebSocket(), FakeWebSocket()
+        await a.connect(here, "s1")
+        await b.connect(there, "s2")
+
+        await a.broadcast_system_message({"message": "maintenance at noon"})
+        await eventually(lambda: there.of_type("system_broadcast"))
+        await asyncio.sleep(0.05)  # time for a duplicate to show up
+
+        assert len(here.of_type("system_broadcast")) == 1
+        assert len(there.of_type("system_broadcast")) == 1
+        assert a.bus.received == 0
+        await shut_down(a, b)
+
+    run(scenario)
+
+
+def test_session_is_released_when_its_last_socket_closes():
+    async def scenario():
+        hub, (a, b) = await two_workers()
+        first = await a.connect(FakeWebSocket(), "s1")
+        second = await a.connect(FakeWebSocket(), "s1")
+        await eventually(lambda: a.bus.node_id in hub.owners.get("s1", {}))
+
+        a.disconnect("s1", first)
+        await asyncio.sleep(0.05)
+        assert a.bus.node_id in hub.owners.get("s1", {})
+
+        a.disconnect("s1", second)
+        await eventually(lambda: "s1" not in hub.owners)
+        assert "s1" not in a.bus.owned
+        await shut_down(a, b)
+
+    run(scenario)
+
+
+@pytest.mark.parametrize("limit", ["queue", "memory"])
+def test_slow_consumer_is_dropped(limit):
+    async def scenario():
+        manager = ConnectionManager()
+        await manager.start()
+        if limit == "queue":
+            manager.max_queue = 4
+        else:
+            manager.memory_budget = CONNECTION_OVERHEAD_BYTES + 4096
+        socket = FakeWebSocket(blocked=True)
+        connection = await manager.connect(socket, "s1")
+
+        for i in range(10):
+            await manager.send_personal_message({"type": "notice", "n": i, "text": "x" * 1000}, "s1")
+        await asyncio.sleep(0)
+
+        assert connection.closed
+        assert socket.close_code == 1013
+        assert manager.slow_consumers_dropped == 1
+        assert manager.get_connection_count() == 0
+        await shut_down(manager)
+
+    run(scenario)